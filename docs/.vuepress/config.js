@@ -80,6 +80,10 @@ const getSidebar = () => {
       if (dir === 'AI') {
         const aiOutputDir = path.join(toolboxDir, dir, 'output');
         if (fs.existsSync(aiOutputDir)) {
+          // 汇总页 (wyckoff_report.py 生成) 排在各交易对报告之前
+          if (fs.existsSync(path.join(aiOutputDir, 'README.md'))) {
+            tools.push(`/指标工具箱/${dir}/output/`);
+          }
           const reports = fs.readdirSync(aiOutputDir)
             .filter(f => f.endsWith('_Analysis.md'))
             .map(f => `/指标工具箱/${dir}/output/${f}`);
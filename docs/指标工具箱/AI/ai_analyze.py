@@ -1,11 +1,17 @@
 import os
 import sys
 import argparse
-import requests
-import pandas as pd
-import glob
 import time
 
+import ai_cache
+import pipeline_metrics
+
+# kline_cache / prompt_payload / wyckoff_report 都会加载 pandas + numpy (约 0.5 秒)，在用到的函数内导入:
+# --help 与未配置 API Key 直接退出时不必等待。参数默认值使用下面与 prompt_payload 一致的常量
+ENCODINGS = ("csv", "minimal", "delta")
+DEFAULT_ENCODING = "minimal"
+DEFAULT_RECENT = 100
+
 # 让 Python 能够找到 .env 文件 (位于项目根目录)
 # 假设脚本在 docs/指标工具箱/AI/ 下，.env 在 ../../../ 下
 # 简单起见，从当前执行目录或父目录查找
@@ -20,20 +26,51 @@ def load_env_key():
                         return line.strip().split("=", 1)[1]
     return None
 
-API_KEY = load_env_key() or os.environ.get("GOOGLE_API_KEY")
-
-if not API_KEY:
-    print("❌ 未找到 GOOGLE_API_KEY，请检查 .env 文件。")
-    sys.exit(1)
-
 # Gemini API Endpoint
 # Verified stable model for Free Tier: gemini-flash-latest
 MODEL_NAME = "gemini-flash-latest"
-API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_NAME}:generateContent?key={API_KEY}"
+# 可通过环境变量指向本地桩服务 (测试/演示时不消耗配额)
+API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
 
-def get_ai_analysis(system_prompt, data_context):
-    headers = {"Content-Type": "application/json"}
-    
+# 生成参数 (同时作为缓存键的一部分)
+GENERATION_CONFIG = {
+    "temperature": 0.3, # 分析类任务建议低温度
+    "maxOutputTokens": 8192
+}
+
+# 报告输出目录应与 wyckoff_plot.py 保持一致: docs/指标工具箱/AI/output/
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+
+def get_api_url():
+    """
+    读取 API Key 并拼出请求地址，未配置时返回 None
+    """
+    api_key = load_env_key() or os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        return None
+    return f"{API_BASE.rstrip('/')}/v1beta/models/{MODEL_NAME}:generateContent?key={api_key}"
+
+def get_ai_analysis(system_prompt, data_context, api_url, use_cache=True):
+    """
+    调用 Gemini 获取分析文本。提示词与数据窗口都未变化时直接返回缓存结果 (use_cache=False 时跳过缓存)
+    """
+    key = ai_cache.cache_key(MODEL_NAME, system_prompt, data_context, GENERATION_CONFIG)
+    if use_cache:
+        cached = ai_cache.get(key)
+        if cached is not None:
+            print(f"♻️ 命中分析缓存 ({key[:12]})，跳过 API 调用")
+            pipeline_metrics.count("ai_cache_hits")
+            return cached
+
+    text = _request_analysis(system_prompt, data_context, api_url)
+    if text and use_cache:
+        try:
+            ai_cache.put(key, text, model=MODEL_NAME)
+        except OSError as e:
+            print(f"⚠️ 无法写入分析缓存: {e}")
+    return text
+
+def build_request(system_prompt, data_context):
     # 构造 Prompt
     # 将系统提示词和数据合并发送
     full_prompt = f"""
@@ -41,63 +78,72 @@ def get_ai_analysis(system_prompt, data_context):
 
 ---
 
-### 当前市场数据 (CSV 片段)
-(仅提供最近的数据以便分析，请基于此数据进行推演)
+### 当前市场数据
+(仅提供最近的数据以便分析，请基于此数据进行推演。数据格式见各段首行说明)
 
 {data_context}
     """
     
-    payload = {
+    return {
         "contents": [{
             "parts": [{"text": full_prompt}]
         }],
-        "generationConfig": {
-            "temperature": 0.3, # 分析类任务建议低温度
-            "maxOutputTokens": 8192
-        }
+        "generationConfig": GENERATION_CONFIG
     }
+
+def post_once(payload, api_url):
+    """
+    发送一次请求，返回 (状态, 结果):
+    ("ok", 文本) / ("retry", 服务端要求等待的秒数或 None) / ("error", 错误描述)
+    """
+    # 命中分析缓存时不会发请求，requests 在这里才导入
+    import requests
+
+    headers = {"Content-Type": "application/json"}
+    try:
+        response = requests.post(api_url, json=payload, headers=headers, timeout=60)
+    except Exception as e:
+        return "error", f"网络请求异常: {e}"
+    pipeline_metrics.count("ai_requests")
+    pipeline_metrics.count("ai_bytes_sent", len(response.request.body or b""))
+    pipeline_metrics.count("ai_bytes_received", len(response.content))
+    if response.status_code == 200:
+        result = response.json()
+        try:
+            return "ok", result['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError):
+            return "error", f"解析响应失败: {result}"
+    if response.status_code == 429:
+        retry_after = response.headers.get("Retry-After")
+        return "retry", int(retry_after) if retry_after and retry_after.isdigit() else None
+    return "error", f"API 请求失败: {response.status_code} - {response.text}"
+
+def _request_analysis(system_prompt, data_context, api_url):
+    payload = build_request(system_prompt, data_context)
     
     max_retries = 6
     retry_delay = 10
     
     for attempt in range(max_retries):
-        try:
-            response = requests.post(API_URL, json=payload, headers=headers, timeout=60)
-            if response.status_code == 200:
-                result = response.json()
-                try:
-                    text = result['candidates'][0]['content']['parts'][0]['text']
-                    return text
-                except (KeyError, IndexError):
-                    print(f"❌ 解析响应失败: {result}")
-                    return None
-            elif response.status_code == 429:
-                print(f"⚠️ 触发频率限制 (429)，等待 {retry_delay} 秒后重试... ({attempt + 1}/{max_retries})")
-                time.sleep(retry_delay)
-                retry_delay *= 2 # 指数退避
-                continue
-            else:
-                print(f"❌ API 请求失败: {response.status_code} - {response.text}")
-                return None
-        except Exception as e:
-            print(f"❌ 网络请求异常: {e}")
-            return None
+        status, result = post_once(payload, api_url)
+        if status == "ok":
+            return result
+        if status == "retry":
+            # 服务端给出 Retry-After 时按其等待，否则指数退避
+            wait = result or retry_delay
+            print(f"⚠️ 触发频率限制 (429)，等待 {wait} 秒后重试... ({attempt + 1}/{max_retries})")
+            pipeline_metrics.count("ai_retries")
+            pipeline_metrics.count("ai_backoff_s", wait)
+            time.sleep(wait)
+            retry_delay *= 2 # 指数退避
+            continue
+        print(f"❌ {result}")
+        return None
             
     print("❌ 重试次数耗尽，分析失败。")
     return None
 
-def main():
-    parser = argparse.ArgumentParser(description='使用 Gemini AI 分析威科夫行情')
-    parser.add_argument('csv_path', help='清洗后的 CSV 数据路径')
-    parser.add_argument('--history', type=int, default=400, help='提交给 AI 的历史 K 线行数 (默认 400)')
-    args = parser.parse_args()
-    
-    csv_path = args.csv_path
-    if not os.path.exists(csv_path):
-        print(f"❌ 找不到文件: {csv_path}")
-        return
-
-    # 1. 准备 Prompt
+def load_system_prompt():
     prompt_path = os.path.join(os.path.dirname(__file__), "提示词.md")
     if not os.path.exists(prompt_path):
          # 尝试从 args[0] 的位置找
@@ -105,54 +151,92 @@ def main():
          
     if os.path.exists(prompt_path):
         with open(prompt_path, "r", encoding="utf-8") as f:
-            system_prompt = f.read()
-    else:
-        print("⚠️ 未找到提示词.md，使用默认简易 Prompt")
-        system_prompt = "请对以下威科夫行情数据进行专业分析，识别 SC, AR, ST 等关键事件。"
+            return f.read()
+    print("⚠️ 未找到提示词.md，使用默认简易 Prompt")
+    return "请对以下威科夫行情数据进行专业分析，识别 SC, AR, ST 等关键事件。"
 
-    # 2. 准备数据
-    df = pd.read_csv(csv_path)
-    base_name = os.path.splitext(os.path.basename(csv_path))[0].replace("_Cleaned", "")
+def save_report(base_name, analysis_text, output_dir=OUTPUT_DIR):
+    """
+    AI 文本写入该交易对的分析结果，并由 wyckoff_report 重新渲染报告 (没有引用图表时自动补上图片链接)
+    """
+    import wyckoff_report
+
+    output_path = wyckoff_report.attach_ai(base_name, analysis_text, output_dir, model=MODEL_NAME)
+    print(f"✅ AI 分析报告已生成: {output_path}")
+    return output_path
+
+def prepare_data(csv_path, history, encoding=DEFAULT_ENCODING, factor=1, recent=DEFAULT_RECENT, events=True):
+    """
+    读取数据并生成提交给 AI 的数据片段，返回 (base_name, 数据文本, 载荷统计)
+    """
+    import kline_cache
+    import prompt_payload
 
     # 截取数据
     # [优化] 根据 --history 参数截取数据 (默认从 100 增加到 400，以匹配图表视野)
-    recent_data = df.tail(args.history).to_csv(index=False)
-    
+    # 只读取末尾 history 行 (附带事件识别所需的预热行)，不解析整个历史文件
+    df = kline_cache.load_klines(csv_path, tail=history, lookback=prompt_payload.EVENT_LOOKBACK if events else 0)
+    base_name = os.path.splitext(os.path.basename(csv_path))[0].replace("_Cleaned", "")
+    recent_data, stats = prompt_payload.build_payload(df, history, encoding, factor, recent, events)
+    total = kline_cache.total_rows(csv_path)
+
+    print(f"📄 分析对象: {base_name} (数据长度: {total if total is not None else '?'} -> 提交最近 {stats['bars']} 根)")
+    print(f"📦 数据载荷: {stats['bytes'] / 1024:.1f} KB, 约 {stats['tokens']} tokens "
+          f"(编码 {stats['encoding']}, {stats['rows']} 行{', 含结构摘要' if events else ''})")
+    return base_name, recent_data, stats
+
+def analyze_csv(csv_path, history, api_url, system_prompt=None, output_dir=OUTPUT_DIR,
+                encoding=DEFAULT_ENCODING, factor=1, recent=DEFAULT_RECENT, events=True,
+                use_cache=True):
+    """
+    对单个 CSV 执行 AI 分析并写入报告，成功返回报告路径，失败返回 None
+    encoding / factor / recent / events 见 prompt_payload.build_payload
+    """
+    if system_prompt is None:
+        system_prompt = load_system_prompt()
+
     print(f"🧠 正调用 Google Gemini ({MODEL_NAME}) 进行深度分析...")
-    print(f"📄 分析对象: {base_name} (数据长度: {len(df)} -> 提交最近 {args.history} 行)")
+    with pipeline_metrics.stage("prepare", csv=os.path.basename(csv_path), encoding=encoding):
+        base_name, recent_data, stats = prepare_data(csv_path, history, encoding, factor, recent, events)
+        pipeline_metrics.count("rows_parsed", stats["bars"])
+        pipeline_metrics.count("prompt_tokens", stats["tokens"])
+
+    with pipeline_metrics.stage("ai_request", pair=base_name):
+        analysis_text = get_ai_analysis(system_prompt, recent_data, api_url, use_cache)
+    if not analysis_text:
+        return None
+    return save_report(base_name, analysis_text, output_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description='使用 Gemini AI 分析威科夫行情')
+    parser.add_argument('csv_path', help='清洗后的 CSV 数据路径')
+    parser.add_argument('--history', type=int, default=400, help='提交给 AI 的历史 K 线行数 (默认 400)')
+    parser.add_argument('--encoding', choices=ENCODINGS, default=DEFAULT_ENCODING,
+                        help=f'数据编码: csv 原始 13 列 / minimal 时间+OHLCV / delta 相对价格整数 (默认 {DEFAULT_ENCODING})')
+    parser.add_argument('--downsample', type=int, default=1, help='较早的 K 线每 N 根合并为一根 (默认 1 不合并)')
+    parser.add_argument('--recent', type=int, default=DEFAULT_RECENT, help=f'降采样时保持原始粒度的最近 K 线数 (默认 {DEFAULT_RECENT})')
+    parser.add_argument('--no-events', action='store_true', help='不附带预识别的区间/事件摘要')
+    parser.add_argument('--no-cache', action='store_true', help='忽略分析缓存，强制调用 API')
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure_from_args("ai_analyze", args)
 
-    analysis_text = get_ai_analysis(system_prompt, recent_data)
+    api_url = get_api_url()
+    if not api_url:
+        print("❌ 未找到 GOOGLE_API_KEY，请检查 .env 文件。")
+        sys.exit(1)
     
-    if analysis_text:
-        # 3. 保存报告
-        # 注意：这里需要替换掉 ai_analyze.py 生成的报告中的图片路径引用
-        # 提示词要求生成图片，但 AI 只生成文本。
-        # 我们假设 output 图片已经由 `wyckoff_plot.py` 生成，名为 {base_name}_Wyckoff_Chart.png
-        
-        # 强制插入图片链接（如果 AI 没生成或生成错了）
-        chart_filename = f"{base_name}_Wyckoff_Chart.png"
-        img_link = f"![{base_name} Chart](./{chart_filename})"
-        
-        # 简单的替换/检查逻辑
-        # 如果 AI 返回的文本里没有图片链接，我们在前面加一个
-        if chart_filename not in analysis_text:
-            analysis_text = f"# 威科夫深度分析报告: {base_name}\n\n{img_link}\n\n{analysis_text}"
-        
-        # 写入文件
-        # 输出目录应与 wyckoff_plot.py 保持一致: docs/指标工具箱/AI/output/
-        output_dir = "docs/指标工具箱/AI/output"
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            
-        output_path = os.path.join(output_dir, f"{base_name}_Wyckoff_Analysis.md")
-        
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(analysis_text)
-            
-        print(f"✅ AI 分析报告已生成: {output_path}")
-    else:
+    csv_path = args.csv_path
+    if not os.path.exists(csv_path):
+        print(f"❌ 找不到文件: {csv_path}")
+        return
+
+    if not analyze_csv(csv_path, args.history, api_url, encoding=args.encoding, factor=args.downsample,
+                       recent=args.recent, events=not args.no_events, use_cache=not args.no_cache):
         print("❌ 分析失败，未生成报告。")
         sys.exit(1)
+    import wyckoff_report
+    wyckoff_report.render_index(OUTPUT_DIR)
 
 if __name__ == "__main__":
     main()
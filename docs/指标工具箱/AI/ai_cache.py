@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+
+# ================= AI 分析结果缓存 =================
+# 以 (模型名, 提示词哈希, 数据窗口哈希, 生成参数) 为键的内容寻址磁盘缓存。
+# 提示词.md 与提交的 K 线窗口都没变化时 (例如没有新 K 线收盘就重跑 watchlist)，直接复用上次的分析结果，
+# 不再调用 Gemini，也就不会触发 429 退避。
+# 每个条目一个 JSON 文件 (原子写入)，按写入时间 (created) 与 TTL 过期；总大小超过上限时按最近使用时间淘汰最旧的条目。
+# 两个时间都记在文件时间戳上: 修改时间 = created，访问时间 = 最近使用 (命中时用 utime 显式设置，不依赖挂载选项)，
+# 淘汰时只需 stat，不必逐个解析 JSON。
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("AI_CACHE_DIR", os.path.join(HERE, ".ai_cache"))
+DEFAULT_TTL = 7 * 24 * 3600          # 秒
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(model, system_prompt, data_context, config=None):
+    """
+    缓存键: 模型、提示词、数据窗口、生成参数任一变化都会得到不同的键
+    """
+    parts = [model, sha256(system_prompt), sha256(data_context), json.dumps(config or {}, sort_keys=True)]
+    return sha256("|".join(parts))
+
+
+def _entry_path(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{key}.json")
+
+
+def get(key, ttl=DEFAULT_TTL, cache_dir=None):
+    """
+    读取缓存，未命中或已过期返回 None。命中时刷新文件访问时间 (用于 LRU 淘汰)，修改时间保持为 created
+    """
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if ttl is not None and time.time() - entry.get("created", 0) > ttl:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    try:
+        os.utime(path, (time.time(), entry.get("created", 0)))
+    except OSError:
+        pass
+    return entry.get("text")
+
+
+def put(key, text, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, **meta):
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    created = time.time()
+    entry = dict(meta, key=key, created=created, text=text)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".ai_cache_", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.utime(tmp_path, (created, created))
+    os.replace(tmp_path, _entry_path(key, cache_dir))
+    evict(cache_dir=cache_dir, max_bytes=max_bytes)
+
+
+def _entries(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return []
+    result = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        # (最近使用, 写入时间, 大小, 路径)
+        result.append((st.st_atime, st.st_mtime, st.st_size, path))
+    return result
+
+
+def _created(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("created", 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def evict(cache_dir=None, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    删除过期条目，并在总大小超过 max_bytes 时按最近使用时间从旧到新删除，返回删除的条目数。
+    过期按文件修改时间 (= created) 筛出候选，只解析候选条目核对 created，与 get() 的判断一致；
+    LRU 按文件访问时间排序
+    """
+    entries = sorted(_entries(cache_dir or CACHE_DIR))
+    now = time.time()
+    removed = 0
+    total = sum(size for _, _, size, _ in entries)
+    for _, mtime, size, path in entries:
+        expired = ttl is not None and now - mtime > ttl and now - _created(path) > ttl
+        if not expired and (max_bytes is None or total <= max_bytes):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def clear(cache_dir=None):
+    removed = 0
+    for _, _, _, path in _entries(cache_dir or CACHE_DIR):
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def stats(cache_dir=None):
+    entries = _entries(cache_dir or CACHE_DIR)
+    return {"entries": len(entries), "bytes": sum(size for _, _, size, _ in entries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI 分析结果缓存管理')
+    parser.add_argument('--clear', action='store_true', help='清空缓存')
+    parser.add_argument('--evict', action='store_true', help='按 TTL / 大小上限清理缓存')
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"🗑️ 已删除 {clear()} 条缓存")
+    elif args.evict:
+        print(f"🧹 已淘汰 {evict()} 条缓存")
+    s = stats()
+    print(f"📦 缓存目录: {CACHE_DIR} ({s['entries']} 条, {s['bytes'] / 1024:.1f} KB)")
+
+
+if __name__ == "__main__":
+    main()
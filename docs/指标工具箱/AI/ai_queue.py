@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import ai_analyze
+import ai_cache
+import pipeline_metrics
+import prompt_payload
+
+# ================= 并发 AI 分析队列 =================
+# ai_analyze.get_ai_analysis 是阻塞的 requests.post + 进程内 sleep 重试，N 个交易对需要 N × (延迟 + 退避) 串行耗时。
+# 这里用 asyncio 同时处理多个 (csv, history) 任务:
+# - 所有任务共享一个 每分钟请求数 (RPM) + 每分钟 token 数 (TPM) 的预算
+# - 429 时按 Retry-After (否则指数退避) 暂停整个队列，而不是只让单个任务睡眠
+# - 每个任务完成后立即写入对应的 *_Wyckoff_Analysis.md，并记录 排队 / 限流等待 / 请求延迟
+# HTTP 请求本身仍用 requests，放到线程中执行 (asyncio.to_thread)，不引入新的依赖。
+
+# Gemini Flash 免费层的默认限额
+DEFAULT_RPM = 10
+DEFAULT_TPM = 250000
+DEFAULT_CONCURRENCY = 4
+MAX_RETRIES = 6
+RETRY_DELAY = 10
+
+
+class AsyncBudget:
+    """
+    asyncio 版的双令牌桶: 请求数与 token 数各一个桶，按每分钟上限匀速补充
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.limits = {"requests": float(rpm), "tokens": float(tpm)}
+        self.levels = dict(self.limits)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            for name, limit in self.limits.items():
+                self.levels[name] = min(limit, self.levels[name] + elapsed * limit / 60.0)
+            self.updated = now
+
+    async def acquire(self, tokens):
+        """
+        等待直到同时有 1 个请求额度与 tokens 个 token 额度，返回等待的秒数
+        """
+        need = {"requests": 1.0, "tokens": min(float(tokens), self.limits["tokens"])}
+        waited = 0.0
+        while True:
+            async with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    delay = max((need[n] - self.levels[n]) * 60.0 / self.limits[n] for n in need)
+                    if delay <= 0:
+                        for n in need:
+                            self.levels[n] -= need[n]
+                        return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """
+        收到 429 后暂停所有任务，并清空请求额度
+        """
+        now = time.monotonic()
+        self._refill(now)
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.levels["requests"] = 0.0
+
+
+def _store(job, key, text, output_dir, metrics, put):
+    """
+    写入缓存与报告。磁盘错误只让当前任务失败，不影响其他并发中的任务
+    """
+    try:
+        if put:
+            ai_cache.put(key, text, model=ai_analyze.MODEL_NAME)
+        ai_analyze.save_report(job["name"], text, output_dir)
+    except OSError as e:
+        print(f"❌ {job['name']}: 无法写入缓存或报告: {e}")
+        metrics["status"] = "error"
+    return metrics
+
+
+async def _run_job(job, api_url, system_prompt, budget, semaphore, output_dir, use_cache):
+    metrics = {"name": job["name"], "index": job["index"], "status": "ok", "cached": False, "attempts": 0,
+               "queue": 0.0, "wait": 0.0, "latency": 0.0, "tokens": job["stats"]["tokens"]}
+    key = ai_cache.cache_key(ai_analyze.MODEL_NAME, system_prompt, job["data"], ai_analyze.GENERATION_CONFIG)
+    if use_cache:
+        text = ai_cache.get(key)
+        if text is not None:
+            metrics["cached"] = True
+            pipeline_metrics.count("ai_cache_hits")
+            return _store(job, key, text, output_dir, metrics, put=False)
+
+    payload = ai_analyze.build_request(system_prompt, job["data"])
+    async with semaphore:
+        metrics["queue"] = time.perf_counter() - job["submitted"]
+        retry_delay = RETRY_DELAY
+        for attempt in range(MAX_RETRIES):
+            metrics["attempts"] = attempt + 1
+            metrics["wait"] += await budget.acquire(job["stats"]["tokens"])
+            t0 = time.perf_counter()
+            status, result = await asyncio.to_thread(ai_analyze.post_once, payload, api_url)
+            metrics["latency"] += time.perf_counter() - t0
+            if status == "ok":
+                return _store(job, key, result, output_dir, metrics, put=use_cache)
+            if status == "retry":
+                wait = result or retry_delay
+                retry_delay *= 2
+                print(f"⚠️ {job['name']} 触发频率限制 (429)，队列暂停 {wait} 秒... ({attempt + 1}/{MAX_RETRIES})")
+                pipeline_metrics.count("ai_retries")
+                pipeline_metrics.count("ai_backoff_s", wait)
+                budget.pause(wait)
+                continue
+            print(f"❌ {job['name']}: {result}")
+            metrics["status"] = "error"
+            return metrics
+
+    print(f"❌ {job['name']}: 重试次数耗尽")
+    metrics["status"] = "retries exhausted"
+    return metrics
+
+
+async def run_jobs(jobs, api_url, system_prompt=None, output_dir=ai_analyze.OUTPUT_DIR, concurrency=DEFAULT_CONCURRENCY,
+                   rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, use_cache=True):
+    """
+    并发执行已准备好的任务 [{"name", "data", "stats"}, ...]，按完成顺序写入报告，
+    返回各任务指标列表 (按完成顺序，metrics["index"] 为任务在 jobs 中的位置)
+    """
+    if system_prompt is None:
+        system_prompt = ai_analyze.load_system_prompt()
+    prompt_tokens = prompt_payload.estimate_tokens(system_prompt)
+    for i, job in enumerate(jobs):
+        job["index"] = i
+        job["stats"] = dict(job["stats"], tokens=job["stats"]["tokens"] + prompt_tokens)
+        job["submitted"] = time.perf_counter()
+
+    budget = AsyncBudget(rpm, tpm)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(_run_job(job, api_url, system_prompt, budget, semaphore, output_dir, use_cache))
+             for job in jobs]
+    results = []
+    for task in asyncio.as_completed(tasks):
+        results.append(await task)
+    return results
+
+
+def analyze_many(csv_paths, history, api_url, system_prompt=None, output_dir=ai_analyze.OUTPUT_DIR,
+                 encoding=prompt_payload.DEFAULT_ENCODING, factor=1, events=True, **kwargs):
+    """
+    同步入口: 准备每个 CSV 的数据载荷后并发分析，返回 {csv_path: 指标}
+    """
+    jobs = []
+    with pipeline_metrics.stage("prepare", jobs=len(csv_paths), encoding=encoding):
+        for path in csv_paths:
+            name, data, stats = ai_analyze.prepare_data(path, history, encoding, factor, events=events)
+            jobs.append({"name": name, "data": data, "stats": stats, "csv_path": path})
+            pipeline_metrics.count("rows_parsed", stats["bars"])
+            pipeline_metrics.count("prompt_tokens", stats["tokens"])
+    with pipeline_metrics.stage("ai_queue", jobs=len(jobs)):
+        results = asyncio.run(run_jobs(jobs, api_url, system_prompt, output_dir, **kwargs))
+    # 按任务位置对应，不同目录下同名的 CSV 各自保留指标
+    by_index = {m["index"]: m for m in results}
+    return {job["csv_path"]: by_index[i] for i, job in enumerate(jobs)}
+
+
+def print_metrics(results):
+    header = f"{'JOB':<18}{'QUEUE':>8}{'WAIT':>8}{'LATENCY':>9}{'TRIES':>7}{'TOKENS':>8}  STATUS"
+    print("\n⏱️ AI 分析队列指标 (秒)")
+    print(header)
+    print("-" * len(header))
+    for m in results:
+        status = "cached" if m["cached"] else m["status"]
+        print(f"{m['name']:<18}{m['queue']:>8.2f}{m['wait']:>8.2f}{m['latency']:>9.2f}{m['attempts']:>7}{m['tokens']:>8}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='并发执行多个 Gemini 威科夫分析任务 (共享限流预算)')
+    parser.add_argument('csv_paths', nargs='+', help='清洗后的 CSV 数据路径 (可多个)')
+    parser.add_argument('--history', type=int, default=400, help='提交给 AI 的历史 K 线行数 (默认 400)')
+    parser.add_argument('--encoding', choices=prompt_payload.ENCODINGS, default=prompt_payload.DEFAULT_ENCODING, help='数据编码')
+    parser.add_argument('--downsample', type=int, default=1, help='较早的 K 线每 N 根合并为一根')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help=f'同时进行的请求数 (默认 {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rpm', type=int, default=DEFAULT_RPM, help=f'每分钟请求数上限 (默认 {DEFAULT_RPM})')
+    parser.add_argument('--tpm', type=int, default=DEFAULT_TPM, help=f'每分钟 token 上限 (默认 {DEFAULT_TPM})')
+    parser.add_argument('--no-cache', action='store_true', help='忽略分析缓存，强制调用 API')
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure_from_args("ai_queue", args)
+
+    api_url = ai_analyze.get_api_url()
+    if not api_url:
+        print("❌ 未找到 GOOGLE_API_KEY，请检查 .env 文件。")
+        sys.exit(1)
+    missing = [p for p in args.csv_paths if not os.path.exists(p)]
+    if missing:
+        print(f"❌ 找不到文件: {', '.join(missing)}")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    results = analyze_many(args.csv_paths, args.history, api_url, encoding=args.encoding, factor=args.downsample,
+                           concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm, use_cache=not args.no_cache)
+    print_metrics(results.values())
+    print(f"\n✅ {len(results)} 个任务完成，总耗时 {time.perf_counter() - t0:.2f} 秒")
+    if any(m["status"] != "ok" for m in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import run_bench
+from run_bench import RESULTS_DIR, measure, git_info, environment, compare
+
+import synth_klines
+import redk_everex
+
+# ================= RedK EVEREX 引擎基准测试 =================
+# 同一份合成 K 线上对比三种计算方式，并校验结果一致:
+#   naive        按 Pine 公式逐句翻译的 pandas 写法 (WMA / HMA 用 rolling().apply 逐窗口加权)
+#   batch        redk_everex.compute (np.convolve / ewm 向量化)
+#   incremental  redk_everex.EverexEngine 逐根 update (实时模式，每根 O(1))
+# 另外模拟扫描器的用法: --symbols 个交易对，每个只计算最近 --scan-tail 根 (加上预热)，记录总耗时。
+# 结果格式与 run_bench.py 相同，可以用 --compare 与之前的结果对比。
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_REPEAT = 3
+# 逐根增量计算最多测这么多根 (更大的规模按每根耗时线性外推没有意义)
+DEFAULT_INCREMENTAL_BARS = 50_000
+DEFAULT_SYMBOLS = 200
+DEFAULT_SCAN_TAIL = 1000
+DEFAULT_MA_TYPE = "WMA"
+
+
+# ----------------- 朴素 pandas 实现 (对照组) -----------------
+def _naive_ma(s, n, ma_type):
+    # 与 Pine 一致忽略 na: 去掉 NaN 计算后按原索引前向填充
+    x = s.dropna()
+    if ma_type == "SMA":
+        out = x.rolling(n).mean()
+    elif ma_type in ("EMA", "RMA"):
+        alpha = 2.0 / (n + 1) if ma_type == "EMA" else 1.0 / n
+        seeded = x.copy()
+        if len(x) >= n:
+            seeded.iloc[n - 1] = x.iloc[:n].mean()
+        out = seeded.iloc[n - 1:].ewm(alpha=alpha, adjust=False).mean().reindex(x.index)
+    elif ma_type == "HMA":
+        half, root = max(n // 2, 1), max(int(np.sqrt(n)), 1)
+        out = _naive_ma(2 * _naive_ma(x, half, "WMA") - _naive_ma(x, n, "WMA"), root, "WMA")
+    else:
+        weights = np.arange(1, n + 1, dtype=float)
+        out = x.rolling(n).apply(lambda w: (w * weights).sum() / weights.sum(), raw=True)
+    return out.reindex(s.index).ffill().where(s.notna().cumsum() > 0)
+
+
+def _naive_normalize(value, avg):
+    x = (value / avg).replace([np.inf, -np.inf], np.nan).round(10)
+    out = pd.Series(0.1, index=value.index)
+    for threshold, band in reversed(redk_everex.NORMALIZE_BANDS):
+        out[x > threshold] = band
+    return out
+
+
+def naive_compute(open_, high, low, close, volume, params=None):
+    p = dict(redk_everex.DEFAULT_PARAMS, **(params or {}))
+    o, h, l, c, v = (pd.Series(np.asarray(a, dtype=float)) for a in (open_, high, low, close, volume))
+    lk = "SMA" if p["lookback_calc"] == "Simple" else p["ma_type"]
+    lb = p["lookback"]
+
+    def div(a, b):
+        return (a / b).replace([np.inf, -np.inf], np.nan)
+
+    vol_n = _naive_normalize(v, _naive_ma(v, lb, lk)) * 100
+    spread, bar_range = c - o, h - l
+    low2 = l.rolling(2).min()
+    r2 = h.rolling(2).max() - low2
+    shift = c.diff()
+    price_n = (div(2 * (c - l), bar_range) * 100 - 100
+               + div(spread, bar_range) * 100
+               + _naive_normalize(spread.abs(), _naive_ma(spread.abs(), lb, lk)) * 100 * np.sign(spread)
+               + div(2 * (c - low2), r2) * 100 - 100
+               + div(shift, r2) * 100
+               + _naive_normalize(shift.abs(), _naive_ma(shift.abs(), lb, lk)) * 100 * np.sign(shift)) / 6
+    bar_flow = price_n * vol_n / 100
+    bulls, bears = bar_flow.clip(lower=0), -bar_flow.clip(upper=0)
+
+    def rrof(n, ma_type):
+        return 2 * (100 - 100 / (1 + div(_naive_ma(bulls, n, ma_type), _naive_ma(bears, n, ma_type)))) - 100
+
+    rrof_s = _naive_ma(rrof(p["length"], p["ma_type"]), p["smooth"], "WMA")
+    signal = _naive_ma(rrof_s, p["sig_length"], p["sig_type"])
+    bias = _naive_ma(rrof(p["bias_length"], p["bias_type"]), p["smooth"], "WMA")
+    prev = rrof_s.shift(1)
+    return {"rrof_s": rrof_s.to_numpy(), "signal": signal.to_numpy(), "bias": bias.to_numpy(),
+            "alert_up": ((rrof_s > 0) & (prev <= 0)).to_numpy(), "alert_dn": ((rrof_s < 0) & (prev >= 0)).to_numpy()}
+
+
+def agreement(naive, batch):
+    """
+    朴素实现与向量化实现的差异 (浮点最大误差 / 提醒不一致的根数)
+    """
+    out = {}
+    for key in ("rrof_s", "signal", "bias"):
+        a, b = naive[key], batch[key]
+        same_nan = bool(np.array_equal(np.isnan(a), np.isnan(b)))
+        out[key] = float(np.nanmax(np.abs(a - b))) if same_nan and np.isfinite(a).any() else None
+    for key in ("alert_up", "alert_dn"):
+        out[key] = int((naive[key] != batch[key]).sum())
+    return out
+
+
+# ----------------- 基准 -----------------
+def _arrays(records):
+    return [records[c].astype(float) for c in ("Open", "High", "Low", "Close", "Volume")]
+
+
+def bench_size(bars, params, seed, repeat, incremental_bars):
+    records, _ = synth_klines.generate(bars, "1m", seed)
+    arrays = _arrays(records)
+    stages = {}
+    stages["naive"], naive = measure(lambda: naive_compute(*arrays, params=params), repeat)
+    stages["batch"], batch = measure(lambda: redk_everex.compute(*arrays, params=params), repeat)
+    n_inc = min(bars, incremental_bars)
+    stages["incremental"], _ = measure(lambda: redk_everex.replay(*(a[:n_inc] for a in arrays), params=params), 1)
+    for name, rows in (("naive", bars), ("batch", bars), ("incremental", n_inc)):
+        stages[name]["rows"] = rows
+        stages[name]["rows_per_sec"] = rows / stages[name]["median"] if stages[name]["median"] > 0 else None
+
+    diff = agreement(naive, batch)
+    problems = redk_everex.check(*(a[:min(n_inc, 20_000)] for a in arrays), params=params)
+    speedup = stages["naive"]["median"] / stages["batch"]["median"]
+    print(f"  naive {stages['naive']['median']:.3f}s   batch {stages['batch']['median']:.4f}s ({speedup:.0f}x)   "
+          f"incremental {stages['incremental']['median'] / n_inc * 1e6:.1f}µs/根")
+    print(f"  朴素 vs 向量化: RROF 最大误差 {diff['rrof_s']}, 提醒不一致 {diff['alert_up'] + diff['alert_dn']} 根; "
+          f"增量 vs 批量: {'一致' if not problems else '; '.join(problems)}")
+    return stages, {"naive_vs_batch": diff, "incremental_vs_batch": problems}
+
+
+def bench_scan(symbols, tail, params, seed, repeat):
+    """
+    模拟扫描器: 每个交易对只计算最近 tail 根 (加上预热)，返回总耗时
+    """
+    n = tail + redk_everex.warmup_bars(params)
+    datasets = [_arrays(synth_klines.generate(n, "1m", seed + i)[0]) for i in range(symbols)]
+    timing, _ = measure(lambda: [redk_everex.compute(*arrays, params=params) for arrays in datasets], repeat)
+    timing["rows"] = symbols * n
+    timing["rows_per_sec"] = symbols * n / timing["median"] if timing["median"] > 0 else None
+    print(f"  {symbols} 个交易对 × {n} 根: {timing['median']:.3f}s ({timing['median'] / symbols * 1000:.2f} ms/交易对)")
+    return timing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RedK EVEREX 引擎基准测试 (朴素 pandas / 向量化 / 增量)')
+    parser.add_argument('--bars', type=int, nargs='+', default=DEFAULT_SIZES, help='合成数据规模 (可多个，默认 1 万与 10 万根)')
+    parser.add_argument('--ma-type', choices=redk_everex.MA_TYPES, default=DEFAULT_MA_TYPE, help='RoF / 信号线 / 情绪的均线类型')
+    parser.add_argument('--seed', type=int, default=synth_klines.DEFAULT_SEED, help='随机种子')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'每项重复次数 (默认 {DEFAULT_REPEAT})')
+    parser.add_argument('--incremental-bars', type=int, default=DEFAULT_INCREMENTAL_BARS, help=f'增量计算最多测试的根数 (默认 {DEFAULT_INCREMENTAL_BARS})')
+    parser.add_argument('--symbols', type=int, default=DEFAULT_SYMBOLS, help=f'扫描测试的交易对数量 (默认 {DEFAULT_SYMBOLS}，0 为跳过)')
+    parser.add_argument('--scan-tail', type=int, default=DEFAULT_SCAN_TAIL, help=f'扫描时每个交易对计算的根数 (默认 {DEFAULT_SCAN_TAIL})')
+    parser.add_argument('--out', default=None, help='结果 JSON 路径 (默认 bench/results/everex_<时间>_<提交>.json)')
+    parser.add_argument('--compare', default=None, help='与之前的结果 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=run_bench.DEFAULT_THRESHOLD, help='判定回归的变慢比例 (默认 0.2)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='存在回归时以非零状态退出')
+    args = parser.parse_args()
+
+    params = {"ma_type": args.ma_type, "sig_type": args.ma_type, "bias_type": args.ma_type}
+    info = git_info()
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": info,
+        "env": environment(),
+        "config": {"repeat": args.repeat, "seed": args.seed, "params": params},
+        "runs": [],
+    }
+    t0 = time.perf_counter()
+    failed = False
+    for bars in args.bars:
+        print(f"\n🏁 {bars:,} 根 1m K 线 ({args.ma_type})")
+        stages, checks = bench_size(bars, params, args.seed, args.repeat, args.incremental_bars)
+        report["runs"].append({"bars": bars, "stages": stages, "checks": checks})
+        failed = failed or bool(checks["incremental_vs_batch"])
+    if args.symbols > 0:
+        print(f"\n🔎 扫描 {args.symbols} 个交易对")
+        timing = bench_scan(args.symbols, args.scan_tail, params, args.seed, args.repeat)
+        report["runs"].append({"bars": args.scan_tail, "stages": {f"scan_{args.symbols}": timing}})
+
+    out = args.out
+    if out is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"everex_{stamp}_{(info['commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ EVEREX 基准测试完成，总耗时 {time.perf_counter() - t0:.1f} 秒")
+    print(f"💾 结果已写入: {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synth_klines
+
+# ================= 本地模拟 Binance K 线接口 =================
+# 在本机端口上提供 /api/v3/klines (参数 symbol / interval / startTime / endTime / limit)，
+# 数据来自内存中的记录数组，返回格式与 data-api.binance.vision 一致，并附带 X-MBX-USED-WEIGHT-1M 响应头。
+# binance_data_pro 的串行分页与并发分段拉取都可以不联网地计时:
+#   BINANCE_API_BASE=http://127.0.0.1:8800 python binance_data_pro.py SYNTHUSDT 1m --days 30
+
+PAGE_LIMIT = 1000
+KLINES_WEIGHT = 2
+
+
+class MockKlines:
+    """
+    {(symbol, interval): 记录数组} 的查询与权重统计 (线程安全)
+    """
+
+    def __init__(self, datasets, latency=0.0):
+        self.datasets = datasets
+        self.latency = latency
+        self.requests = 0
+        self.window_start = time.monotonic()
+        self.window_weight = 0
+        self.lock = threading.Lock()
+
+    def used_weight(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start, self.window_weight = now, 0
+            self.window_weight += KLINES_WEIGHT
+            self.requests += 1
+            return self.window_weight
+
+    def query(self, symbol, interval, start=None, end=None, limit=500):
+        records = self.datasets.get((symbol, interval))
+        if records is None:
+            return None
+        times = records["Open_time"]
+        hi = int(np.searchsorted(times, end, side="right")) if end is not None else len(records)
+        # 只给 endTime (或都不给) 时与交易所一致，返回截止时刻之前最新的 limit 根
+        lo = int(np.searchsorted(times, start, side="left")) if start is not None else max(hi - limit, 0)
+        return synth_klines.to_api_rows(records[lo:min(hi, lo + limit)])
+
+
+def _make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, weight=None):
+            data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if weight is not None:
+                self.send_header("X-MBX-USED-WEIGHT-1M", str(weight))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/api/v3/klines":
+                self._send(404, {"code": -1, "msg": "not found"})
+                return
+            q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            weight = mock.used_weight()
+            if mock.latency:
+                time.sleep(mock.latency)
+            try:
+                start = int(q["startTime"]) if "startTime" in q else None
+                end = int(q["endTime"]) if "endTime" in q else None
+                limit = min(int(q.get("limit", 500)), PAGE_LIMIT)
+            except ValueError:
+                self._send(400, {"code": -1100, "msg": "Illegal characters found in a parameter."}, weight)
+                return
+            rows = mock.query(q.get("symbol", ""), q.get("interval", ""), start, end, limit)
+            if rows is None:
+                self._send(400, {"code": -1121, "msg": "Invalid symbol."}, weight)
+                return
+            self._send(200, rows, weight)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(datasets, port=0, latency=0.0):
+    """
+    在后台线程启动模拟服务，返回 (server, mock, base_url)。port=0 时自动选择空闲端口
+    """
+    mock = MockKlines(datasets, latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(mock))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, mock, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 Binance K 线接口 (合成数据)')
+    parser.add_argument('--symbol', default='SYNTHUSDT', help='交易对名称 (默认 SYNTHUSDT)')
+    parser.add_argument('--interval', default='1m', help='周期 (默认 1m)')
+    parser.add_argument('--bars', type=int, default=synth_klines.DEFAULT_BARS, help='合成 K 线根数')
+    parser.add_argument('--seed', type=int, default=synth_klines.DEFAULT_SEED, help='随机种子')
+    parser.add_argument('--port', type=int, default=8800, help='监听端口 (默认 8800)')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求附加的延迟 (秒)')
+    args = parser.parse_args()
+
+    records, _ = synth_klines.generate(args.bars, args.interval, args.seed)
+    server, mock, base_url = start_server({(args.symbol.upper(), args.interval): records}, args.port, args.latency)
+    print(f"🛰️ 模拟接口已启动: {base_url}/api/v3/klines ({args.symbol.upper()} {args.interval}, {len(records)} 根)")
+    print(f"   使用方式: BINANCE_API_BASE={base_url} python binance_data_pro.py {args.symbol.upper()} {args.interval}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n🛑 已停止 (共处理 {mock.requests} 个请求)")
+        stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
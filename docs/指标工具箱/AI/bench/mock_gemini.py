@@ -0,0 +1,133 @@
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+# ================= 本地模拟 Gemini generateContent 接口 =================
+# 在本机端口上提供 POST /v1beta/models/{模型}:generateContent，返回格式与 Gemini 一致，分析文本由提示词哈希生成。
+# 可以让前 N 个请求返回 429 (附带 Retry-After)，并统计请求数，用于不联网、不消耗配额地复现
+# 分析缓存命中、--no-cache 强制调用、429 退避重试与 ai_queue 并发等路径:
+#   python bench/mock_gemini.py --rate-limit 1 --retry-after 2
+#   GEMINI_API_BASE=http://127.0.0.1:8801 GOOGLE_API_KEY=test python ai_analyze.py ADAUSDC_4h_Cleaned.csv
+
+DEFAULT_PORT = 8801
+
+
+class MockGemini:
+    """
+    请求计数与 429 注入 (线程安全)。rate_limit: 前 N 个请求返回 429；every: 之后每 N 个请求返回一次 429 (0 为不限制)
+    """
+
+    def __init__(self, rate_limit=0, every=0, retry_after=1, latency=0.0):
+        self.rate_limit = rate_limit
+        self.every = every
+        self.retry_after = retry_after
+        self.latency = latency
+        self.requests = 0
+        self.ok = 0
+        self.limited = 0
+        self.lock = threading.Lock()
+
+    def next_status(self):
+        with self.lock:
+            self.requests += 1
+            n = self.requests
+            limited = n <= self.rate_limit or (self.every and (n - self.rate_limit) % self.every == 0)
+            if limited:
+                self.limited += 1
+            else:
+                self.ok += 1
+            return (429 if limited else 200), n
+
+    def counts(self):
+        with self.lock:
+            return {"requests": self.requests, "ok": self.ok, "limited": self.limited}
+
+    @staticmethod
+    def analysis(prompt, n):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        return f"# 模拟分析报告\n\n提示词指纹: {digest}\n请求序号: {n}\n"
+
+
+def _make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if not (url.path.startswith("/v1beta/models/") and url.path.endswith(":generateContent")):
+                self._send(404, {"error": {"code": 404, "message": "not found"}})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = "".join(part.get("text", "") for c in payload["contents"] for part in c["parts"])
+            except (ValueError, KeyError, TypeError):
+                self._send(400, {"error": {"code": 400, "message": "Invalid JSON payload received."}})
+                return
+            status, n = mock.next_status()
+            if mock.latency:
+                time.sleep(mock.latency)
+            if status == 429:
+                self._send(429, {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}},
+                           {"Retry-After": str(mock.retry_after)})
+                return
+            self._send(200, {"candidates": [{"content": {"parts": [{"text": mock.analysis(prompt, n)}], "role": "model"}}]})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(port=0, **kwargs):
+    """
+    在后台线程启动模拟服务，返回 (server, mock, base_url)。port=0 时自动选择空闲端口，kwargs 见 MockGemini
+    """
+    mock = MockGemini(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(mock))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, mock, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stop_server(server):
+    server.shutdown()
+    server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟 Gemini generateContent 接口 (可注入 429)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'监听端口 (默认 {DEFAULT_PORT})')
+    parser.add_argument('--rate-limit', type=int, default=0, help='前 N 个请求返回 429 (默认 0)')
+    parser.add_argument('--every', type=int, default=0, help='之后每 N 个请求返回一次 429 (默认 0 不限制)')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 响应的 Retry-After 秒数 (默认 1)')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求附加的延迟 (秒)')
+    args = parser.parse_args()
+
+    server, mock, base_url = start_server(args.port, rate_limit=args.rate_limit, every=args.every,
+                                          retry_after=args.retry_after, latency=args.latency)
+    print(f"🛰️ 模拟 Gemini 已启动: {base_url}/v1beta/models/<模型>:generateContent")
+    print(f"   使用方式: GEMINI_API_BASE={base_url} GOOGLE_API_KEY=test python ai_analyze.py <CSV>")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        c = mock.counts()
+        print(f"\n🛑 已停止 (共 {c['requests']} 个请求: {c['ok']} 个成功, {c['limited']} 个 429)")
+        stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
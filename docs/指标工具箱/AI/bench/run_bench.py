@@ -0,0 +1,281 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+import subprocess
+
+# 基准测试只写图片文件，不需要图形界面
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+AI_DIR = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, AI_DIR)
+sys.path.insert(0, os.path.join(AI_DIR, "output"))
+
+import numpy as np
+import pandas as pd
+
+import binance_data_pro
+import kline_cache
+import prompt_payload
+import wyckoff_events
+import wyckoff_plot
+import synth_klines
+import mock_binance
+from rate_limit import TokenBucket
+
+# ================= 流水线基准测试 =================
+# 用合成 K 线 (synth_klines) 对现有代码路径逐阶段计时，结果写入 JSON，便于在不同提交之间对比:
+#   generate          合成数据生成 (参考值)
+#   fetch / fetch_concurrent  binance_data_pro 串行分页 / 并发分段拉取 (本地模拟接口 mock_binance)
+#   clean             clean_klines 清洗 API 原始数据
+#   store             kline_store.write_klines 写入 CSV + 二进制缓存
+#   load_csv / load_cache / load_tail  解析整个 CSV / 读取二进制缓存 / 只读取图表窗口
+#   analyze           wyckoff_plot.analyze_structure (第 3 节结构分析)
+#   detect            wyckoff_events.detect_events 全历史事件识别
+#   render_mpf / render_fast  mpf.plot 绘图 / 复用画布的快速绘图
+#   prompt            prompt_payload.build_payload (各编码方式)
+# 每个阶段重复 --repeat 次，记录每次耗时、最小值与中位数。
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_REPEAT = 3
+DEFAULT_FETCH_BARS = 20_000
+DEFAULT_FETCH_WORKERS = 4
+DEFAULT_THRESHOLD = 0.2
+RESULTS_DIR = os.path.join(HERE, "results")
+SYMBOL = "SYNTHUSDT"
+
+STAGES = ["generate", "fetch", "fetch_concurrent", "clean", "store", "load_csv", "load_cache", "load_tail",
+          "analyze", "detect", "render_mpf", "render_fast", "prompt"]
+
+
+def measure(fn, repeat, setup=None, quiet=True):
+    """
+    执行 fn repeat 次 (每次之前执行 setup)，返回 (计时结果, 最后一次的返回值)
+    """
+    runs = []
+    result = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        sink = io.StringIO()
+        with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+            t0 = time.perf_counter()
+            result = fn()
+            runs.append(time.perf_counter() - t0)
+    return {"best": min(runs), "median": statistics.median(runs), "runs": runs}, result
+
+
+def git_info():
+    def git(*args):
+        try:
+            out = subprocess.run(["git", *args], cwd=AI_DIR, capture_output=True, text=True, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return out.stdout.strip() if out.returncode == 0 else None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+def environment():
+    import matplotlib
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+    }
+
+
+def bench_size(bars, stages, interval, seed, repeat, fetch_bars, fetch_workers, quiet=True):
+    """
+    对 bars 根合成数据运行选定的阶段，返回 {阶段: 计时结果}
+    """
+    results = {}
+
+    def record(name, timing, rows=None, **extra):
+        if rows:
+            timing["rows"] = rows
+            timing["rows_per_sec"] = rows / timing["median"] if timing["median"] > 0 else None
+        timing.update(extra)
+        results[name] = timing
+        rate = f", {timing['rows_per_sec']:,.0f} 行/秒" if timing.get("rows_per_sec") else ""
+        print(f"  {name:<17}{timing['median']:>9.4f} 秒 (最小 {timing['best']:.4f}){rate}")
+
+    timing, (records, phases) = measure(lambda: synth_klines.generate(bars, interval, seed), 1 if "generate" not in stages else repeat)
+    if "generate" in stages:
+        record("generate", timing, bars, phases=len(phases))
+
+    work_dir = tempfile.mkdtemp(prefix="wyckoff_bench_")
+    try:
+        raw = None
+        if {"fetch", "fetch_concurrent", "clean"} & set(stages):
+            n = min(fetch_bars, bars)
+            server, mock, base_url = mock_binance.start_server({(SYMBOL, interval): records})
+            old_url, old_bucket = binance_data_pro.BASE_URL, binance_data_pro._bucket
+            # 指向本地模拟接口，并放宽令牌桶，只测量请求与解析本身
+            binance_data_pro.BASE_URL = f"{base_url}/api/v3/klines"
+            binance_data_pro._bucket = TokenBucket(10 ** 9)
+            start_ts = int(records["Open_time"][-n])
+            try:
+                if "fetch" in stages:
+                    timing, raw = measure(lambda: binance_data_pro.fetch_all_data(SYMBOL, interval, start_ts), repeat, quiet=quiet)
+                    record("fetch", timing, len(raw), requests=mock.requests)
+                if "fetch_concurrent" in stages:
+                    before = mock.requests
+                    timing, raw = measure(lambda: binance_data_pro.fetch_concurrent(SYMBOL, interval, start_ts, fetch_workers),
+                                          repeat, quiet=quiet)
+                    record("fetch_concurrent", timing, len(raw), workers=fetch_workers, requests=mock.requests - before)
+                if raw is None:
+                    raw = synth_klines.to_api_rows(records[-n:])
+            finally:
+                binance_data_pro.BASE_URL, binance_data_pro._bucket = old_url, old_bucket
+                mock_binance.stop_server(server)
+            if "clean" in stages:
+                timing, _ = measure(lambda: binance_data_pro.clean_klines(raw), repeat, quiet=quiet)
+                record("clean", timing, len(raw))
+
+        timing, csv_path = measure(lambda: synth_klines.write_store(records, work_dir, SYMBOL, interval),
+                                   repeat if "store" in stages else 1, quiet=quiet)
+        if "store" in stages:
+            record("store", timing, bars, csv_bytes=os.path.getsize(csv_path))
+
+        def drop_cache():
+            for path in kline_cache.cache_paths(csv_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        if "load_csv" in stages:
+            timing, _ = measure(lambda: kline_cache.load_klines(csv_path), repeat, setup=drop_cache, quiet=quiet)
+            record("load_csv", timing, bars)
+        if "load_cache" in stages:
+            kline_cache.load_klines(csv_path)
+            timing, _ = measure(lambda: kline_cache.load_klines(csv_path), repeat, quiet=quiet)
+            record("load_cache", timing, bars)
+
+        tail = wyckoff_plot.WINDOW + wyckoff_plot.AD_LOOKBACK
+        timing, df = measure(lambda: wyckoff_plot.load_data(csv_path, tail=tail), repeat, quiet=quiet)
+        if "load_tail" in stages:
+            record("load_tail", timing, len(df))
+
+        structure = None
+        if {"analyze", "render_mpf", "render_fast"} & set(stages):
+            timing, structure = measure(lambda: wyckoff_plot.analyze_structure(df), repeat, quiet=quiet)
+            if "analyze" in stages:
+                record("analyze", timing, len(df))
+
+        if "detect" in stages:
+            arrays = [np.asarray(records[c], dtype=float) for c in ("High", "Low", "Close", "Volume")]
+            timing, (events, ranges) = measure(lambda: wyckoff_events.detect_events(*arrays), repeat, quiet=quiet)
+            record("detect", timing, bars, events=len(events), ranges=len(ranges))
+
+        png = os.path.join(work_dir, "bench_chart.png")
+        if "render_mpf" in stages:
+            wyckoff_plot.configure_font()
+            timing, _ = measure(lambda: wyckoff_plot.plot_chart(structure, "SYNTH_BENCH", png), repeat, quiet=quiet)
+            record("render_mpf", timing, len(structure["plot_df"]))
+        if "render_fast" in stages:
+            wyckoff_plot.get_template()
+            timing, _ = measure(lambda: wyckoff_plot.get_template().render(structure, "SYNTH_BENCH", png), repeat, quiet=quiet)
+            record("render_fast", timing, len(structure["plot_df"]))
+
+        if "prompt" in stages:
+            history = wyckoff_plot.WINDOW
+            window = kline_cache.load_klines(csv_path, tail=history, lookback=prompt_payload.EVENT_LOOKBACK)
+            for encoding in prompt_payload.ENCODINGS:
+                timing, (_, stats) = measure(lambda: prompt_payload.build_payload(window, history, encoding), repeat, quiet=quiet)
+                record(f"prompt_{encoding}", timing, stats["bars"], tokens=stats["tokens"], bytes=stats["bytes"])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    按 (数据规模, 阶段) 对比中位数耗时，返回变慢超过 threshold 的条目列表
+    """
+    old = {(run["bars"], name): t["median"] for run in baseline["runs"] for name, t in run["stages"].items()}
+    base_commit = (baseline.get("git") or {}).get("commit") or "?"
+    print(f"\n📊 对比基线 {base_commit[:10]} (变慢超过 {threshold:.0%} 标记为回归)")
+    header = f"{'BARS':>10}  {'STAGE':<18}{'BASE':>10}{'NOW':>10}{'RATIO':>8}"
+    print(header)
+    print("-" * len(header))
+    regressions = []
+    for run in current["runs"]:
+        for name, t in run["stages"].items():
+            before = old.get((run["bars"], name))
+            if not before:
+                continue
+            ratio = t["median"] / before
+            flag = ""
+            if ratio > 1 + threshold:
+                flag = "  ⚠️ 回归"
+                regressions.append((run["bars"], name, ratio))
+            elif ratio < 1 / (1 + threshold):
+                flag = "  🚀"
+            print(f"{run['bars']:>10}  {name:<18}{before:>10.4f}{t['median']:>10.4f}{ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='威科夫流水线基准测试 (合成数据)')
+    parser.add_argument('--bars', type=int, nargs='+', default=DEFAULT_SIZES, help='合成数据规模 (可多个，默认 1 万与 10 万根)')
+    parser.add_argument('--interval', default='1m', help='周期 (默认 1m)')
+    parser.add_argument('--seed', type=int, default=synth_klines.DEFAULT_SEED, help='随机种子')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='运行的阶段 (默认全部)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'每个阶段重复次数 (默认 {DEFAULT_REPEAT})')
+    parser.add_argument('--fetch-bars', type=int, default=DEFAULT_FETCH_BARS, help=f'拉取阶段的 K 线根数上限 (默认 {DEFAULT_FETCH_BARS})')
+    parser.add_argument('--fetch-workers', type=int, default=DEFAULT_FETCH_WORKERS, help='并发拉取线程数')
+    parser.add_argument('--out', default=None, help='结果 JSON 路径 (默认 bench/results/<时间>_<提交>.json)')
+    parser.add_argument('--compare', default=None, help='与之前的结果 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='判定回归的变慢比例 (默认 0.2)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='存在回归时以非零状态退出')
+    parser.add_argument('--verbose', action='store_true', help='显示被测代码自身的输出')
+    args = parser.parse_args()
+
+    info = git_info()
+    report = {
+        "created": pd.Timestamp.now(tz="UTC").isoformat(),
+        "git": info,
+        "env": environment(),
+        "config": {"interval": args.interval, "seed": args.seed, "repeat": args.repeat,
+                   "fetch_bars": args.fetch_bars, "fetch_workers": args.fetch_workers},
+        "runs": [],
+    }
+    t0 = time.perf_counter()
+    for bars in args.bars:
+        print(f"\n🏁 {bars:,} 根 {args.interval} K 线")
+        stages = bench_size(bars, args.stages, args.interval, args.seed, args.repeat,
+                            args.fetch_bars, args.fetch_workers, quiet=not args.verbose)
+        report["runs"].append({"bars": bars, "stages": stages})
+
+    out = args.out
+    if out is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{stamp}_{(info['commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 基准测试完成，总耗时 {time.perf_counter() - t0:.1f} 秒")
+    print(f"💾 结果已写入: {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import run_bench
+from run_bench import AI_DIR, RESULTS_DIR, measure, git_info, environment, compare
+
+import synth_klines
+import wyckoff_plot
+
+# ================= 命令行启动开销基准测试 =================
+# 逐个脚本计时 `python <脚本> --help` (解释器启动 + 模块导入 + 参数解析)，
+# 并用 python -X importtime 列出每个脚本导入耗时最多的模块，检查重量级依赖 (pandas / matplotlib / requests) 是否被推迟导入。
+# 另外对比同一张图的两种运行方式，量化每次新开进程的固定开销:
+#   plot_cold_skip / plot_cold_render   每次启动新进程运行 wyckoff_plot.py (数据未变化跳过 / 强制重绘)
+#   plot_warm_skip / plot_warm_render   同一进程内反复调用 wyckoff_plot.run (wyckoff_batch 进程池的方式)
+# 结果格式与 run_bench.py 相同，可以用 --compare 与之前的结果对比。
+
+SCRIPTS = [
+    ("binance_data_pro", "binance_data_pro.py"),
+    ("wyckoff_plot", os.path.join("output", "wyckoff_plot.py")),
+    ("ai_analyze", "ai_analyze.py"),
+    ("ai_queue", "ai_queue.py"),
+    ("wyckoff_batch", "wyckoff_batch.py"),
+    ("wyckoff_live", "wyckoff_live.py"),
+    ("wyckoff_backtest", "wyckoff_backtest.py"),
+    ("wyckoff_sweep", "wyckoff_sweep.py"),
+    ("kline_resample", "kline_resample.py"),
+]
+
+DEFAULT_REPEAT = 5
+DEFAULT_BARS = 10_000
+DEFAULT_TOP_IMPORTS = 5
+
+# -X importtime 输出行: "import time:  self [us] | cumulative | imported package"
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _run(argv, cwd=AI_DIR):
+    """
+    运行子进程并返回耗时 (秒)，非零退出时报错
+    """
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, *argv], cwd=cwd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if out.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} 退出码 {out.returncode}: {out.stderr.strip()[-500:]}")
+    return elapsed
+
+
+def import_profile(script, top=DEFAULT_TOP_IMPORTS):
+    """
+    python -X importtime 导入脚本模块，返回 (总导入耗时秒, 累计耗时最多的顶层依赖列表)
+    """
+    module = os.path.splitext(os.path.basename(script))[0]
+    path = os.path.dirname(os.path.join(AI_DIR, script))
+    code = f"import sys; sys.path.insert(0, {path!r}); import {module}"
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=AI_DIR, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败: {out.stderr.strip().splitlines()[-1:]}")
+    entries = []
+    for line in out.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            entries.append((len(m.group(3)), m.group(4), int(m.group(2))))
+    # 子模块先于父模块输出，且每深一层缩进多 2 格: 被测模块之前、缩进更深的连续行都是它触发的导入
+    pos = max(i for i, e in enumerate(entries) if e[1] == module)
+    level, _, total = entries[pos]
+    heavy = []
+    for indent, name, cumulative in reversed(entries[:pos]):
+        if indent <= level:
+            break
+        if indent == level + 2:
+            heavy.append((name, cumulative))
+    heavy.sort(key=lambda x: -x[1])
+    return total / 1e6, [{"module": n, "seconds": round(us / 1e6, 4)} for n, us in heavy[:top]]
+
+
+def bench_startup(scripts, repeat, top):
+    stages = {}
+    imports = {}
+    for name, script in scripts:
+        # 预热一次，排除首次读取 .pyc / 字体缓存等磁盘开销
+        _run([script, "--help"])
+        timing, _ = measure(lambda: _run([script, "--help"]), repeat)
+        stages[f"help:{name}"] = timing
+        total, heavy = import_profile(script, top)
+        imports[name] = {"seconds": round(total, 4), "top": heavy}
+        listed = ", ".join(f"{h['module']} {h['seconds']:.2f}s" for h in heavy)
+        print(f"  {name:<18}--help {timing['median']:.3f}s   import {total:.3f}s   ({listed})")
+    return stages, imports
+
+
+def bench_plot(bars, seed, repeat):
+    """
+    同一份数据: 每次新开进程 vs 同一进程内反复调用 wyckoff_plot.run
+    """
+    stages = {}
+    script = os.path.join(AI_DIR, "output", "wyckoff_plot.py")
+    with tempfile.TemporaryDirectory(prefix="startup_bench_") as tmp:
+        records, _ = synth_klines.generate(bars, "1m", seed)
+        csv_path = synth_klines.write_store(records, tmp, run_bench.SYMBOL, "1m")
+        cases = [("skip", []), ("render", ["--force"])]
+        for label, extra in cases:
+            argv = [script, csv_path, "--fast", *extra]
+            _run(argv, cwd=tmp)
+            stages[f"plot_cold_{label}"], _ = measure(lambda: _run(argv, cwd=tmp), repeat)
+        for label, force in cases:
+            run = lambda: wyckoff_plot.run(csv_path, output_dir=tmp, fast=True, force=bool(force))
+            measure(run, 1)
+            stages[f"plot_warm_{label}"], _ = measure(run, repeat)
+    for label, _ in cases:
+        cold, warm = stages[f"plot_cold_{label}"]["median"], stages[f"plot_warm_{label}"]["median"]
+        print(f"  wyckoff_plot {label:<7} 新进程 {cold:.3f}s   进程内 {warm:.3f}s   (固定开销 {cold - warm:.3f}s)")
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description='命令行脚本启动开销基准测试')
+    parser.add_argument('--scripts', nargs='+', choices=[n for n, _ in SCRIPTS], default=[n for n, _ in SCRIPTS], help='测试的脚本 (默认全部)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'每项重复次数 (默认 {DEFAULT_REPEAT})')
+    parser.add_argument('--bars', type=int, default=DEFAULT_BARS, help=f'冷/热运行对比使用的合成 K 线根数 (默认 {DEFAULT_BARS})')
+    parser.add_argument('--seed', type=int, default=synth_klines.DEFAULT_SEED, help='随机种子')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_IMPORTS, help=f'每个脚本列出耗时最多的前 N 个导入 (默认 {DEFAULT_TOP_IMPORTS})')
+    parser.add_argument('--no-plot', action='store_true', help='跳过 wyckoff_plot 冷/热运行对比')
+    parser.add_argument('--out', default=None, help='结果 JSON 路径 (默认 bench/results/startup_<时间>_<提交>.json)')
+    parser.add_argument('--compare', default=None, help='与之前的结果 JSON 对比')
+    parser.add_argument('--threshold', type=float, default=run_bench.DEFAULT_THRESHOLD, help='判定回归的变慢比例 (默认 0.2)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='存在回归时以非零状态退出')
+    args = parser.parse_args()
+
+    info = git_info()
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": info,
+        "env": environment(),
+        "config": {"repeat": args.repeat, "seed": args.seed},
+        "runs": [],
+    }
+    t0 = time.perf_counter()
+    print(f"\n🚀 脚本启动耗时 (中位数，{args.repeat} 次)")
+    stages, imports = bench_startup([s for s in SCRIPTS if s[0] in args.scripts], args.repeat, args.top)
+    report["imports"] = imports
+    if not args.no_plot:
+        print(f"\n🔥 冷启动 vs 进程内复用 ({args.bars:,} 根 1m K 线)")
+        stages.update(bench_plot(args.bars, args.seed, args.repeat))
+    # 与 run_bench 的结果结构一致，bars 为冷/热对比所用的数据规模
+    report["runs"].append({"bars": args.bars, "stages": stages})
+
+    out = args.out
+    if out is None:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"startup_{stamp}_{(info['commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 启动基准测试完成，总耗时 {time.perf_counter() - t0:.1f} 秒")
+    print(f"💾 结果已写入: {out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
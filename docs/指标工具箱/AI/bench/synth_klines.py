@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# bench/ 位于 AI 脚本目录之下
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kline_cache
+import kline_store
+from binance_data_pro import INTERVAL_MS
+
+# ================= 合成 K 线生成器 =================
+# 生成任意长度 (1 万 ~ 1000 万根) 的 OHLCV 序列，按威科夫周期循环嵌入结构:
+#   下跌 -> 吸筹区间 (SC 放量、AR、区间震荡、Spring) -> 上涨 (SOS 放量)
+#        -> 派发区间 (BC 放量、AR、区间震荡、UTAD) -> 下跌 (SOW 放量) -> ...
+# 每段内部全部向量化，只在段与段之间循环 (平均每段约 700 根)，1000 万根约数秒。
+# 同一 seed 生成的量价序列完全一致 (时间轴默认对齐到当前时刻)，基准测试的结果可以在不同提交之间比较。
+
+DEFAULT_BARS = 100_000
+DEFAULT_SEED = 42
+BASE_PRICE = 1.0
+BASE_VOLUME = 50_000.0
+PRICE_DECIMALS = 4
+
+# 各阶段长度范围 (K 线根数)
+TREND_BARS = (150, 600)
+RANGE_BARS = (300, 1200)
+# 趋势段的对数涨跌幅、区间的对数高度
+TREND_MOVE = (0.15, 0.45)
+RANGE_HEIGHT = (0.05, 0.15)
+# 每根 K 线的对数收益波动
+SIGMA = 0.002
+
+PHASE_DTYPE = np.dtype([
+    ("start", "<i8"),
+    ("end", "<i8"),        # 不含
+    ("phase", "U12"),      # markdown / accumulation / markup / distribution
+    ("event_bar", "<i8"),  # 区间内 Spring / UTAD 所在位置，趋势段为 -1
+])
+
+CYCLE = ("markdown", "accumulation", "markup", "distribution")
+
+
+def _trend(rng, length, direction, move):
+    inc = rng.normal(direction * move / length, SIGMA, length)
+    vol = np.full(length, 1.2)
+    # 趋势起点 (SOS / SOW) 放量
+    vol[:min(5, length)] = 2.5
+    return inc, vol
+
+
+def _range(rng, length, kind, height):
+    """
+    区间内价格在上下沿之间震荡: 相位做随机游走，价格 = 区间中点 ± 半高 × cos(相位)
+    吸筹从下沿 (SC) 开始，派发从上沿 (BC) 开始
+    """
+    step = rng.uniform(0.005, 0.03, length)
+    phase = np.cumsum(step)
+    sign = 1.0 if kind == "accumulation" else -1.0
+    # 以区间起点为 0 的对数价格路径
+    path = sign * height * 0.5 * (1 - np.cos(phase)) + rng.normal(0, SIGMA * 0.5, length)
+    vol = 0.8 + 0.4 * np.abs(np.sin(phase))
+    vol[0] = 6.0                      # SC / BC 高潮放量
+    event = int(length * rng.uniform(0.75, 0.9))
+    return path, vol, event
+
+
+def generate(bars=DEFAULT_BARS, interval="1m", seed=DEFAULT_SEED, end_ms=None, base_price=BASE_PRICE):
+    """
+    生成 bars 根 K 线，返回 (kline_cache.RECORD_DTYPE 记录, PHASE_DTYPE 阶段表)
+    end_ms: 最后一根 K 线的开盘时间不晚于该时刻 (默认当前时间，便于与按当前时间分段的拉取逻辑配合)
+    """
+    rng = np.random.default_rng(seed)
+    step = INTERVAL_MS[interval]
+    end_ms = int(time.time() * 1000) if end_ms is None else int(end_ms)
+    start_ms = end_ms - end_ms % step - (bars - 1) * step
+
+    log_close = np.empty(bars)
+    vol_mult = np.empty(bars)
+    wick = np.ones(bars)
+    phases = []
+    level = 0.0
+    pos = 0
+    k = 0
+    while pos < bars:
+        name = CYCLE[k % len(CYCLE)]
+        k += 1
+        if name in ("markdown", "markup"):
+            length = int(rng.integers(*TREND_BARS))
+            direction = 1.0 if name == "markup" else -1.0
+            # 向起始价位回归，长序列的价格不会漂移到极端值
+            move = rng.uniform(*TREND_MOVE) - direction * 0.3 * level
+            inc, vol = _trend(rng, length, direction, max(move, 0.05))
+            path = level + np.cumsum(inc)
+            event = -1
+        else:
+            length = int(rng.integers(*RANGE_BARS))
+            rel, vol, event = _range(rng, length, name, rng.uniform(*RANGE_HEIGHT))
+            path = level + rel
+        n = min(length, bars - pos)
+        log_close[pos:pos + n] = path[:n]
+        vol_mult[pos:pos + n] = vol[:n]
+        if 0 <= event < n:
+            # Spring 刺穿下沿 / UTAD 刺穿上沿后收回: 拉长影线并放量
+            wick[pos + event] = 8.0
+            vol_mult[pos + event] = 3.0
+            event += pos
+        else:
+            event = -1
+        if name in ("accumulation", "distribution"):
+            wick[pos] = 5.0
+        phases.append((pos, pos + n, name, event))
+        level = path[n - 1]
+        pos += n
+
+    close = base_price * np.exp(log_close)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    body_hi = np.maximum(open_, close)
+    body_lo = np.minimum(open_, close)
+    high = body_hi * np.exp(np.abs(rng.normal(0, SIGMA * 0.5, bars)) * wick)
+    low = body_lo * np.exp(-np.abs(rng.normal(0, SIGMA * 0.5, bars)) * wick)
+
+    volume = np.round(BASE_VOLUME * vol_mult * rng.lognormal(0, 0.4, bars), 1)
+    records = np.empty(bars, dtype=kline_cache.RECORD_DTYPE)
+    records["Open_time"] = start_ms + np.arange(bars, dtype=np.int64) * step
+    records["Close_time"] = records["Open_time"] + step - 1
+    records["Open"] = np.round(open_, PRICE_DECIMALS)
+    records["Close"] = np.round(close, PRICE_DECIMALS)
+    records["High"] = np.maximum(np.round(high, PRICE_DECIMALS), np.maximum(records["Open"], records["Close"]))
+    records["Low"] = np.minimum(np.round(low, PRICE_DECIMALS), np.minimum(records["Open"], records["Close"]))
+    records["Volume"] = volume
+    records["Quote_asset_volume"] = np.round(volume * records["Close"], 4)
+    records["Number_of_trades"] = np.maximum((volume / 200).astype(np.int64), 1)
+    taker = rng.uniform(0.35, 0.65, bars)
+    records["Taker_buy_base_asset_volume"] = np.round(volume * taker, 1)
+    records["Taker_buy_quote_asset_volume"] = np.round(records["Taker_buy_base_asset_volume"] * records["Close"], 4)
+    return records, np.array(phases, dtype=PHASE_DTYPE)
+
+
+def to_api_rows(records):
+    """
+    转换为 Binance /api/v3/klines 的返回格式 (价格与成交量为字符串)
+    """
+    return [
+        [int(r["Open_time"]), f"{r['Open']:.8f}", f"{r['High']:.8f}", f"{r['Low']:.8f}", f"{r['Close']:.8f}",
+         f"{r['Volume']:.8f}", int(r["Close_time"]), f"{r['Quote_asset_volume']:.8f}", int(r["Number_of_trades"]),
+         f"{r['Taker_buy_base_asset_volume']:.8f}", f"{r['Taker_buy_quote_asset_volume']:.8f}", "0"]
+        for r in records
+    ]
+
+
+def write_store(records, data_dir, symbol, interval):
+    """
+    写入 kline_store 存储 ({SYMBOL}_{INTERVAL}_Cleaned.csv + 二进制缓存)，返回 CSV 路径
+    """
+    result = kline_store.write_klines(data_dir, symbol, interval, kline_cache.records_to_frame(records))
+    return result["path"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成带威科夫结构的合成 K 线数据')
+    parser.add_argument('--bars', type=int, default=DEFAULT_BARS, help=f'K 线根数 (默认 {DEFAULT_BARS})')
+    parser.add_argument('--interval', default='1m', choices=sorted(INTERVAL_MS), help='周期 (默认 1m)')
+    parser.add_argument('--symbol', default='SYNTHUSDT', help='交易对名称 (默认 SYNTHUSDT)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'随机种子 (默认 {DEFAULT_SEED})')
+    parser.add_argument('--out-dir', default='.', help='输出目录 (默认当前目录)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    records, phases = generate(args.bars, args.interval, args.seed)
+    print(f"🧬 生成 {len(records)} 根 K 线, {len(phases)} 个阶段, 耗时 {time.perf_counter() - t0:.2f} 秒")
+    path = write_store(records, args.out_dir, args.symbol.upper(), args.interval)
+    print(f"✅ 已写入: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import os
+import re
+import sys
+import time
+import shutil
+import hashlib
+import zipfile
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+import binance_data_pro
+import kline_bars
+import kline_cache
+import kline_quality
+import kline_store
+import pipeline_metrics
+
+# ================= Binance 历史归档批量导入 =================
+# 通过 /api/v3/klines 回补多年 1m 历史需要每 1000 根一次请求。data.binance.vision 按月 / 按日发布打包好的 K 线:
+#   data/spot/monthly/klines/{SYMBOL}/{INTERVAL}/{SYMBOL}-{INTERVAL}-{YYYY-MM}.zip
+#   data/spot/daily/klines/{SYMBOL}/{INTERVAL}/{SYMBOL}-{INTERVAL}-{YYYY-MM-DD}.zip
+# 每个 zip 内是一个无表头 (个别文件有表头) 的 12 列 CSV，列顺序与 API 返回一致；
+# 2025 年起现货归档的时间戳为微秒，导入时统一换算为毫秒。
+#
+# 导入流程 (完全离线，只读取本地归档目录；--download 时才联网下载缺失的归档):
+#   1. 按时间顺序逐个归档流式解压、按块解析 (内存只占一个块)
+#   2. 早于本地存储的行写在存储之前，晚于存储的行写在之后，中间直接拷贝原有存储，原子替换后按块重建二进制缓存
+#   3. 落在存储时间范围内的行只用于补齐存储中缺失的 K 线；整个归档都已在存储中 (且其间没有缺口) 时不解压
+#   4. 归档之后到当前时刻的尾部仍通过 REST API 增量拉取 (--offline 时跳过)
+
+ARCHIVE_BASE = os.environ.get("BINANCE_ARCHIVE_BASE", "https://data.binance.vision")
+DEFAULT_ARCHIVE_DIR = "binance_archives"
+DEFAULT_CHUNKSIZE = 200_000
+# 毫秒时间戳约为 1.7e12，微秒约为 1.7e15
+MICROSECOND_THRESHOLD = 10 ** 14
+
+
+def archive_name(symbol, interval, period):
+    """
+    period: "2024-01" (月度) 或 "2024-01-15" (每日)
+    """
+    return f"{symbol}-{interval}-{period}.zip"
+
+
+def archive_url(symbol, interval, period):
+    kind = "daily" if len(period) > 7 else "monthly"
+    return f"{ARCHIVE_BASE}/data/spot/{kind}/klines/{symbol}/{interval}/{archive_name(symbol, interval, period)}"
+
+
+PERIOD_RE = re.compile(r"-(\d{4}-\d{2})(-\d{2})?\.zip$")
+
+
+def archive_period(path):
+    """
+    归档覆盖的时间范围 [start, end) (UTC 毫秒)
+    """
+    m = PERIOD_RE.search(os.path.basename(path))
+    if m.group(2):
+        start = datetime.strptime(m.group(1) + m.group(2), "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        end = start + timedelta(days=1)
+    else:
+        start = datetime.strptime(m.group(1), "%Y-%m").replace(tzinfo=timezone.utc)
+        end = (start + timedelta(days=32)).replace(day=1)
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
+def list_archives(archive_dir, symbol, interval):
+    """
+    本地归档目录 (含子目录) 中该交易对 / 周期的归档，按起始时间排序 (同一天月度归档在前)
+    """
+    pattern = re.compile(rf"^{re.escape(symbol)}-{re.escape(interval)}-\d{{4}}-\d{{2}}(-\d{{2}})?\.zip$")
+    found = []
+    for root, _, files in os.walk(archive_dir):
+        for name in files:
+            if pattern.match(name):
+                path = os.path.join(root, name)
+                start, end = archive_period(path)
+                found.append(((start, -end), path))
+    return [path for _, path in sorted(found)]
+
+
+# ----------------- 解析 -----------------
+def normalize_chunk(chunk):
+    """
+    微秒时间戳换算为毫秒，再按 binance_data_pro.clean_klines 清洗为存储格式
+    """
+    for col in ("Open_time", "Close_time"):
+        t = pd.to_numeric(chunk[col]).to_numpy(dtype=np.int64)
+        chunk[col] = np.where(t >= MICROSECOND_THRESHOLD, t // 1000, t)
+    return binance_data_pro.clean_klines(chunk)
+
+
+def read_archive(zip_path, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    流式解压并按块解析单个归档，逐块产出清洗后的 DataFrame
+    """
+    with zipfile.ZipFile(zip_path) as zf:
+        for name in zf.namelist():
+            if not name.endswith(".csv"):
+                continue
+            with zf.open(name) as raw:
+                first = raw.peek(1)[:1]
+            # 量价列按字符串读取，写入存储时与 API 返回的文本完全一致
+            header = 0 if first and not first.isdigit() else None
+            with zf.open(name) as raw:
+                for chunk in pd.read_csv(raw, header=header, names=binance_data_pro.COLUMNS, dtype=str, chunksize=chunksize):
+                    yield normalize_chunk(chunk)
+
+
+# ----------------- 写入存储 -----------------
+def _write_rows(out, df):
+    out.write(df.to_csv(index=False, header=False).encode("utf-8"))
+
+
+def _copy_store_body(out, path):
+    with open(path, "rb") as f:
+        f.readline()
+        shutil.copyfileobj(f, out)
+    out.seek(-1, os.SEEK_END)
+    if out.read(1) != b"\n":
+        out.write(b"\n")
+
+
+def ingest_archives(paths, data_dir, symbol, interval, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    把归档按时间顺序导入本地存储，返回导入统计
+    """
+    path = kline_store.csv_path(data_dir, symbol, interval)
+    first = kline_store.first_open_time(data_dir, symbol, interval)
+    bar = kline_store.last_bar(data_dir, symbol, interval)
+    last = bar[0] if bar else None
+    if first is None or last is None:
+        first = last = None
+
+    stats = {"archives": len(paths), "rows_read": 0, "prepended": 0, "appended": 0, "filled": 0, "skipped": 0,
+             "archives_skipped": 0}
+    existing = None
+    gaps = []
+    step = binance_data_pro.INTERVAL_MS.get(interval)
+    if first is not None and step:
+        existing = kline_bars.load_bars(path, columns=()).open_time()
+        gaps = kline_quality.scan(existing, step)["gaps"]
+    fills = []
+    written = -1
+    copied = first is None
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir or ".", prefix=".kline_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w+b") as out:
+            out.write((",".join(kline_cache.CSV_COLUMNS) + "\n").encode("utf-8"))
+            for zip_path in paths:
+                start, end = archive_period(zip_path)
+                if (existing is not None and first <= start and end - step <= last
+                        and not any(g["start"] < end and g["end"] >= start for g in gaps)):
+                    stats["archives_skipped"] += 1
+                    continue
+                rows = 0
+                for chunk in read_archive(zip_path, chunksize):
+                    rows += len(chunk)
+                    # 月度与每日归档可能重叠，只保留比已写入部分更新的行
+                    chunk = chunk.drop_duplicates("Open_time", keep="last").sort_values("Open_time")
+                    chunk = chunk[chunk["Open_time"] > written]
+                    if chunk.empty:
+                        continue
+                    written = int(chunk["Open_time"].iloc[-1])
+                    t = chunk["Open_time"]
+                    if first is None:
+                        _write_rows(out, chunk)
+                        stats["appended"] += len(chunk)
+                        continue
+                    before, after = chunk[t < first], chunk[t > last]
+                    inside = chunk[(t >= first) & (t <= last)]
+                    if len(inside):
+                        if existing is None:
+                            existing = kline_bars.load_bars(path, columns=()).open_time()
+                        missing = inside[~np.isin(inside["Open_time"].to_numpy(), existing)]
+                        fills.append(missing)
+                        stats["skipped"] += len(inside) - len(missing)
+                    _write_rows(out, before)
+                    stats["prepended"] += len(before)
+                    if len(after) and not copied:
+                        _copy_store_body(out, path)
+                        copied = True
+                    _write_rows(out, after)
+                    stats["appended"] += len(after)
+                stats["rows_read"] += rows
+                pipeline_metrics.count("archive_rows", rows)
+                print(f"📦 {os.path.basename(zip_path)}: {rows} 行")
+            if not copied:
+                _copy_store_body(out, path)
+        if stats["prepended"] or stats["appended"]:
+            kline_cache.replace_file(tmp_path, path)
+            # 归档中只有已收盘的 K 线: 追加了新尾部时按当前时间记为已收盘，下次增量拉取从 Close_time + 1 开始
+            kline_store.sync_state(data_dir, symbol, interval, int(time.time() * 1000) if stats["appended"] else None)
+            print("🗂️ 正在重建二进制缓存...")
+            kline_cache.rebuild_cache(path, chunksize)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    fills = [f for f in fills if len(f)]
+    if fills:
+        # 存储内部的缺口: 数量通常很少，走一次完整合并
+        kline_store.merge_klines(data_dir, symbol, interval, pd.concat(fills, ignore_index=True))
+        stats["filled"] = sum(len(f) for f in fills)
+    return stats
+
+
+# ----------------- 下载 (可选) -----------------
+def _verify_checksum(session, url, zip_path):
+    response = session.get(url + ".CHECKSUM", timeout=30)
+    if response.status_code != 200:
+        return None
+    expected = response.text.split()[0].lower()
+    h = hashlib.sha256()
+    with open(zip_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest() == expected
+
+
+def download_archives(symbol, interval, archive_dir, start, end=None):
+    """
+    下载 [start, end) 内本地缺失的归档: 已结束的月份用月度归档，当月用每日归档 (到昨天为止)。
+    返回新下载的文件数，交易所尚未发布或不存在的归档 (404) 直接跳过
+    """
+    import requests
+
+    end = end or datetime.now(timezone.utc).date()
+    month_start = end.replace(day=1)
+    periods = []
+    cur = start.replace(day=1)
+    while cur < month_start:
+        periods.append(cur.strftime("%Y-%m"))
+        cur = (cur + timedelta(days=32)).replace(day=1)
+    day = max(month_start, start)
+    while day < end:
+        periods.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+
+    os.makedirs(archive_dir, exist_ok=True)
+    downloaded = 0
+    with requests.Session() as session:
+        for period in periods:
+            target = os.path.join(archive_dir, archive_name(symbol, interval, period))
+            if os.path.exists(target):
+                continue
+            url = archive_url(symbol, interval, period)
+            response = session.get(url, stream=True, timeout=60)
+            if response.status_code == 404:
+                continue
+            response.raise_for_status()
+            fd, tmp_path = tempfile.mkstemp(dir=archive_dir, prefix=".archive_", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                for block in response.iter_content(1 << 20):
+                    f.write(block)
+            if _verify_checksum(session, url, tmp_path) is False:
+                os.remove(tmp_path)
+                print(f"⚠️ 校验失败，已丢弃: {os.path.basename(target)}")
+                continue
+            kline_cache.replace_file(tmp_path, target)
+            downloaded += 1
+            pipeline_metrics.count("archives_downloaded")
+            print(f"⬇️ {os.path.basename(target)}")
+    return downloaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从 data.binance.vision 归档批量导入历史 K 线')
+    parser.add_argument('symbol', help='交易对，如 ADAUSDC')
+    parser.add_argument('interval', help='周期，如 1m')
+    parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR, help=f'本地归档目录 (默认 {DEFAULT_ARCHIVE_DIR})')
+    parser.add_argument('--out-dir', default='.', help='CSV 存储目录 (默认当前目录)')
+    parser.add_argument('--download', action='store_true', help='先下载本地缺失的归档 (需要联网)')
+    parser.add_argument('--start', default='2024-01', help='下载起始月份 YYYY-MM (默认 2024-01)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help=f'每块解析的行数 (默认 {DEFAULT_CHUNKSIZE})')
+    parser.add_argument('--offline', action='store_true', help='只导入本地归档，不通过 API 拉取最新尾部')
+    parser.add_argument('--workers', type=int, default=1, help='拉取尾部时的并发线程数')
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure_from_args("binance_archive", args)
+
+    symbol, interval = args.symbol.upper(), args.interval.lower()
+    if args.download:
+        start = datetime.strptime(args.start, "%Y-%m").date()
+        with pipeline_metrics.stage("download", symbol=symbol, interval=interval):
+            n = download_archives(symbol, interval, args.archive_dir, start)
+        print(f"✅ 下载完成: 新增 {n} 个归档")
+
+    paths = list_archives(args.archive_dir, symbol, interval) if os.path.isdir(args.archive_dir) else []
+    if not paths:
+        print(f"❌ {args.archive_dir} 中没有 {symbol} {interval} 的归档")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    with pipeline_metrics.stage("ingest", symbol=symbol, interval=interval):
+        stats = ingest_archives(paths, args.out_dir, symbol, interval, args.chunksize)
+    elapsed = time.perf_counter() - t0
+    print(f"✅ 导入完成: {stats['archives']} 个归档, 读取 {stats['rows_read']} 行, 前置 {stats['prepended']} 行, "
+          f"追加 {stats['appended']} 行, 补齐 {stats['filled']} 行, 已存在 {stats['skipped']} 行 "
+          f"(跳过 {stats['archives_skipped']} 个已导入的归档), "
+          f"耗时 {elapsed:.1f} 秒 ({stats['rows_read'] / max(elapsed, 1e-9):,.0f} 行/秒)")
+
+    if not args.offline:
+        # 归档之后的部分 (当天 / 归档尚未发布的日期) 走 API 增量拉取，随后做完整性检查
+        binance_data_pro.sync_klines(symbol, interval, binance_data_pro.get_start_ts(0), out_dir=args.out_dir,
+                                     workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
-import requests
-import pandas as pd
+import os
 import time
 from datetime import datetime, timedelta
 
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline_metrics
+from rate_limit import TokenBucket
+
+# requests / pandas / kline_store / kline_quality (pandas) 在用到的函数内导入:
+# kline_resample 等模块只需要 INTERVAL_MS 常量，--help 与参数错误时也不必等待 pandas 加载
 
 # ================= 配置区 =================
-def get_config():
+def get_config(argv=None):
     default_symbol = "ADAUSDC"
     default_interval = "4h"
     
@@ -16,27 +22,37 @@ def get_config():
     parser.add_argument('interval', nargs='?', default=default_interval, help=f'时间周期 (默认: {default_interval})')
     # [新增] 支持 --days 参数
     parser.add_argument('--days', type=int, default=0, help='从最近 N 天前开始拉取 (默认 0 表示从 2024-01-01 开始)')
+    # [新增] 本地增量存储: 已有数据时只拉取缺失的尾部
+    parser.add_argument('--out-dir', default='.', help='CSV 存储目录 (默认当前目录)')
+    parser.add_argument('--full', action='store_true', help='忽略本地存储，强制全量重新下载')
+    # [新增] 并发分段拉取: 按 1000 根 K 线预先切分时间窗口，多线程并发请求
+    parser.add_argument('--workers', type=int, default=1, help='并发拉取线程数 (默认 1 为串行分页)')
+    # [新增] 写入后按周期网格检查缺口 / 重复，只重新拉取缺失的时间段
+    parser.add_argument('--no-verify', action='store_true', help='写入后跳过完整性检查与缺口修复')
+    parser.add_argument('--weight-limit', type=int, default=DEFAULT_WEIGHT_LIMIT, help=f'每分钟请求权重上限 (默认 {DEFAULT_WEIGHT_LIMIT})')
+    pipeline_metrics.add_arguments(parser)
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     symbol = args.symbol.upper()
     interval = args.interval.lower()
     
-    # 计算起始时间
-    if args.days > 0:
-        start_date = datetime.now() - timedelta(days=args.days)
-        start_ts = int(start_date.timestamp() * 1000)
-    else:
-        # 默认 2024-01-01
-        start_ts = int(datetime(2024, 1, 1).timestamp() * 1000)
-    
+    start_ts = get_start_ts(args.days)
     print(f"✅ 已确认: {symbol} | {interval} | 起始时间: {datetime.fromtimestamp(start_ts/1000)}")
-    return symbol, interval, start_ts
+    return symbol, interval, start_ts, args
 
-SYMBOL, INTERVAL, START_TIME = get_config()
+def get_start_ts(days=0):
+    # 计算起始时间
+    if days > 0:
+        start_date = datetime.now() - timedelta(days=days)
+        return int(start_date.timestamp() * 1000)
+    # 默认 2024-01-01
+    return int(datetime(2024, 1, 1).timestamp() * 1000)
 
 # 使用 data-api.binance.vision 替代 api.binance.com 以绕过地区限制
-BASE_URL = "https://data-api.binance.vision/api/v3/klines"
+# BINANCE_API_BASE 可指向本地模拟服务 (bench/mock_binance.py) 做离线测试
+API_BASE = os.environ.get("BINANCE_API_BASE", "https://data-api.binance.vision")
+BASE_URL = f"{API_BASE}/api/v3/klines"
 
 COLUMNS = [
     "Open_time", "Open", "High", "Low", "Close", "Volume",
@@ -44,12 +60,59 @@ COLUMNS = [
     "Taker_buy_base_asset_volume", "Taker_buy_quote_asset_volume", "Ignore"
 ]
 
+PAGE_LIMIT = 1000  # API 单次最大返回条数
+KLINES_WEIGHT = 2  # limit=1000 时单次 K 线请求权重
+MAX_RETRIES = 5  # 单个请求失败后的最大重试次数 (指数退避)
+
+# 固定长度周期的毫秒数 (1M 月线长度不固定，只能串行分页)
+INTERVAL_MS = {
+    "1s": 1000,
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000,
+    "1d": 86_400_000, "3d": 259_200_000, "1w": 604_800_000,
+}
+
+DEFAULT_WEIGHT_LIMIT = 1200
+
+_bucket = None
+
+def get_bucket(weight_limit=None):
+    # 进程内共享同一个令牌桶，串行与并发模式 (以及批量流水线中的多个交易对) 都受同一权重上限约束
+    global _bucket
+    if _bucket is None:
+        _bucket = TokenBucket(weight_limit or DEFAULT_WEIGHT_LIMIT)
+    return _bucket
+
+def _respect_limits(response):
+    """
+    根据响应头校正令牌桶；429/418 时按 Retry-After 暂停所有请求，返回是否需要重试
+    """
+    bucket = get_bucket()
+    used = response.headers.get("X-MBX-USED-WEIGHT-1M")
+    if used:
+        bucket.sync_used(used)
+    pipeline_metrics.count("http_requests")
+    pipeline_metrics.count("http_bytes", len(response.content))
+    if response.status_code in (418, 429):
+        retry_after = float(response.headers.get("Retry-After", 60))
+        print(f"\n⚠️ 触发频率限制 ({response.status_code})，全局暂停 {retry_after:.0f} 秒...")
+        pipeline_metrics.count("http_retries")
+        bucket.pause(retry_after)
+        return True
+    return False
+
 def fetch_all_data(symbol, interval, start_ts):
     """
     通过 Binance API 分页拉取所有历史数据直到最新
     """
+    import requests
+
     all_data = []
     current_start = start_ts
+    bucket = get_bucket()
+    delay = 1
+    failures = 0
     
     print(f"🚀 开始从 API 拉取数据 (起始: {datetime.fromtimestamp(start_ts/1000)}) ...")
     
@@ -58,14 +121,25 @@ def fetch_all_data(symbol, interval, start_ts):
             "symbol": symbol,
             "interval": interval,
             "startTime": current_start,
-            "limit": 1000  # API 最大限制
+            "limit": PAGE_LIMIT  # API 最大限制
         }
         
         try:
+            pipeline_metrics.count("rate_limit_wait_s", bucket.acquire(KLINES_WEIGHT))
             response = requests.get(BASE_URL, params=params, timeout=10)
-            if response.status_code != 200:
+            if _respect_limits(response):
+                # 持续限流时与其他错误一样计入重试次数 (暂停由令牌桶完成，不再额外退避)
+                failures += 1
+                if failures > MAX_RETRIES:
+                    print(f"\n❌ 频率限制重试 {MAX_RETRIES} 次仍未解除，保留已拉取的数据")
+                    break
+                continue
+            if 400 <= response.status_code < 500:
+                # 参数错误 (交易对不存在等) 重试也不会成功
                 print(f"❌ API 请求失败: {response.text}")
                 break
+            if response.status_code != 200:
+                raise RuntimeError(f"API 请求失败 {response.status_code}: {response.text[:200]}")
             
             data = response.json()
             if not data:
@@ -85,52 +159,198 @@ def fetch_all_data(symbol, interval, start_ts):
             current_start = data[-1][6] + 1
             
             # 如果拉取数量少于 Limit，说明已经是最新的了
-            if len(data) < 1000:
+            if len(data) < PAGE_LIMIT:
                 print("\n✅ 数据拉取完毕。")
                 break
-                
-            # 稍微休眠防止触发极端频控 (虽然后台限制是 1200权重/分，单次 K 线权重仅为 2)
-            time.sleep(0.1)
             
         except Exception as e:
-            print(f"\n❌ 网络或解析错误: {e}")
-            break
+            # 临时错误按指数退避重试同一页，仍失败时保留已拉取的连续数据 (下次增量更新从断点继续)
+            failures += 1
+            if failures > MAX_RETRIES:
+                print(f"\n❌ 网络或解析错误: {e}，重试 {MAX_RETRIES} 次仍失败，保留已拉取的数据")
+                break
+            print(f"\n⚠️ 网络或解析错误: {e} ({failures}/{MAX_RETRIES})，{delay} 秒后重试")
+            pipeline_metrics.count("http_retries")
+            pipeline_metrics.count("backoff_s", delay)
+            time.sleep(delay)
+            delay *= 2
+            continue
+        delay = 1
+        failures = 0
             
     return all_data
 
-def main():
-    raw_data = fetch_all_data(SYMBOL, INTERVAL, START_TIME)
-    
-    if not raw_data:
-        print("❌ 未获取到任何数据")
-        return
+def plan_windows(interval, start_ts, end_ts):
+    """
+    按周期长度预先把 [start_ts, end_ts] 切成每段最多 1000 根 K 线的时间窗口
+    """
+    span = INTERVAL_MS[interval] * PAGE_LIMIT
+    return [(s, min(s + span - 1, end_ts)) for s in range(start_ts, end_ts + 1, span)]
+
+def fetch_window(session, symbol, interval, window, max_retries=MAX_RETRIES):
+    """
+    拉取单个时间窗口，失败时指数退避重试
+    """
+    start, end = window
+    params = {
+        "symbol": symbol,
+        "interval": interval,
+        "startTime": start,
+        "endTime": end,
+        "limit": PAGE_LIMIT
+    }
+    bucket = get_bucket()
+    delay = 1
+    for attempt in range(max_retries):
+        try:
+            pipeline_metrics.count("rate_limit_wait_s", bucket.acquire(KLINES_WEIGHT))
+            response = session.get(BASE_URL, params=params, timeout=10)
+            if _respect_limits(response):
+                continue
+            if response.status_code == 200:
+                return response.json()
+            print(f"\n⚠️ 窗口 {datetime.fromtimestamp(start/1000)} 请求失败: {response.status_code} ({attempt + 1}/{max_retries})")
+        except Exception as e:
+            print(f"\n⚠️ 窗口 {datetime.fromtimestamp(start/1000)} 网络错误: {e} ({attempt + 1}/{max_retries})")
+        pipeline_metrics.count("http_retries")
+        pipeline_metrics.count("backoff_s", delay)
+        time.sleep(delay)
+        delay *= 2
+    raise RuntimeError(f"窗口 {datetime.fromtimestamp(start/1000)} 重试 {max_retries} 次仍失败")
+
+def fetch_concurrent(symbol, interval, start_ts, workers):
+    """
+    并发分段拉取: 窗口按周期长度预先计算，多线程通过连接池并发请求，
+    速率由令牌桶按请求权重控制，结果按窗口顺序重新拼接。
+    某个窗口最终失败时，只返回它之前连续完整的部分，保证存储中不出现缺口。
+    """
+    if interval not in INTERVAL_MS:
+        print(f"⚠️ 周期 {interval} 长度不固定，退回串行分页拉取")
+        return fetch_all_data(symbol, interval, start_ts)
+    import requests
+
+    end_ts = int(time.time() * 1000)
+    windows = plan_windows(interval, start_ts, end_ts)
+    print(f"🚀 并发拉取 {len(windows)} 个窗口 (线程: {workers}, 起始: {datetime.fromtimestamp(start_ts/1000)}) ...")
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    results = [None] * len(windows)
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(pipeline_metrics.bind(fetch_window), session, symbol, interval, w) for w in windows]
+        for i, future in enumerate(futures):
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"\n❌ {e}，仅保留此前连续的数据")
+                for f in futures[i + 1:]:
+                    f.cancel()
+                break
+            done += len(results[i])
+            print(f"\r📥 已完成窗口: {i + 1}/{len(windows)} (总 K 线数: {done})", end="", flush=True)
+    session.close()
+
+    all_data = []
+    for chunk in results:
+        if chunk is None:
+            break
+        all_data.extend(chunk)
+    print("\n✅ 数据拉取完毕。")
+    return all_data
+
+def clean_klines(raw_data):
+    """
+    将 API 返回的原始 K 线列表清洗为标准 DataFrame
+    """
+    import pandas as pd
 
-    print("\n🧹 正在清洗数据...")
     df = pd.DataFrame(raw_data, columns=COLUMNS)
-    
-    # --- 数据清洗与格式化 ---
-    
+
     # 1. 类型转换
     numeric_cols = ["Open", "High", "Low", "Close", "Volume", "Open_time"]
     for col in numeric_cols:
         df[col] = pd.to_numeric(df[col], errors='coerce')
-        
+
     # 2. 增加人类可读时间 (UTC+8)
     df['Human_Time'] = pd.to_datetime(df['Open_time'], unit='ms') + timedelta(hours=8)
-    
+
     # 3. 整理列顺序
     final_cols = ['Human_Time', 'Open_time', 'Open', 'High', 'Low', 'Close', 'Volume', 
                   'Close_time', 'Quote_asset_volume', 'Number_of_trades', 
                   'Taker_buy_base_asset_volume', 'Taker_buy_quote_asset_volume', 'Ignore']
-    df = df[final_cols]
+    return df[final_cols]
+
+def sync_klines(symbol, interval, start_ts, out_dir=".", days=0, full=False, workers=1, verify=True):
+    """
+    拉取并更新单个交易对的本地存储，返回本次更新摘要
+    verify: 写入后检查缺口 / 重复，并只重新拉取缺失的时间段 (见 kline_quality.py)
+    """
+    import kline_store
+
+    incremental = False
+
+    # 本地已有数据时只拉取缺失的尾部 (--days 要求的起点早于本地数据时仍需全量补齐)
+    if not full:
+        resume_ts = kline_store.get_resume_ts(out_dir, symbol, interval)
+        first_ts = kline_store.first_open_time(out_dir, symbol, interval)
+        # 起点未必对齐到 K 线边界，允许一个周期的误差
+        backfill = days > 0 and first_ts is not None and start_ts < first_ts - INTERVAL_MS.get(interval, 0)
+        if resume_ts is not None and not backfill:
+            start_ts = resume_ts
+            incremental = True
+            print(f"📦 发现本地存储，增量更新 (起始: {datetime.fromtimestamp(start_ts/1000)})")
+
+    fetched_at = int(time.time() * 1000)
+    with pipeline_metrics.stage("fetch", symbol=symbol, interval=interval, workers=workers):
+        if workers > 1:
+            raw_data = fetch_concurrent(symbol, interval, start_ts, workers)
+        else:
+            raw_data = fetch_all_data(symbol, interval, start_ts)
+        pipeline_metrics.count("rows_fetched", len(raw_data))
     
-    # 4. 保存
-    output_name = f"{SYMBOL}_{INTERVAL}_Cleaned.csv"
-    df.to_csv(output_name, index=False)
+    summary = {"path": kline_store.csv_path(out_dir, symbol, interval), "rows": len(raw_data), "incremental": incremental}
+    if not raw_data:
+        if incremental:
+            print("✅ 本地数据已是最新")
+        else:
+            print("❌ 未获取到任何数据")
+            summary["path"] = None
+        return summary
+
+    print("\n🧹 正在清洗数据...")
+    with pipeline_metrics.stage("clean", symbol=symbol, interval=interval):
+        df = clean_klines(raw_data)
+        pipeline_metrics.count("rows_parsed", len(df))
     
-    print(f"✅ 成功保存: {output_name}")
-    print(f"📊 数据范围: {df['Human_Time'].iloc[0]} 至 {df['Human_Time'].iloc[-1]}")
-    print(f"📈 总行数: {len(df)}")
+    # 4. 保存 (增量模式下原子追加并按 Open_time 去重)
+    with pipeline_metrics.stage("store", symbol=symbol, interval=interval):
+        if incremental:
+            result = kline_store.append_klines(out_dir, symbol, interval, df, fetched_at=fetched_at)
+            print(f"✅ 已追加至: {result['path']} (新增 {result['appended']} 行, 覆盖 {result['replaced']} 行)")
+        else:
+            result = kline_store.write_klines(out_dir, symbol, interval, df, fetched_at=fetched_at)
+            print(f"✅ 成功保存: {result['path']}")
+        pipeline_metrics.count("rows_written", len(df))
+
+    print(f"📊 本次数据范围: {df['Human_Time'].iloc[0]} 至 {df['Human_Time'].iloc[-1]}")
+    print(f"📈 本次行数: {len(df)}")
+
+    if verify and interval in INTERVAL_MS:
+        import kline_quality
+        with pipeline_metrics.stage("verify", symbol=symbol, interval=interval):
+            summary["quality"] = kline_quality.verify_store(out_dir, symbol, interval)
+    return summary
+
+def main(argv=None):
+    symbol, interval, start_ts, args = get_config(argv)
+    pipeline_metrics.configure_from_args("binance_data_pro", args)
+    get_bucket(args.weight_limit)
+    sync_klines(symbol, interval, start_ts, out_dir=args.out_dir, days=args.days,
+                full=args.full, workers=args.workers, verify=not args.no_verify)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,209 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import kline_cache
+
+# ================= 紧凑 K 线容器 =================
+# load_klines 返回的 DataFrame 每根 K 线约 100 字节 (13 列，含 Human_Time / Ignore / 各种派生量)，
+# 多年的 1m 历史放进内存很快就是数百 MB。Bars 只保留需要的列，并按列选择最小的无损类型:
+#   时间   int32 自 1970 起的分钟数 (Open_time 全部落在整分钟上时)，否则退回 int64 毫秒
+#   量价   float32 (还原为 float64 并按该列的小数位数四舍五入后与原值完全一致时)，否则保留 float64
+#   成交笔数 int32 (超出范围时 int64)
+# 默认只保留 开/高/低/收/量，每根 K 线 24 字节，约为 DataFrame 的 1/4。
+# Close_time (= 下一根开盘 - 1)、Human_Time (由 Open_time 换算) 与 Ignore 都不再存储。
+# 计算时用 values(列名) 取回与原始数据一致的 float64；只在绘图时用 to_mpf_frame() 转成 mplfinance 需要的 DataFrame。
+
+DEFAULT_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+OPTIONAL_COLUMNS = ("Quote_asset_volume", "Number_of_trades", "Taker_buy_base_asset_volume", "Taker_buy_quote_asset_volume")
+INT_COLUMNS = ("Number_of_trades",)
+
+MINUTE_MS = 60_000
+# 小数位数超过该值的列视为任意精度，只有 float32 完全相等时才压缩
+MAX_DECIMALS = 8
+
+
+def price_decimals(values, max_decimals=8):
+    """
+    价格实际使用的小数位数 (全部价格都能被 10^-d 整除的最小 d)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    for d in range(max_decimals + 1):
+        scaled = values * 10 ** d
+        if np.allclose(scaled, np.round(scaled), rtol=0, atol=1e-6):
+            return d
+    return max_decimals
+
+
+def _compact_float(values):
+    """
+    返回 (存储数组, 小数位数)。float32 按小数位数还原不一致时保留 float64，小数位数为 None 表示无需还原
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values.astype(np.float32), None
+    d = price_decimals(values, MAX_DECIMALS)
+    small = values.astype(np.float32)
+    restored = small.astype(np.float64)
+    if d < MAX_DECIMALS:
+        restored = np.round(restored, d)
+    else:
+        d = None
+    # NaN (数据源中无法解析的值) 两边位置一致即可
+    if np.array_equal(restored, values, equal_nan=True):
+        return small, d
+    return values, None
+
+
+def _compact_int(values):
+    values = np.asarray(values, dtype=np.int64)
+    info = np.iinfo(np.int32)
+    if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+        return values.astype(np.int32)
+    return values
+
+
+def _compact_time(open_time):
+    open_time = np.asarray(open_time, dtype=np.int64)
+    if len(open_time) and not (open_time % MINUTE_MS).any():
+        minutes = open_time // MINUTE_MS
+        if minutes.max() <= np.iinfo(np.int32).max:
+            return minutes.astype(np.int32), MINUTE_MS
+    return open_time, 1
+
+
+class Bars:
+    """
+    按列存储的紧凑 K 线 (time 为 unit_ms 毫秒为单位的开盘时间，columns 为 {列名: 数组})
+    """
+
+    def __init__(self, time, unit_ms, columns, decimals):
+        self.time = time
+        self.unit_ms = unit_ms
+        self.columns = columns
+        self.decimals = decimals
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, key):
+        # 列名返回存储的紧凑数组，切片 / 下标数组返回新的 Bars
+        if isinstance(key, str):
+            return self.columns[key]
+        return Bars(self.time[key], self.unit_ms, {k: v[key] for k, v in self.columns.items()}, self.decimals)
+
+    def tail(self, n):
+        return self[max(len(self) - n, 0):]
+
+    @property
+    def nbytes(self):
+        return self.time.nbytes + sum(v.nbytes for v in self.columns.values())
+
+    def dtypes(self):
+        return {"Open_time": self.time.dtype.name, **{k: v.dtype.name for k, v in self.columns.items()}}
+
+    def open_time(self):
+        """
+        开盘时间 (int64 毫秒)
+        """
+        return self.time.astype(np.int64) * self.unit_ms
+
+    def values(self, name):
+        """
+        取回与原始数据一致的 float64 (整数列返回 int64)
+        """
+        col = self.columns[name]
+        if name in INT_COLUMNS:
+            return col.astype(np.int64)
+        d = self.decimals.get(name)
+        col = col.astype(np.float64)
+        return np.round(col, d) if d is not None else col
+
+    def to_frame(self):
+        """
+        还原为 load_klines 的列结构 (只包含保留的列)
+        """
+        data = {"Open_time": self.open_time()}
+        data.update((name, self.values(name)) for name in self.columns)
+        df = pd.DataFrame(data)
+        df.insert(0, "Human_Time", pd.to_datetime(df["Open_time"], unit="ms") + kline_cache.HUMAN_TIME_OFFSET)
+        return df
+
+    def to_mpf_frame(self):
+        """
+        mplfinance 需要的形状: 以 Human_Time 为 Date 索引的 开/高/低/收/量 (float64)，附带 Open_time
+        """
+        df = self.to_frame()
+        df['Date'] = df['Human_Time']
+        return df.set_index('Date')
+
+
+def from_arrays(open_time, data):
+    """
+    由开盘时间 (毫秒) 与 {列名: 数组} 构建 Bars，逐列选择无损的最小类型
+    """
+    time, unit_ms = _compact_time(open_time)
+    columns, decimals = {}, {}
+    for name, values in data.items():
+        if name in INT_COLUMNS:
+            columns[name] = _compact_int(values)
+        else:
+            columns[name], decimals[name] = _compact_float(values)
+    return Bars(time, unit_ms, columns, decimals)
+
+
+def from_records(records, columns=DEFAULT_COLUMNS):
+    """
+    由 kline_cache 记录数组 (可以是 memmap 切片) 构建，不经过 DataFrame
+    """
+    return from_arrays(records["Open_time"], {name: records[name] for name in columns})
+
+
+def from_frame(df, columns=DEFAULT_COLUMNS):
+    """
+    由 DataFrame 构建 (字符串类型的列会先转为数值)
+    """
+    data = {name: pd.to_numeric(df[name], errors="coerce").to_numpy() for name in columns}
+    return from_arrays(pd.to_numeric(df["Open_time"]).to_numpy(), data)
+
+
+def load_bars(csv_path, tail=None, lookback=0, columns=DEFAULT_COLUMNS):
+    """
+    与 kline_cache.load_klines 参数相同；二进制缓存有效时直接从 memmap 逐列转换，不构建完整的 DataFrame
+    """
+    n = tail + lookback if tail else None
+    records = kline_cache.open_cache(csv_path)
+    if records is not None:
+        return from_records(records[-n:] if n else records, columns)
+    return from_frame(kline_cache.load_klines(csv_path, tail=tail, lookback=lookback), columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较 DataFrame 与紧凑 K 线容器的内存占用')
+    parser.add_argument('csv_paths', nargs='+', help='*_Cleaned.csv 路径 (可多个)')
+    parser.add_argument('--all-columns', action='store_true', help='同时保留成交额 / 成交笔数 / 主动买入量')
+    args = parser.parse_args()
+
+    columns = DEFAULT_COLUMNS + (OPTIONAL_COLUMNS if args.all_columns else ())
+    total_df = total_bars = 0
+    for path in args.csv_paths:
+        if not os.path.exists(path):
+            print(f"❌ 错误: 找不到文件 {path}")
+            sys.exit(1)
+        df_bytes = int(kline_cache.load_klines(path).memory_usage(deep=True).sum())
+        bars = load_bars(path, columns=columns)
+        total_df += df_bytes
+        total_bars += bars.nbytes
+        dtypes = ", ".join(f"{k}:{v}" for k, v in bars.dtypes().items())
+        print(f"📦 {os.path.basename(path)}: {len(bars)} 根, DataFrame {df_bytes / 2 ** 20:.1f} MB -> "
+              f"Bars {bars.nbytes / 2 ** 20:.1f} MB ({df_bytes / max(bars.nbytes, 1):.1f}x)")
+        print(f"   {dtypes}")
+    print(f"✅ 合计: DataFrame {total_df / 2 ** 20:.1f} MB -> Bars {total_bars / 2 ** 20:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
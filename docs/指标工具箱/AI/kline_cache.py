@@ -0,0 +1,285 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# ================= 二进制 K 线缓存 =================
+# 与 {SYMBOL}_{INTERVAL}_Cleaned.csv 并存的定长记录文件 (*_Cleaned.bin) + 元数据 (*_Cleaned.bin.json)。
+# 每行是一条 numpy 结构化记录 (int64 时间戳 + float64 量价)，定长记录便于增量追加，读取时直接 memmap，
+# 无需再解析文本、pd.to_datetime 和 pd.to_numeric。
+# 元数据中记录了对应 CSV 的大小和修改时间，CSV 被其他方式改动后缓存视为过期，自动退回读取 CSV。
+
+CACHE_VERSION = 1
+
+# mkstemp 创建的临时文件权限是 0600，原子替换前改为普通数据文件的 0644
+# (不在导入时读写进程级 umask，避免与其他线程建文件相互干扰)
+FILE_MODE = 0o644
+
+
+def replace_file(tmp_path, path):
+    """
+    临时文件改为固定权限后原子替换目标文件
+    """
+    os.chmod(tmp_path, FILE_MODE)
+    os.replace(tmp_path, path)
+
+
+RECORD_DTYPE = np.dtype([
+    ("Open_time", "<i8"),
+    ("Open", "<f8"),
+    ("High", "<f8"),
+    ("Low", "<f8"),
+    ("Close", "<f8"),
+    ("Volume", "<f8"),
+    ("Close_time", "<i8"),
+    ("Quote_asset_volume", "<f8"),
+    ("Number_of_trades", "<i8"),
+    ("Taker_buy_base_asset_volume", "<f8"),
+    ("Taker_buy_quote_asset_volume", "<f8"),
+])
+
+CSV_COLUMNS = ['Human_Time', 'Open_time', 'Open', 'High', 'Low', 'Close', 'Volume',
+               'Close_time', 'Quote_asset_volume', 'Number_of_trades',
+               'Taker_buy_base_asset_volume', 'Taker_buy_quote_asset_volume', 'Ignore']
+
+# Human_Time 为 UTC+8，与 binance_data_pro.py 保持一致
+HUMAN_TIME_OFFSET = pd.Timedelta(hours=8)
+
+
+def cache_paths(csv_path):
+    base = os.path.splitext(csv_path)[0]
+    return base + ".bin", base + ".bin.json"
+
+
+def _csv_stat(csv_path):
+    st = os.stat(csv_path)
+    return {"csv_size": st.st_size, "csv_mtime_ns": st.st_mtime_ns}
+
+
+def _read_meta(csv_path):
+    _, meta_path = cache_paths(csv_path)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(csv_path, rows, last_open_time):
+    _, meta_path = cache_paths(csv_path)
+    meta = {"version": CACHE_VERSION, "rows": int(rows), "last_open_time": last_open_time}
+    meta.update(_csv_stat(csv_path))
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(meta_path) or ".", prefix=".kline_meta_", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    replace_file(tmp_path, meta_path)
+
+
+def is_fresh(csv_path, meta=None):
+    """
+    缓存是否与当前 CSV 一致 (版本、CSV 大小与修改时间、记录文件长度都匹配)
+    """
+    meta = meta if meta is not None else _read_meta(csv_path)
+    bin_path, _ = cache_paths(csv_path)
+    if not meta or meta.get("version") != CACHE_VERSION or not os.path.exists(csv_path):
+        return False
+    if not os.path.exists(bin_path) or os.path.getsize(bin_path) != meta["rows"] * RECORD_DTYPE.itemsize:
+        return False
+    stat = _csv_stat(csv_path)
+    return meta["csv_size"] == stat["csv_size"] and meta["csv_mtime_ns"] == stat["csv_mtime_ns"]
+
+
+def frame_to_records(df):
+    """
+    转为定长记录。时间戳无法解析的行 (截断/损坏的 CSV 行) 丢弃，成交笔数缺失记为 0；整数列不能存放 NaN
+    """
+    columns = {name: pd.to_numeric(df[name], errors="coerce") for name in RECORD_DTYPE.names}
+    valid = (columns["Open_time"].notna() & columns["Close_time"].notna()).to_numpy()
+    columns["Number_of_trades"] = columns["Number_of_trades"].fillna(0)
+    records = np.empty(int(valid.sum()), dtype=RECORD_DTYPE)
+    for name in RECORD_DTYPE.names:
+        records[name] = columns[name].to_numpy()[valid].astype(RECORD_DTYPE[name])
+    return records
+
+
+def records_to_frame(records):
+    """
+    还原为与 *_Cleaned.csv 相同的列结构 (Human_Time 为 datetime，量价为数值类型)
+    """
+    data = {name: np.asarray(records[name]) for name in RECORD_DTYPE.names}
+    df = pd.DataFrame(data)
+    df.insert(0, "Human_Time", pd.to_datetime(df["Open_time"], unit="ms") + HUMAN_TIME_OFFSET)
+    df["Ignore"] = 0
+    return df[CSV_COLUMNS]
+
+
+# ----------------- 写入 -----------------
+def write_cache(csv_path, df):
+    """
+    根据完整数据重建缓存 (CSV 已写入之后调用)
+    """
+    bin_path, _ = cache_paths(csv_path)
+    records = frame_to_records(df)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(bin_path) or ".", prefix=".kline_bin_", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        records.tofile(f)
+    replace_file(tmp_path, bin_path)
+    last_open = int(records["Open_time"][-1]) if len(records) else None
+    _write_meta(csv_path, len(records), last_open)
+
+
+def rebuild_cache(csv_path, chunksize=500_000):
+    """
+    按块读取 CSV 重建缓存，内存只占一个块 (大文件整体写入后使用，如批量导入历史归档)
+    """
+    bin_path, _ = cache_paths(csv_path)
+    rows, last_open = 0, None
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(bin_path) or ".", prefix=".kline_bin_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+                records = frame_to_records(chunk)
+                records.tofile(f)
+                rows += len(records)
+                if len(records):
+                    last_open = int(records["Open_time"][-1])
+        replace_file(tmp_path, bin_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _write_meta(csv_path, rows, last_open)
+    return rows
+
+
+def update_cache(csv_path, new_df, was_fresh):
+    """
+    CSV 追加完成后同步更新缓存: 截掉与新数据重叠的尾部记录后追加新记录。
+    追加前缓存已过期 (was_fresh=False) 时，从完整 CSV 重建一次。
+    """
+    meta = _read_meta(csv_path)
+    if not was_fresh or not meta:
+        write_cache(csv_path, pd.read_csv(csv_path))
+        return
+
+    bin_path, _ = cache_paths(csv_path)
+    records = frame_to_records(new_df.drop_duplicates("Open_time", keep="last").sort_values("Open_time"))
+    if not len(records):
+        _write_meta(csv_path, meta["rows"], meta["last_open_time"])
+        return
+    old = np.memmap(bin_path, dtype=RECORD_DTYPE, mode="r", shape=(meta["rows"],)) if meta["rows"] else None
+    keep = int(np.searchsorted(old["Open_time"], records["Open_time"][0], side="left")) if old is not None else 0
+    del old
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(bin_path) or ".", prefix=".kline_bin_", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(bin_path, tmp_path)
+        with open(tmp_path, "r+b") as f:
+            f.truncate(keep * RECORD_DTYPE.itemsize)
+            f.seek(0, os.SEEK_END)
+            records.tofile(f)
+        replace_file(tmp_path, bin_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _write_meta(csv_path, keep + len(records), int(records["Open_time"][-1]))
+
+
+# ----------------- 读取 -----------------
+def tail_lines(path, n, block_size=1 << 16):
+    """
+    从文件末尾向前按块读取，返回最后 n 个数据行的 [(字节偏移, 行文本), ...]
+    不会解析整个文件，耗时与文件大小无关。
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+
+    rows = []
+    start = 0
+    while start < len(buf):
+        nl = buf.find(b"\n", start)
+        if nl == -1:
+            nl = len(buf)
+        if nl > start:
+            rows.append((pos + start, buf[start:nl].decode("utf-8").rstrip("\r")))
+        start = nl + 1
+
+    # pos > 0 时第一段是不完整的行; pos == 0 时第一行是表头。两种情况都要丢掉
+    rows = rows[1:]
+    return rows[-n:] if n > 0 else []
+
+
+def open_cache(csv_path):
+    """
+    以只读 memmap 打开缓存，过期或不存在时返回 None
+    """
+    meta = _read_meta(csv_path)
+    if not is_fresh(csv_path, meta):
+        return None
+    if meta["rows"] == 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    bin_path, _ = cache_paths(csv_path)
+    return np.memmap(bin_path, dtype=RECORD_DTYPE, mode="r", shape=(meta["rows"],))
+
+
+def total_rows(csv_path):
+    """
+    总行数 (仅在缓存有效时可以不扫描文件直接得到，否则返回 None)
+    """
+    meta = _read_meta(csv_path)
+    return meta["rows"] if is_fresh(csv_path, meta) else None
+
+
+def _typed(df):
+    for name in RECORD_DTYPE.names:
+        df[name] = pd.to_numeric(df[name], errors="coerce")
+    # 与 frame_to_records 一致，丢弃时间戳无法解析的行，缓存命中与否返回相同的数据
+    df = df[df["Open_time"].notna() & df["Close_time"].notna()].reset_index(drop=True)
+    df["Human_Time"] = pd.to_datetime(df["Human_Time"])
+    return df
+
+
+def _read_csv_tail(csv_path, n):
+    with open(csv_path, "r", encoding="utf-8") as f:
+        header = f.readline()
+    rows = tail_lines(csv_path, n)
+    text = header + "".join(line + "\n" for _, line in rows)
+    return _typed(pd.read_csv(io.StringIO(text)))
+
+
+def load_klines(csv_path, tail=None, lookback=0):
+    """
+    统一的数据读取入口: 优先读取二进制缓存，过期时退回解析 CSV。
+    返回的 DataFrame 列与 *_Cleaned.csv 一致，数值列已是数值类型。
+
+    tail: 只需要最后 tail 根 K 线 (再加上指标计算所需的 lookback 根) 时，
+    缓存路径只切片 memmap 的末尾记录，CSV 路径从文件末尾向前按块读取，
+    内存与耗时都不随历史长度增长。
+    """
+    n = tail + lookback if tail else None
+    records = open_cache(csv_path)
+    if records is not None:
+        return records_to_frame(records[-n:] if n else records)
+
+    if n:
+        return _read_csv_tail(csv_path, n)
+
+    df = _typed(pd.read_csv(csv_path))
+    try:
+        write_cache(csv_path, df)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 无法写入二进制缓存: {e}")
+    return df
@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+
+import numpy as np
+
+import binance_data_pro
+import kline_bars
+import kline_cache
+import kline_store
+import pipeline_metrics
+
+# ================= K 线完整性检查与定向修复 =================
+# 按周期网格检查存储中的 Open_time (向量化 diff，不逐行遍历):
+#   缺口       相邻两根的间隔大于一个周期，缺失 (间隔 / 周期 - 1) 根
+#   重复       相邻两根 Open_time 相同
+#   乱序       相邻两根 Open_time 倒退
+#   未对齐     与第一根的距离不是周期的整数倍
+# 修复时只按缺口的时间范围重新拉取 (binance_data_pro.fetch_window，带指数退避重试)，
+# 通过 kline_store.merge_klines 插入存储，不需要全量重新下载。
+# 交易所本身没有数据的时段 (维护停机等) 拉取成功但仍然为空，记为"已确认缺口"，以后不再重复请求。
+# 每次检查的结果写入数据目录下的 .kline_quality.json。
+
+QUALITY_FILE = ".kline_quality.json"
+DEFAULT_MAX_RETRIES = binance_data_pro.MAX_RETRIES
+
+_lock = threading.Lock()
+
+
+def scan(open_time, step):
+    """
+    检查 Open_time 序列，返回完整性统计 (缺口列表中 start / end 为缺失的第一根与最后一根的开盘时间)
+    """
+    t = np.asarray(open_time, dtype=np.int64)
+    report = {"rows": len(t), "first": None, "last": None, "expected": len(t), "missing_bars": 0,
+              "gaps": [], "duplicates": 0, "out_of_order": 0, "misaligned": 0}
+    if not len(t):
+        return report
+    diff = np.diff(t)
+    report["duplicates"] = int((diff == 0).sum())
+    report["out_of_order"] = int((diff < 0).sum())
+    # 有重复或乱序时按去重排序后的序列计算缺口 (修复写回时同样会去重排序)
+    u = np.unique(t) if report["duplicates"] or report["out_of_order"] else t
+    d = np.diff(u)
+    report["first"], report["last"] = int(u[0]), int(u[-1])
+    report["expected"] = int((u[-1] - u[0]) // step) + 1
+    report["misaligned"] = int(((u - u[0]) % step != 0).sum())
+    idx = np.flatnonzero(d > step)
+    # 未对齐时间隔不是周期的整数倍，向上取整
+    missing = -(-d[idx] // step) - 1
+    # 间隔不足两个周期的未对齐缺口 (如 0 -> 90000，步长 60000) 按周期推算的终点会早于起点，夹到起点
+    report["gaps"] = [{"start": int(u[i] + step), "end": int(max(u[i + 1] - step, u[i] + step)), "bars": int(m)}
+                      for i, m in zip(idx, missing) if m > 0]
+    report["missing_bars"] = int(sum(g["bars"] for g in report["gaps"]))
+    return report
+
+
+def check_store(data_dir, symbol, interval):
+    """
+    检查单个交易对的存储 (二进制缓存有效时只读取 Open_time 一列)
+    """
+    bars = kline_bars.load_bars(kline_store.csv_path(data_dir, symbol, interval), columns=())
+    return scan(bars.open_time(), binance_data_pro.INTERVAL_MS[interval])
+
+
+# ----------------- 报告文件 -----------------
+def load_reports(data_dir):
+    path = os.path.join(data_dir, QUALITY_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_report(data_dir, symbol, interval, report):
+    with _lock:
+        reports = load_reports(data_dir)
+        reports[kline_store.store_key(symbol, interval)] = report
+        fd, tmp_path = tempfile.mkstemp(dir=data_dir or ".", prefix=".kline_quality_", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2, sort_keys=True)
+        kline_cache.replace_file(tmp_path, os.path.join(data_dir, QUALITY_FILE))
+
+
+# ----------------- 修复 -----------------
+def refetch_gaps(symbol, interval, gaps, max_retries=DEFAULT_MAX_RETRIES):
+    """
+    只拉取缺口覆盖的时间窗口，返回 (原始 K 线列表, 拉取成功的缺口, 拉取失败的缺口)
+    """
+    import requests
+
+    rows, fetched, failed = [], [], []
+    with requests.Session() as session:
+        for gap in gaps:
+            try:
+                for window in binance_data_pro.plan_windows(interval, gap["start"], gap["end"]):
+                    rows.extend(binance_data_pro.fetch_window(session, symbol, interval, window, max_retries))
+            except RuntimeError as e:
+                print(f"⚠️ 缺口修复失败: {e}")
+                failed.append(gap)
+                continue
+            fetched.append(gap)
+    return rows, fetched, failed
+
+
+def _covered(gap, ranges):
+    return any(start <= gap["start"] and gap["end"] <= end for start, end in ranges)
+
+
+def verify_store(data_dir, symbol, interval, repair=True, max_retries=DEFAULT_MAX_RETRIES):
+    """
+    检查存储完整性，repair=True 时定向补齐缺口并去除重复，返回写入报告文件的检查结果
+    """
+    report = check_store(data_dir, symbol, interval)
+    previous = load_reports(data_dir).get(kline_store.store_key(symbol, interval), {})
+    confirmed = [(g["start"], g["end"]) for g in previous.get("confirmed_gaps", [])]
+    todo = [g for g in report["gaps"] if not _covered(g, confirmed)]
+    pipeline_metrics.count("gaps_found", len(report["gaps"]))
+    pipeline_metrics.count("bars_missing", report["missing_bars"])
+
+    refetched = 0
+    fetched = []
+    if repair and (todo or report["duplicates"] or report["out_of_order"]):
+        rows = []
+        if todo:
+            print(f"🩹 {symbol} {interval}: 定向补齐 {len(todo)} 处缺口 ({sum(g['bars'] for g in todo)} 根)...")
+            rows, fetched, _ = refetch_gaps(symbol, interval, todo, max_retries)
+        if rows:
+            df = binance_data_pro.clean_klines(rows)
+            kline_store.merge_klines(data_dir, symbol, interval, df)
+            refetched = len(df)
+        elif report["duplicates"] or report["out_of_order"]:
+            # 只有重复 / 乱序: 按原写入时间重写一次 (write_klines 会去重排序)
+            print(f"🩹 {symbol} {interval}: 去除重复 {report['duplicates']} 根并按时间排序...")
+            path = kline_store.csv_path(data_dir, symbol, interval)
+            entry = kline_store.load_state(data_dir).get(kline_store.store_key(symbol, interval), {})
+            kline_store.write_klines(data_dir, symbol, interval, kline_cache.load_klines(path), entry.get("fetched_at", 0))
+        pipeline_metrics.count("bars_refetched", refetched)
+        report = check_store(data_dir, symbol, interval)
+
+    # 落在拉取成功的范围内、交易所却没有返回数据的缺口视为已确认，以后跳过
+    confirmed += [(g["start"], g["end"]) for g in fetched]
+    report["confirmed_gaps"] = [g for g in report["gaps"] if _covered(g, confirmed)]
+    report["refetched_bars"] = refetched
+    report["checked_at"] = int(time.time() * 1000)
+    save_report(data_dir, symbol, interval, report)
+
+    unconfirmed = len(report["gaps"]) - len(report["confirmed_gaps"])
+    status = "✅" if not unconfirmed and not report["duplicates"] and not report["out_of_order"] else "⚠️"
+    print(f"{status} 完整性 {symbol} {interval}: {report['rows']}/{report['expected']} 根, "
+          f"缺口 {len(report['gaps'])} 处 ({report['missing_bars']} 根, 已确认 {len(report['confirmed_gaps'])}), "
+          f"重复 {report['duplicates']}, 乱序 {report['out_of_order']}, 补齐 {refetched} 根")
+    return report
+
+
+def parse_store_name(csv_path):
+    """
+    {SYMBOL}_{INTERVAL}_Cleaned.csv -> (数据目录, symbol, interval)
+    """
+    name = os.path.basename(csv_path)
+    if not name.endswith("_Cleaned.csv") or name.count("_") < 2:
+        return None
+    symbol, interval = name[:-len("_Cleaned.csv")].rsplit("_", 1)
+    return os.path.dirname(os.path.abspath(csv_path)), symbol, interval
+
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='K 线存储完整性检查 (缺口 / 重复 / 乱序) 与定向修复')
+    parser.add_argument('csv_paths', nargs='*', help='*_Cleaned.csv 路径 (默认本目录下全部)')
+    parser.add_argument('--repair', action='store_true', help='重新拉取缺口并去除重复')
+    parser.add_argument('--retries', type=int, default=DEFAULT_MAX_RETRIES, help=f'每个窗口的最大重试次数 (默认 {DEFAULT_MAX_RETRIES})')
+    parser.add_argument('--show-gaps', type=int, default=5, help='每个文件列出前 N 处缺口 (默认 5)')
+    args = parser.parse_args()
+
+    paths = args.csv_paths or sorted(os.path.join(here, f) for f in os.listdir(here) if f.endswith("_Cleaned.csv"))
+    problems = 0
+    for path in paths:
+        parsed = parse_store_name(path)
+        if parsed is None or not os.path.exists(path):
+            print(f"❌ 无法识别的存储文件: {path}")
+            problems += 1
+            continue
+        data_dir, symbol, interval = parsed
+        if interval not in binance_data_pro.INTERVAL_MS:
+            print(f"⚠️ 跳过 {symbol} {interval}: 周期长度不固定")
+            continue
+        report = verify_store(data_dir, symbol, interval, repair=args.repair, max_retries=args.retries)
+        for gap in report["gaps"][:args.show_gaps]:
+            start = time.strftime("%Y-%m-%d %H:%M", time.gmtime(gap["start"] / 1000))
+            end = time.strftime("%Y-%m-%d %H:%M", time.gmtime(gap["end"] / 1000))
+            tag = " (已确认)" if gap in report["confirmed_gaps"] else ""
+            print(f"   缺口 {start} ~ {end} UTC: {gap['bars']} 根{tag}")
+        if len(report["gaps"]) - len(report["confirmed_gaps"]) or report["duplicates"] or report["out_of_order"]:
+            problems += 1
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import kline_cache
+import kline_store
+from binance_data_pro import INTERVAL_MS
+
+# ================= 多周期重采样 =================
+# 每个交易对只下载一条 1m 数据流，5m / 15m / 1h / 4h / 1d 等高周期由 1m 聚合得到，
+# 写入同名的 {SYMBOL}_{INTERVAL}_Cleaned.csv，绘图 / AI 脚本仍通过 kline_cache.load_klines 读取。
+# 聚合规则与 Binance 一致: 按 UTC 对齐分桶，开=首根开盘、高=最高、低=最低、收=末根收盘，
+# 成交量 / 成交额 / 成交笔数 / 主动买入量 / 主动买入额 求和。
+# 增量更新时只读取目标周期最后一根 K 线 (可能尚未收盘) 之后的 1m 数据，重新聚合后追加。
+
+BASE_INTERVAL = "1m"
+DEFAULT_TARGETS = ["5m", "15m", "1h", "4h", "1d"]
+
+# 分桶起点相对 Unix 纪元的偏移: 纪元 (1970-01-01) 是周四，Binance 周线从周一 00:00 UTC 开始
+BUCKET_OFFSET_MS = {"1w": 4 * 86_400_000}
+
+SUM_FIELDS = ("Volume", "Quote_asset_volume", "Number_of_trades",
+              "Taker_buy_base_asset_volume", "Taker_buy_quote_asset_volume")
+
+
+def resample_records(records, interval, drop_partial_head=True):
+    """
+    将按 Open_time 排序的 1m 记录 (kline_cache.RECORD_DTYPE) 聚合为 interval 周期的记录
+    drop_partial_head: 第一个桶不是从桶起点开始时丢弃 (数据起点落在桶中间，聚合结果不完整)
+    """
+    step = INTERVAL_MS[interval]
+    if len(records) == 0:
+        return np.empty(0, dtype=kline_cache.RECORD_DTYPE)
+    open_time = np.asarray(records["Open_time"])
+    bucket = open_time - (open_time - BUCKET_OFFSET_MS.get(interval, 0)) % step
+    starts = np.flatnonzero(np.concatenate([[True], bucket[1:] != bucket[:-1]]))
+    ends = np.concatenate([starts[1:], [len(records)]]) - 1
+
+    out = np.empty(len(starts), dtype=kline_cache.RECORD_DTYPE)
+    out["Open_time"] = bucket[starts]
+    out["Close_time"] = bucket[starts] + step - 1
+    out["Open"] = records["Open"][starts]
+    out["Close"] = records["Close"][ends]
+    out["High"] = np.maximum.reduceat(np.asarray(records["High"]), starts)
+    out["Low"] = np.minimum.reduceat(np.asarray(records["Low"]), starts)
+    for name in SUM_FIELDS:
+        out[name] = np.add.reduceat(np.asarray(records[name]), starts)
+        if out.dtype[name].kind == "f":
+            # 求和的浮点误差会让 CSV 中出现 0.30000000000000004 这样的尾数，按交易所精度 (8 位) 取整
+            out[name] = np.round(out[name], 8)
+
+    if drop_partial_head and open_time[0] != bucket[0]:
+        out = out[1:]
+    return out
+
+
+def _base_records(data_dir, symbol):
+    path = kline_store.csv_path(data_dir, symbol, BASE_INTERVAL)
+    if not os.path.exists(path):
+        return None
+    records = kline_cache.open_cache(path)
+    if records is None:
+        # 缓存过期: 读取一次 CSV (load_klines 会顺便重建缓存)
+        records = kline_cache.frame_to_records(kline_cache.load_klines(path))
+    return records
+
+
+def update_interval(data_dir, symbol, interval, base=None):
+    """
+    由 1m 存储增量更新一个高周期存储，返回 kline_store 的写入摘要 (没有可用数据时返回 None)
+    """
+    if INTERVAL_MS[interval] % INTERVAL_MS[BASE_INTERVAL]:
+        raise ValueError(f"{interval} 不是 {BASE_INTERVAL} 的整数倍")
+    base = base if base is not None else _base_records(data_dir, symbol)
+    if base is None or len(base) == 0:
+        return None
+
+    last = kline_store.last_bar(data_dir, symbol, interval)
+    if last is None:
+        bars = resample_records(base, interval)
+        if len(bars) == 0:
+            return None
+        return kline_store.write_klines(data_dir, symbol, interval, kline_cache.records_to_frame(bars))
+
+    # 从目标周期最后一根 K 线的起点重新聚合 (它可能是未收盘的 K 线)；
+    # 已有数据比 1m 更早时 (例如之前单独下载过)，只覆盖 1m 覆盖到的部分
+    start = int(np.searchsorted(base["Open_time"], last[0], side="left"))
+    bars = resample_records(base[start:], interval)
+    if len(bars) == 0:
+        return {"appended": 0, "replaced": 0, "path": kline_store.csv_path(data_dir, symbol, interval)}
+    return kline_store.append_klines(data_dir, symbol, interval, kline_cache.records_to_frame(bars))
+
+
+def update_all(data_dir, symbol, targets=None):
+    """
+    由同一份 1m 数据更新多个周期，返回 {interval: 写入摘要}
+    """
+    base = _base_records(data_dir, symbol)
+    if base is None:
+        print(f"❌ 找不到 {symbol} {BASE_INTERVAL} 数据: {kline_store.csv_path(data_dir, symbol, BASE_INTERVAL)}")
+        return {}
+    results = {}
+    for interval in targets or DEFAULT_TARGETS:
+        if interval == BASE_INTERVAL:
+            continue
+        result = update_interval(data_dir, symbol, interval, base)
+        results[interval] = result
+        if result:
+            print(f"🔁 {symbol} {interval}: 新增 {result['appended']} 行, 覆盖 {result['replaced']} 行 -> {result['path']}")
+    return results
+
+
+def load_resampled(data_dir, symbol, interval, tail=None):
+    """
+    直接从 1m 数据聚合并返回 DataFrame (不写入存储)，列与 *_Cleaned.csv 一致
+    """
+    base = _base_records(data_dir, symbol)
+    if base is None:
+        return pd.DataFrame(columns=kline_cache.CSV_COLUMNS)
+    if tail:
+        # 只取足够聚合出最后 tail 根的 1m 数据
+        span = (tail + 1) * INTERVAL_MS[interval]
+        start = int(np.searchsorted(base["Open_time"], int(base["Open_time"][-1]) - span, side="left"))
+        base = base[start:]
+    bars = resample_records(base, interval)
+    return kline_cache.records_to_frame(bars[-tail:] if tail else bars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='由 1m K 线聚合生成高周期数据')
+    parser.add_argument('symbol', nargs='?', default='ADAUSDC', help='交易对 (默认 ADAUSDC)')
+    parser.add_argument('intervals', nargs='*', default=DEFAULT_TARGETS, help=f'目标周期 (默认 {" ".join(DEFAULT_TARGETS)})')
+    parser.add_argument('--data-dir', default=os.path.dirname(os.path.abspath(__file__)), help='K 线存储目录')
+    args = parser.parse_args()
+
+    unknown = [i for i in args.intervals if i not in INTERVAL_MS]
+    if unknown:
+        print(f"❌ 不支持的周期: {', '.join(unknown)}")
+        sys.exit(1)
+    if not update_all(args.data_dir, args.symbol.upper(), args.intervals):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
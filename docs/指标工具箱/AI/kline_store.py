@@ -0,0 +1,232 @@
+import os
+import json
+import shutil
+import time
+import tempfile
+
+import kline_cache
+
+# ================= 本地 K 线增量存储 =================
+# 以 {SYMBOL}_{INTERVAL}_Cleaned.csv 作为持久化存储，
+# 另用一个小的状态文件记录每个 (symbol, interval) 最后一根 K 线的 Open_time / Close_time，
+# 刷新时只需拉取缺失的尾部数据并追加，而不必从 2024-01-01 重新分页下载。
+# 每次写入后同步更新 kline_cache 的二进制缓存，供绘图/AI 脚本快速读取。
+
+STATE_FILE = ".kline_store.json"
+
+# 追加时向前扫描多少行寻找与新数据重叠的部分 (正常情况下只有最后 1 根未收盘 K 线会重叠)
+OVERLAP_SCAN_ROWS = 64
+
+
+def csv_path(data_dir, symbol, interval):
+    return os.path.join(data_dir, f"{symbol}_{interval}_Cleaned.csv")
+
+
+def store_key(symbol, interval):
+    return f"{symbol}_{interval}"
+
+
+# ----------------- 状态文件 -----------------
+def load_state(data_dir):
+    path = os.path.join(data_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"⚠️ 状态文件损坏，将根据 CSV 尾部重建: {path}")
+        return {}
+
+
+def save_state(data_dir, state):
+    path = os.path.join(data_dir, STATE_FILE)
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir or ".", prefix=".kline_state_", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2, sort_keys=True)
+    kline_cache.replace_file(tmp_path, path)
+
+
+def _row_times(line):
+    # 列顺序: Human_Time, Open_time, Open, High, Low, Close, Volume, Close_time, ...
+    parts = line.split(",")
+    return int(float(parts[1])), int(float(parts[7]))
+
+
+def last_bar(data_dir, symbol, interval):
+    """
+    返回最后一根已存储 K 线的 (Open_time, Close_time)，没有数据时返回 None。
+    直接读取 CSV 尾部而不是信任状态文件 (CSV 可能被手工替换过)。
+    """
+    path = csv_path(data_dir, symbol, interval)
+    if not os.path.exists(path):
+        return None
+    rows = kline_cache.tail_lines(path, 1)
+    if not rows:
+        return None
+    return _row_times(rows[0][1])
+
+
+def first_open_time(data_dir, symbol, interval):
+    path = csv_path(data_dir, symbol, interval)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        f.readline()
+        line = f.readline().strip()
+    return _row_times(line)[0] if line else None
+
+
+def get_resume_ts(data_dir, symbol, interval):
+    """
+    计算增量拉取的起始时间:
+    - 最后一根 K 线写入时已收盘 -> 从 Close_time + 1 开始
+    - 最后一根 K 线写入时尚未收盘 (或状态缺失) -> 从它的 Open_time 重新拉取，追加时按 Open_time 去重覆盖
+    """
+    bar = last_bar(data_dir, symbol, interval)
+    if bar is None:
+        return None
+    last_open, last_close = bar
+
+    entry = load_state(data_dir).get(store_key(symbol, interval), {})
+    if entry.get("last_open_time") == last_open and last_close < entry.get("fetched_at", 0):
+        return last_close + 1
+    return last_open
+
+
+# ----------------- 写入 -----------------
+def _ensure_trailing_newline(f):
+    f.seek(0, os.SEEK_END)
+    if f.tell() == 0:
+        return
+    f.seek(-1, os.SEEK_END)
+    if f.read(1) != b"\n":
+        f.write(b"\n")
+
+
+def write_klines(data_dir, symbol, interval, df, fetched_at=None):
+    """
+    全量写入 (原子替换)，并重置该交易对的状态。
+    """
+    path = csv_path(data_dir, symbol, interval)
+    df = df.drop_duplicates("Open_time", keep="last").sort_values("Open_time")
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir or ".", prefix=".kline_", suffix=".tmp")
+    os.close(fd)
+    try:
+        df.to_csv(tmp_path, index=False)
+        kline_cache.replace_file(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    kline_cache.write_cache(path, df)
+    _update_state(data_dir, symbol, interval, df, fetched_at)
+    return {"appended": len(df), "replaced": 0, "path": path}
+
+
+def append_klines(data_dir, symbol, interval, new_df, fetched_at=None):
+    """
+    将新拉取的 K 线追加到存储末尾:
+    1. 只读取 CSV 尾部若干行，定位与新数据重叠 (Open_time >= 新数据起点) 的字节偏移
+    2. 复制一份临时文件，截断重叠部分后追加新行
+    3. os.replace 原子替换，任何时刻读者看到的都是完整文件
+    重叠超出尾部扫描范围时 (例如补历史数据)，退化为完整合并重写。
+    """
+    path = csv_path(data_dir, symbol, interval)
+    if new_df.empty:
+        return {"appended": 0, "replaced": 0, "path": path}
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return write_klines(data_dir, symbol, interval, new_df, fetched_at)
+
+    new_df = new_df.drop_duplicates("Open_time", keep="last").sort_values("Open_time")
+    first_new = int(new_df["Open_time"].iloc[0])
+
+    rows = kline_cache.tail_lines(path, OVERLAP_SCAN_ROWS)
+    if not rows:
+        return write_klines(data_dir, symbol, interval, new_df, fetched_at)
+
+    times = [_row_times(line)[0] for _, line in rows]
+    covers_whole_file = len(rows) < OVERLAP_SCAN_ROWS
+    last_new = int(new_df["Open_time"].iloc[-1])
+    if (first_new < times[0] and not covers_whole_file) or last_new < times[-1]:
+        return merge_klines(data_dir, symbol, interval, new_df, fetched_at)
+
+    cut = None
+    replaced = 0
+    for (offset, _), open_time in zip(rows, times):
+        if open_time >= first_new:
+            cut = offset
+            replaced = sum(1 for t in times if t >= first_new)
+            break
+
+    cache_fresh = kline_cache.is_fresh(path)
+    fd, tmp_path = tempfile.mkstemp(dir=data_dir or ".", prefix=".kline_", suffix=".tmp")
+    os.close(fd)
+    try:
+        shutil.copyfile(path, tmp_path)
+        with open(tmp_path, "r+b") as f:
+            if cut is not None:
+                f.truncate(cut)
+            _ensure_trailing_newline(f)
+            f.seek(0, os.SEEK_END)
+            f.write(new_df.to_csv(index=False, header=False).encode("utf-8"))
+        kline_cache.replace_file(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    kline_cache.update_cache(path, new_df, cache_fresh)
+    _update_state(data_dir, symbol, interval, new_df, fetched_at)
+    return {"appended": len(new_df) - replaced, "replaced": replaced, "path": path}
+
+
+def merge_klines(data_dir, symbol, interval, new_df, fetched_at=None):
+    """
+    完整合并: 读取整个 CSV，与新数据拼接后按 Open_time 去重排序再原子写回。
+    只在新数据落在存储中间 (补历史/修复缺口) 时使用。
+    """
+    import pandas as pd
+
+    path = csv_path(data_dir, symbol, interval)
+    old_df = pd.read_csv(path)
+    before = len(old_df)
+    if len(old_df) and int(new_df["Open_time"].max()) < int(old_df["Open_time"].iloc[-1]):
+        # 最后一根仍是旧数据，沿用它原来的写入时间，避免把未收盘的 K 线误判为已收盘
+        entry = load_state(data_dir).get(store_key(symbol, interval), {})
+        fetched_at = entry.get("fetched_at", 0)
+    merged = pd.concat([old_df, new_df], ignore_index=True)
+    merged["Open_time"] = pd.to_numeric(merged["Open_time"], errors="coerce")
+    merged["Human_Time"] = pd.to_datetime(merged["Human_Time"])
+    merged = merged.drop_duplicates("Open_time", keep="last").sort_values("Open_time")
+    result = write_klines(data_dir, symbol, interval, merged, fetched_at)
+    result["appended"] = len(merged) - before
+    result["replaced"] = len(new_df) - result["appended"]
+    return result
+
+
+def _update_state(data_dir, symbol, interval, df, fetched_at):
+    _set_state(data_dir, symbol, interval, int(df["Open_time"].iloc[-1]), int(df["Close_time"].iloc[-1]), fetched_at)
+
+
+def _set_state(data_dir, symbol, interval, last_open_time, last_close_time, fetched_at):
+    state = load_state(data_dir)
+    state[store_key(symbol, interval)] = {
+        "last_open_time": last_open_time,
+        "last_close_time": last_close_time,
+        "fetched_at": int(fetched_at if fetched_at is not None else time.time() * 1000),
+    }
+    save_state(data_dir, state)
+
+
+def sync_state(data_dir, symbol, interval, fetched_at=None):
+    """
+    CSV 被整体替换后 (如导入历史归档) 按其最后一行更新状态文件，避免下次增量拉取时误判为被改动而从尾部重拉。
+    fetched_at 为空时沿用原记录的拉取时间
+    """
+    last = last_bar(data_dir, symbol, interval)
+    if last is None:
+        return
+    if fetched_at is None:
+        fetched_at = load_state(data_dir).get(store_key(symbol, interval), {}).get("fetched_at")
+    _set_state(data_dir, symbol, interval, last[0], last[1], fetched_at)
@@ -1,15 +1,35 @@
 
-import pandas as pd
-import mplfinance as mpf
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
+import numpy as np
 import os
 import platform
+import hashlib
 import argparse
 import sys
+import time
+
+# kline_bars.py 等模块位于上一级目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import kline_bars
+import pipeline_metrics
+import wyckoff_ad
+import wyckoff_events
+import wyckoff_report
+
+# matplotlib / mplfinance 导入约需 1 秒，只在真正绘图时才导入 (见各绘图函数内的 import)，
+# --help、以及数据未变化跳过渲染的运行都不需要付出这部分启动开销。
 
 # --- 1. 配置中文显示 ---
+# 字体探测结果按进程缓存，批量渲染时只探测一次
+_FONT_PROP = None
+_FONT_CONFIGURED = False
+
 def configure_font():
+    global _FONT_PROP, _FONT_CONFIGURED
+    if _FONT_CONFIGURED:
+        return _FONT_PROP
+    _FONT_CONFIGURED = True
+    import matplotlib.pyplot as plt
+    import matplotlib.font_manager as fm
     system = platform.system()
     font_path = None
     
@@ -29,59 +49,83 @@ def configure_font():
         prop = fm.FontProperties(fname=font_path)
         plt.rcParams['font.family'] = prop.get_name()
         print(f"✅ 已加载中文字体: {font_path}")
+        _FONT_PROP = prop
         return prop
     else:
         print("⚠️ 未找到常用中文字体，中文可能乱码")
         return None
 
-font_prop = configure_font()
-
 # --- 2. 参数解析 & 数据读取 ---
-parser = argparse.ArgumentParser(description='绘制威科夫分析图 (Master Mode)')
-parser.add_argument('input_csv', nargs='?', default="../ADAUSDC_4h_Cleaned.csv", help='输入的 CSV 文件路径')
-args = parser.parse_args()
+# 图表只展示最近 400 根 K 线
+WINDOW = 400
+# RSI 横盘箱体的递推需要额外的历史预热 (事件识别在完整存储上进行，不受窗口影响)
+AD_LOOKBACK = 200
 
-file_path = args.input_csv
-if not os.path.exists(file_path):
-    print(f"❌ 错误: 找不到文件 {file_path}")
-    sys.exit(1)
-
-base_name = os.path.splitext(os.path.basename(file_path))[0].replace("_Cleaned", "")
-print(f"📖 读取数据: {file_path}")
-df = pd.read_csv(file_path)
-
-df['Date'] = pd.to_datetime(df['Human_Time'])
-df.set_index('Date', inplace=True)
-
-for c in ['Open', 'High', 'Low', 'Close', 'Volume']:
-    df[c] = pd.to_numeric(df[c], errors='coerce')
+def load_data(file_path, tail=None):
+    print(f"📖 读取数据: {file_path}")
+    # 优先读取二进制缓存 (已是数值类型)，缓存过期时自动退回解析 CSV；只读取需要的尾部窗口，
+    # 经紧凑容器只转换绘图与分析用到的 开/高/低/收/量 列
+    return kline_bars.load_bars(file_path, tail=tail).to_mpf_frame()
 
 # --- 3. 结构分析 (优化后的启发式逻辑) ---
-# 截取最近 400 根 K 线以获得更清晰的视觉重点
-plot_df = df.tail(400).copy()
-
-# A. 趋势顶点 (BC/UTAD)
-max_idx = plot_df['High'].idxmax()
-bc_price = plot_df.loc[max_idx, 'High']
-
-# B. 趋势底点 (SC/Spring)
-min_idx = plot_df['Low'].idxmin()
-sc_price = plot_df.loc[min_idx, 'Low']
-
-# C. TR 范围预测
-after_sc = plot_df[plot_df.index > min_idx]
-if not after_sc.empty:
-    ar_idx_real = after_sc['High'].idxmax()
-    tr_top = after_sc.loc[ar_idx_real, 'High']
-    tr_bottom = sc_price
-else:
-    tr_top = bc_price * 0.98
-    tr_bottom = sc_price
-    ar_idx_real = plot_df.index[-1]
+def analyze_structure(df, events=None):
+    """
+    events: wyckoff_events.detect_file 在完整存储上的识别结果；为空时在 df 上识别
+    """
+    # 截取最近 400 根 K 线以获得更清晰的视觉重点
+    plot_df = df.tail(WINDOW).copy()
+
+    # A. 趋势顶点 (BC/UTAD)
+    max_idx = plot_df['High'].idxmax()
+    bc_price = plot_df.loc[max_idx, 'High']
+
+    # B. 趋势底点 (SC/Spring)
+    min_idx = plot_df['Low'].idxmin()
+    sc_price = plot_df.loc[min_idx, 'Low']
+
+    # C. TR 范围预测
+    after_sc = plot_df[plot_df.index > min_idx]
+    if not after_sc.empty:
+        ar_idx_real = after_sc['High'].idxmax()
+        tr_top = after_sc.loc[ar_idx_real, 'High']
+        tr_bottom = sc_price
+    else:
+        tr_top = bc_price * 0.98
+        tr_bottom = sc_price
+        ar_idx_real = plot_df.index[-1]
+
+    # D. 事件识别 (SC/BC, AR, ST, Spring, UTAD, SOS/SOW, LPS/LPSY)
+    # 图表只标注落在窗口内的事件 (bar 转换为图表内的位置)；报告表格列出完整历史中最近的事件，
+    # 窗口仍处于较早开始的区间内时也能看到该区间的 SC/BC 与 AR
+    if events is None:
+        events, _ = wyckoff_events.detect_from_frame(df)
+    recent_events = events[-wyckoff_report.EVENT_ROWS:]
+    events = wyckoff_events.window_events(events, plot_df["Open_time"].to_numpy())
+    offset = len(df) - len(plot_df)
+
+    # E. RSI 横盘箱体 (Wyckoff_AD.pine)，只保留与图表窗口重叠且有宽度 (Pine 中会填充背景) 的箱体
+    _, ad_boxes = wyckoff_ad.compute_from_frame(df)
+    ad_boxes = ad_boxes[(ad_boxes["end"] >= offset) & ad_boxes["filled"]]
+    ad_boxes["start"] = np.maximum(ad_boxes["start"] - offset, 0)
+    ad_boxes["end"] -= offset
+    ad_boxes["created"] -= offset
+
+    return {
+        "plot_df": plot_df,
+        "max_idx": max_idx,
+        "bc_price": bc_price,
+        "min_idx": min_idx,
+        "sc_price": sc_price,
+        "ar_idx": ar_idx_real,
+        "has_ar": not after_sc.empty,
+        "tr_top": tr_top,
+        "tr_bottom": tr_bottom,
+        "events": events,
+        "recent_events": recent_events,
+        "ad_boxes": ad_boxes,
+    }
 
 # --- 4. 绘图 (Master Level 暗色风格) ---
-print(f"🎨 正在绘制 Master 风格全景图...")
-
 # 定义专业颜色
 COLOR_TR_BOX = '#263238' # 深蓝灰背景
 COLOR_GOLD = '#FFD700'   # 金色 (上沿)
@@ -89,147 +133,387 @@ COLOR_AZURE = '#00BFFF'  # 天蓝色 (下沿)
 COLOR_TEXT = '#FFFFFF'
 COLOR_GRID = '#37474F'
 
-# 自定义 mplfinance 风格 (基于 nightclouds 但更极致)
-s = mpf.make_mpf_style(
-    base_mpf_style='nightclouds',
-    gridcolor=COLOR_GRID,
-    facecolor='#121212', # 纯黑背景
-    edgecolor='#333333',
-    figcolor='#121212',
-    y_on_right=True,
-    marketcolors=mpf.make_marketcolors(
-        up='#00c853', down='#ff5252',
-        inherit=True
-    )
-)
-
-# 标注列表 (时间, 价格, 标签, 偏移方向, 颜色)
-# 偏移方向: 1 为上方, -1 为下方
-annotations = [
-    (max_idx, bc_price, "BC/UTAD", 1, COLOR_GOLD),
-    (min_idx, sc_price, "SC/SPRING", -1, COLOR_AZURE),
-]
-if not after_sc.empty:
-    annotations.append((ar_idx_real, tr_top, "AR/LPSY", 1, COLOR_TEXT))
-
-# 绘图调用
-fig, axes = mpf.plot(
-    plot_df,
-    type='candle',
-    volume=True,
-    title=f"\nWYCKOFF MASTER ANALYSIS: {base_name.replace('_', ' ')}",
-    style=s,
-    returnfig=True,
-    figsize=(20, 10),
-    panel_ratios=(1, 0.3),
-    tight_layout=True,
-    hlines=dict(hlines=[tr_top, tr_bottom], colors=[COLOR_GOLD, COLOR_AZURE], linestyle='--', linewidths=1.5, alpha=0.6)
-)
-
-ax_main = axes[0]
-ax_vol = axes[2]
-
-# --- 5. 装饰图表 ---
-
-# 1. 绘制 TR 阴影背景
-def get_x_loc(timestamp):
-    try: return plot_df.index.get_loc(timestamp)
-    except: return 0
-
-x_start = get_x_loc(min_idx)
-x_end = len(plot_df) - 1
-rect = plt.Rectangle((x_start, tr_bottom), x_end - x_start, tr_top - tr_bottom, 
-                     facecolor='#FFD700', alpha=0.08, edgecolor='none', zorder=0)
-ax_main.add_patch(rect)
-
-# 2. 绘制智能文字标注
-for date, price, label, direction, color in annotations:
-    x_idx = get_x_loc(date)
-    offset = (plot_df['High'].max() - plot_df['Low'].min()) * 0.05 * direction
-    
-    ax_main.annotate(
-        label,
-        xy=(x_idx, price),
-        xytext=(x_idx, price + offset),
-        arrowprops=dict(arrowstyle='->', color=color, lw=1.2, alpha=0.8),
-        fontsize=11,
-        color=color,
-        fontweight='bold',
-        ha='center',
-        va='bottom' if direction > 0 else 'top',
-        bbox=dict(boxstyle="round,pad=0.2", fc="#1A1A1A", ec=color, alpha=0.9, lw=1)
+# 事件标记颜色 (需求类偏绿，供应类偏红)
+EVENT_COLORS = {
+    "SC": COLOR_AZURE, "BC": COLOR_GOLD, "AR": COLOR_TEXT, "ST": '#B0BEC5',
+    "SPRING": '#00E676', "SOS": '#00E676', "LPS": '#69F0AE',
+    "UTAD": '#FF5252', "SOW": '#FF5252', "LPSY": '#FF8A80',
+}
+
+# RSI 横盘箱体背景 (与 Wyckoff_AD.pine 的配色一致)
+AD_COLORS = {
+    wyckoff_ad.ACCUMULATION: '#4CAF4F', wyckoff_ad.DISTRIBUTION: '#FF5252', "": '#787B86',
+}
+
+COLOR_BG = '#121212'
+COLOR_UP = '#00c853'
+COLOR_DOWN = '#ff5252'
+
+# 自定义 mplfinance 风格 (基于 nightclouds 但更极致)，每个进程只构建一次
+_STYLE = None
+
+def get_style():
+    global _STYLE
+    if _STYLE is None:
+        import mplfinance as mpf
+        _STYLE = mpf.make_mpf_style(
+            base_mpf_style='nightclouds',
+            gridcolor=COLOR_GRID,
+            facecolor=COLOR_BG, # 纯黑背景
+            edgecolor='#333333',
+            figcolor=COLOR_BG,
+            y_on_right=True,
+            marketcolors=mpf.make_marketcolors(
+                up=COLOR_UP, down=COLOR_DOWN,
+                inherit=True
+            )
+        )
+    return _STYLE
+
+def plot_chart(structure, base_name, output_file):
+    import mplfinance as mpf
+    import matplotlib.pyplot as plt
+
+    configure_font()
+    print(f"🎨 正在绘制 Master 风格全景图...")
+    plot_df = structure["plot_df"]
+    tr_top, tr_bottom = structure["tr_top"], structure["tr_bottom"]
+
+    # 绘图调用
+    fig, axes = mpf.plot(
+        plot_df,
+        type='candle',
+        volume=True,
+        title=f"\nWYCKOFF MASTER ANALYSIS: {base_name.replace('_', ' ')}",
+        style=get_style(),
+        returnfig=True,
+        figsize=(20, 10),
+        panel_ratios=(1, 0.3),
+        tight_layout=True,
+        hlines=dict(hlines=[tr_top, tr_bottom], colors=[COLOR_GOLD, COLOR_AZURE], linestyle='--', linewidths=1.5, alpha=0.6)
     )
 
-# 3. 添加左上角数据盒 (Master Box)
-info_text = (
-    f"SYMBOL: {base_name.split('_')[0]}\n"
-    f"INTERVAL: {base_name.split('_')[1]}\n"
-    f"CURRENT: {plot_df['Close'].iloc[-1]:.4f}\n"
-    f"TR TOP: {tr_top:.4f}\n"
-    f"TR BOT: {tr_bottom:.4f}"
-)
-props = dict(boxstyle='round', facecolor='#1A1A1A', alpha=0.8, edgecolor=COLOR_GOLD, lw=1.5)
-ax_main.text(0.02, 0.95, info_text, transform=ax_main.transAxes, fontsize=12,
-             verticalalignment='top', bbox=props, color=COLOR_TEXT, fontfamily='monospace')
-
-# 4. 优化坐标轴
-ax_main.yaxis.set_label_position("right")
-ax_main.tick_params(colors=COLOR_TEXT, which='both')
-for spine in ax_main.spines.values():
-    spine.set_edgecolor(COLOR_GRID)
-
-# --- 6. 导出图片 & 报告 ---
-output_file = f"{base_name}_Wyckoff_Chart.png"
-plt.savefig(output_file, dpi=120, facecolor='#121212')
-print(f"💾 图片已保存: {output_file}")
+    ax_main = axes[0]
+    decorate(ax_main, structure, base_name)
 
-# 打印数据供 AI 参考
-print("\n=== AI 分析数据源 ===")
-print(f"TR 上沿 (AR): {tr_top:.4f}")
-print(f"TR 下沿 (SC): {tr_bottom:.4f}")
-print(f"SC 日期: {min_idx}")
-print(f"当前价格: {plot_df['Close'].iloc[-1]:.4f}")
-print("=====================\n")
+    # --- 6. 导出图片 ---
+    fig.savefig(output_file, dpi=120, facecolor=COLOR_BG)
+    plt.close(fig)
+    print(f"💾 图片已保存: {output_file}")
 
-# 生成 Markdown 报告内容
-md_output_file = f"{base_name}_Wyckoff_Analysis.md"
-current_date = pd.Timestamp.now().strftime("%Y-%m-%d")
-analysis_template = f"""# 威科夫深度研报: {base_name.replace("_", " ")}
-
-**分析日期**: {current_date}
-**数据范围**: {plot_df.index[0].strftime("%Y-%m-%d")} -> {plot_df.index[-1].strftime("%Y-%m-%d %H:%M")}
-
----
-
-## 1. 威科夫全景透视图 (Master View)
-
-![Wyckoff Chart](./{os.path.basename(output_file)})
-
----
-
-## 2. 核心量价数据
-
-| 指标 | 数值 | 威科夫含义 |
-| :--- | :--- | :--- |
-| **TR 上沿 (Resistance)** | **{tr_top:.4f}** | 供应释放区 (AR/LPSY) |
-| **TR 下沿 (Support)** | **{tr_bottom:.4f}** | 需求介入区 (SC/Spring) |
-| **当前价格 (Closing)** | **{plot_df['Close'].iloc[-1]:.4f}** | {'区间震荡中' if tr_bottom <= plot_df['Close'].iloc[-1] <= tr_top else '寻求趋势突破'} |
-
----
-
-## 3. 结构化简述
-
-1. **结构形态**: 价格目前处于由 {tr_bottom:.4f} 与 {tr_top:.4f} 构成的交易区间 (Trading Range) 内。
-2. **量价特征**: 识别到关键的 {'恐慌抛售 (SC)' if min_idx in plot_df.index else '震荡低点'}。
-3. **主点位参考**: 
-   - **防御位**: {tr_bottom:.4f} (若持续放量跌破，标志着派发完成)。
-   - **进攻位**: {tr_top:.4f} (若缩量回踩不破，标志着吸筹完成)。
-
----
-> *本报告由智能分析系统生成。威科夫法则提示：在结果显现之前，请耐心等待供求平衡的打破。*
-"""
-
-with open(md_output_file, "w", encoding="utf-8") as f:
-    f.write(analysis_template)
-
-print(f"📝 报告已更新: {md_output_file}")
+# --- 5. 装饰图表 ---
+def decorate(ax_main, structure, base_name):
+    """
+    绘制 TR 阴影、关键点标注、事件标记与数据盒，返回新增的 artist 列表 (快速渲染时用于下次移除)
+    """
+    from matplotlib.patches import Rectangle
+
+    plot_df = structure["plot_df"]
+    max_idx, bc_price = structure["max_idx"], structure["bc_price"]
+    min_idx, sc_price = structure["min_idx"], structure["sc_price"]
+    ar_idx_real = structure["ar_idx"]
+    tr_top, tr_bottom = structure["tr_top"], structure["tr_bottom"]
+    artists = []
+
+    # 标注列表 (时间, 价格, 标签, 偏移方向, 颜色)
+    # 偏移方向: 1 为上方, -1 为下方
+    annotations = [
+        (max_idx, bc_price, "BC/UTAD", 1, COLOR_GOLD),
+        (min_idx, sc_price, "SC/SPRING", -1, COLOR_AZURE),
+    ]
+    if structure["has_ar"]:
+        annotations.append((ar_idx_real, tr_top, "AR/LPSY", 1, COLOR_TEXT))
+
+    # 1. 绘制 TR 阴影背景
+    def get_x_loc(timestamp):
+        try: return plot_df.index.get_loc(timestamp)
+        except: return 0
+
+    x_start = get_x_loc(min_idx)
+    x_end = len(plot_df) - 1
+    rect = Rectangle((x_start, tr_bottom), x_end - x_start, tr_top - tr_bottom, 
+                         facecolor='#FFD700', alpha=0.08, edgecolor='none', zorder=0)
+    ax_main.add_patch(rect)
+    artists.append(rect)
+
+    # 1b. RSI 横盘箱体 (吸筹绿 / 派发红 / 尚无趋势灰)
+    for box in structure["ad_boxes"]:
+        color = AD_COLORS[str(box["phase"])]
+        width = box["end"] - box["start"]
+        patch = Rectangle((box["start"], box["bottom"]), width, box["top"] - box["bottom"],
+                          facecolor=color, alpha=0.12, edgecolor='#787B86', lw=0.8, zorder=0)
+        ax_main.add_patch(patch)
+        artists.append(patch)
+        if box["phase"]:
+            artists.append(ax_main.text(box["start"] + width / 2, box["top"], str(box["phase"]), fontsize=8,
+                                        color=color, alpha=0.7, ha='center', va='bottom'))
+
+    # 2. 绘制智能文字标注
+    for date, price, label, direction, color in annotations:
+        x_idx = get_x_loc(date)
+        offset = (plot_df['High'].max() - plot_df['Low'].min()) * 0.05 * direction
+        
+        artists.append(ax_main.annotate(
+            label,
+            xy=(x_idx, price),
+            xytext=(x_idx, price + offset),
+            arrowprops=dict(arrowstyle='->', color=color, lw=1.2, alpha=0.8),
+            fontsize=11,
+            color=color,
+            fontweight='bold',
+            ha='center',
+            va='bottom' if direction > 0 else 'top',
+            bbox=dict(boxstyle="round,pad=0.2", fc="#1A1A1A", ec=color, alpha=0.9, lw=1)
+        ))
+
+    # 3. 绘制事件识别标记 (小号标签，位于 K 线上方或下方)
+    for ev in structure["events"]:
+        x_idx = int(ev["bar"])
+        name = str(ev["event"])
+        bar_mid = (plot_df['High'].iloc[x_idx] + plot_df['Low'].iloc[x_idx]) / 2
+        above = ev["price"] >= bar_mid
+        artists.append(ax_main.annotate(
+            name,
+            xy=(x_idx, ev["price"]),
+            xytext=(0, 14 if above else -14),
+            textcoords='offset points',
+            fontsize=8,
+            color=EVENT_COLORS.get(name, COLOR_TEXT),
+            ha='center',
+            va='bottom' if above else 'top',
+            alpha=0.4 + 0.6 * float(ev["confidence"]),
+            arrowprops=dict(arrowstyle='-', color=EVENT_COLORS.get(name, COLOR_TEXT), lw=0.8, alpha=0.6)
+        ))
+
+    # 4. 添加左上角数据盒 (Master Box)
+    info_text = (
+        f"SYMBOL: {base_name.split('_')[0]}\n"
+        f"INTERVAL: {base_name.split('_')[1]}\n"
+        f"CURRENT: {plot_df['Close'].iloc[-1]:.4f}\n"
+        f"TR TOP: {tr_top:.4f}\n"
+        f"TR BOT: {tr_bottom:.4f}"
+    )
+    props = dict(boxstyle='round', facecolor='#1A1A1A', alpha=0.8, edgecolor=COLOR_GOLD, lw=1.5)
+    artists.append(ax_main.text(0.02, 0.95, info_text, transform=ax_main.transAxes, fontsize=12,
+                                verticalalignment='top', bbox=props, color=COLOR_TEXT, fontfamily='monospace'))
+
+    # 5. 优化坐标轴
+    ax_main.yaxis.set_label_position("right")
+    ax_main.tick_params(colors=COLOR_TEXT, which='both')
+    for spine in ax_main.spines.values():
+        spine.set_edgecolor(COLOR_GRID)
+    return artists
+
+# --- 6b. 快速渲染 (批量模式) ---
+# 画布、坐标轴、K 线/成交量集合只创建一次，之后每张图只替换顶点数据并重绘标注，
+# 省去每次 mpf.plot 构建 figure 与 400 个成交量矩形的开销。输出与 plot_chart 同一风格。
+class ChartTemplate:
+    def __init__(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection, PolyCollection
+        from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+        self.fig = plt.figure(figsize=(20, 10), facecolor=COLOR_BG)
+        gs = self.fig.add_gridspec(2, 1, height_ratios=(1, 0.3), hspace=0.03,
+                                   left=0.03, right=0.95, top=0.92, bottom=0.08)
+        self.ax_main = self.fig.add_subplot(gs[0])
+        self.ax_vol = self.fig.add_subplot(gs[1], sharex=self.ax_main)
+        self.title = self.fig.suptitle("", color=COLOR_TEXT, fontsize=14)
+
+        for ax in (self.ax_main, self.ax_vol):
+            ax.set_facecolor(COLOR_BG)
+            ax.grid(True, color=COLOR_GRID, linestyle='--', linewidth=0.5, alpha=0.6)
+            ax.yaxis.tick_right()
+            ax.tick_params(colors=COLOR_TEXT, which='both')
+            for spine in ax.spines.values():
+                spine.set_edgecolor(COLOR_GRID)
+        self.ax_main.tick_params(labelbottom=False)
+        self.ax_main.set_ylabel("Price", color=COLOR_TEXT)
+        self.ax_vol.set_ylabel("Volume", color=COLOR_TEXT)
+        for ax in (self.ax_main, self.ax_vol):
+            ax.yaxis.set_label_position("right")
+
+        self.wicks = LineCollection([], linewidths=1.0)
+        self.bodies = PolyCollection([], linewidths=0.5)
+        self.volumes = PolyCollection([], linewidths=0, alpha=0.8)
+        self.ax_main.add_collection(self.wicks)
+        self.ax_main.add_collection(self.bodies)
+        self.ax_vol.add_collection(self.volumes)
+        self.tr_lines = [
+            self.ax_main.axhline(0, color=COLOR_GOLD, linestyle='--', linewidth=1.5, alpha=0.6),
+            self.ax_main.axhline(0, color=COLOR_AZURE, linestyle='--', linewidth=1.5, alpha=0.6),
+        ]
+
+        self.dates = []
+        self.ax_vol.xaxis.set_major_locator(MaxNLocator(nbins=10, integer=True))
+        self.ax_vol.xaxis.set_major_formatter(FuncFormatter(self._format_date))
+        self.dynamic = []
+
+    def _format_date(self, x, pos=None):
+        i = int(round(x))
+        return self.dates[i].strftime('%b %d %H:%M') if 0 <= i < len(self.dates) else ""
+
+    def render(self, structure, base_name, output_file):
+        plot_df = structure["plot_df"]
+        o, h, l, c, v = (plot_df[col].to_numpy() for col in ("Open", "High", "Low", "Close", "Volume"))
+        n = len(plot_df)
+        x = np.arange(n)
+        up = c >= o
+        colors = np.where(up, COLOR_UP, COLOR_DOWN)
+        w = 0.3
+
+        body_lo, body_hi = np.minimum(o, c), np.maximum(o, c)
+        self.wicks.set_segments(np.stack([np.column_stack([x, l]), np.column_stack([x, h])], axis=1))
+        self.wicks.set_color(colors)
+        self.bodies.set_verts(np.stack([
+            np.column_stack([x - w, body_lo]), np.column_stack([x - w, body_hi]),
+            np.column_stack([x + w, body_hi]), np.column_stack([x + w, body_lo]),
+        ], axis=1))
+        self.bodies.set_facecolor(colors)
+        self.bodies.set_edgecolor(colors)
+        zeros = np.zeros(n)
+        self.volumes.set_verts(np.stack([
+            np.column_stack([x - w, zeros]), np.column_stack([x - w, v]),
+            np.column_stack([x + w, v]), np.column_stack([x + w, zeros]),
+        ], axis=1))
+        self.volumes.set_facecolor(colors)
+
+        self.tr_lines[0].set_ydata([structure["tr_top"]] * 2)
+        self.tr_lines[1].set_ydata([structure["tr_bottom"]] * 2)
+        pad = (h.max() - l.min()) * 0.05
+        self.ax_main.set_xlim(-1, n)
+        self.ax_main.set_ylim(l.min() - pad, h.max() + pad)
+        self.ax_vol.set_ylim(0, v.max() * 1.1 if n else 1)
+        self.dates = list(plot_df.index)
+        self.title.set_text(f"WYCKOFF MASTER ANALYSIS: {base_name.replace('_', ' ')}")
+
+        for artist in self.dynamic:
+            artist.remove()
+        self.dynamic = decorate(self.ax_main, structure, base_name)
+        self.fig.savefig(output_file, dpi=120, facecolor=COLOR_BG)
+        print(f"💾 图片已保存: {output_file}")
+
+_TEMPLATE = None
+
+def get_template():
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        configure_font()
+        _TEMPLATE = ChartTemplate()
+    return _TEMPLATE
+
+# 渲染逻辑改动时递增，使旧的哈希全部失效
+RENDER_VERSION = 2
+
+def render_hash(structure, base_name, fast):
+    """
+    图表输入的指纹: 窗口内 OHLCV + 事件 + 横盘箱体 + 渲染模式。与上次渲染相同即可跳过
+    """
+    h = hashlib.sha1(f"{RENDER_VERSION}|{base_name}|{'fast' if fast else 'mpf'}".encode("utf-8"))
+    plot_df = structure["plot_df"]
+    h.update(plot_df[["Open_time", "Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype="f8").tobytes())
+    h.update(np.asarray(structure["events"]).tobytes())
+    h.update(np.asarray(structure["ad_boxes"]).tobytes())
+    return h.hexdigest()
+
+def render(structure, base_name, output_file, fast=False, force=False):
+    """
+    绘制图表，输入未变化且图片已存在时跳过。返回是否实际渲染
+    """
+    digest = render_hash(structure, base_name, fast)
+    hash_file = output_file + ".sha1"
+    if not force and os.path.exists(output_file) and os.path.exists(hash_file):
+        with open(hash_file, "r", encoding="utf-8") as f:
+            if f.read().strip() == digest:
+                print(f"⏭️ 图表数据未变化，跳过渲染: {output_file}")
+                return False
+
+    if not _FONT_CONFIGURED:
+        # 首次绘图时才导入 matplotlib 并探测字体，单独计时
+        with pipeline_metrics.stage("font"):
+            configure_font()
+
+    t0 = time.perf_counter()
+    if fast:
+        get_template().render(structure, base_name, output_file)
+    else:
+        plot_chart(structure, base_name, output_file)
+    with open(hash_file, "w", encoding="utf-8") as f:
+        f.write(digest)
+    print(f"⏱️ 渲染耗时: {time.perf_counter() - t0:.3f} 秒")
+    return True
+
+# --- 7. 生成 Markdown 报告 ---
+def write_report(structure, base_name, output_file, md_output_file):
+    """
+    保存结构化分析结果并由 wyckoff_report 按模板渲染报告 (内容未变化时不写入)
+    """
+    plot_df = structure["plot_df"]
+    tr_top, tr_bottom = structure["tr_top"], structure["tr_bottom"]
+
+    # 打印数据供 AI 参考
+    print("\n=== AI 分析数据源 ===")
+    print(f"TR 上沿 (AR): {tr_top:.4f}")
+    print(f"TR 下沿 (SC): {tr_bottom:.4f}")
+    print(f"SC 日期: {structure['min_idx']}")
+    print(f"当前价格: {plot_df['Close'].iloc[-1]:.4f}")
+    print("=====================\n")
+
+    output_dir = os.path.dirname(os.path.abspath(md_output_file))
+    result = wyckoff_report.save_result(wyckoff_report.build_result(structure, base_name, output_file), output_dir)
+    path, written = wyckoff_report.render_pair(result, output_dir)
+    print(f"📝 报告已更新: {path}" if written else f"⏭️ 报告内容未变化: {path}")
+    return written
+
+def run(file_path, output_dir=".", fast=False, force=False):
+    """
+    对单个 CSV 执行 读取 -> 结构分析 -> 绘图 -> 报告，返回各阶段耗时 (秒)
+    fast: 使用复用画布的快速渲染; force: 即使数据未变化也重新绘图
+    """
+    timings = {}
+    base_name = os.path.splitext(os.path.basename(file_path))[0].replace("_Cleaned", "")
+
+    with pipeline_metrics.stage("load", pair=base_name) as st:
+        df = load_data(file_path, tail=WINDOW + AD_LOOKBACK)
+        pipeline_metrics.count("rows_loaded", len(df))
+    timings["load"] = st.wall
+
+    with pipeline_metrics.stage("analyze", pair=base_name) as st:
+        # 事件在完整存储上识别，图表窗口随新 K 线移动时已有事件保持不变
+        events, _ = wyckoff_events.detect_file(file_path)
+        structure = analyze_structure(df, events)
+        pipeline_metrics.count("events", len(structure["events"]))
+    timings["analyze"] = st.wall
+
+    output_file = os.path.join(output_dir, f"{base_name}_Wyckoff_Chart.png")
+    with pipeline_metrics.stage("plot", pair=base_name, fast=fast) as st:
+        timings["rendered"] = render(structure, base_name, output_file, fast=fast, force=force)
+        pipeline_metrics.count("charts_rendered", int(timings["rendered"]))
+    timings["plot"] = st.wall
+
+    md_output_file = os.path.join(output_dir, f"{base_name}_Wyckoff_Analysis.md")
+    with pipeline_metrics.stage("report", pair=base_name) as st:
+        pipeline_metrics.count("reports_written", int(write_report(structure, base_name, output_file, md_output_file)))
+    timings["report"] = st.wall
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description='绘制威科夫分析图 (Master Mode)')
+    parser.add_argument('input_csv', nargs='?', default="../ADAUSDC_4h_Cleaned.csv", help='输入的 CSV 文件路径')
+    parser.add_argument('--fast', action='store_true', help='使用复用画布的快速渲染 (不经过 mplfinance)')
+    parser.add_argument('--force', action='store_true', help='即使数据未变化也重新绘图')
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure_from_args("wyckoff_plot", args)
+
+    file_path = args.input_csv
+    if not os.path.exists(file_path):
+        print(f"❌ 错误: 找不到文件 {file_path}")
+        sys.exit(1)
+
+    run(file_path, fast=args.fast, force=args.force)
+    # 单独运行时顺便刷新汇总页 (批量流水线在全部交易对完成后统一刷新)
+    wyckoff_report.render_index(".")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import cProfile
+import tempfile
+import threading
+import contextlib
+import contextvars
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ================= 流水线阶段指标 =================
+# 为 binance_data_pro.py / wyckoff_plot.py / ai_analyze.py 等脚本提供统一的阶段计时与计数:
+#   with pipeline_metrics.stage("fetch", symbol=...) as st:   # 墙钟时间、CPU 时间、峰值内存
+#       ...
+#       pipeline_metrics.count("http_requests")                # 计数累加到所有进行中的阶段与整次运行
+# 每个阶段结束时输出一行 JSON (JSON Lines，多个进程可追加到同一文件)，
+# 进程退出时输出整次运行的汇总行，并可写出 Prometheus textfile (node_exporter textfile collector 格式)。
+# 可选用 cProfile (或已安装的 pyinstrument，输出 .html) 记录整次运行的性能剖析。
+#
+# 未启用时 stage() 只做两次计时，开销可以忽略。启用方式 (命令行参数优先于环境变量):
+#   --metrics PATH    / WYCKOFF_METRICS=PATH         JSON Lines 输出路径，"-" 表示标准错误
+#   --prom-file PATH  / WYCKOFF_METRICS_PROM=PATH    Prometheus textfile；PATH 为目录时写入 wyckoff_<脚本名>.prom
+#   --profile PATH    / WYCKOFF_PROFILE=PATH         .prof (cProfile) 或 .html (pyinstrument)
+# 环境变量会被子进程继承，run_wyckoff.sh 与 wyckoff_batch.py 的进程池中所有脚本都会写入同一个文件。
+#
+# 进行中的阶段保存在 contextvars 中: 并发线程各自的阶段互不干扰，asyncio 任务 / asyncio.to_thread 自动继承，
+# 线程池任务用 bind() 包装后继承提交时的阶段。
+
+ENV_METRICS = "WYCKOFF_METRICS"
+ENV_PROM = "WYCKOFF_METRICS_PROM"
+ENV_PROFILE = "WYCKOFF_PROFILE"
+
+PROM_PREFIX = "wyckoff"
+
+
+def peak_rss_bytes():
+    """
+    进程峰值常驻内存 (字节)，不支持的平台返回 None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Stage:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.counters = {}
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.status = "ok"
+
+    def add(self, key, value=1):
+        self.counters[key] = self.counters.get(key, 0) + value
+
+
+class _Recorder:
+    def __init__(self):
+        self.script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+        self.run_id = uuid.uuid4().hex[:12]
+        self.metrics_path = None
+        self.prom_path = None
+        self.profile_path = None
+        self.profiler = None
+        self.configured = False
+        self.pid = os.getpid()
+        self.totals = {}
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.wall0 = time.perf_counter()
+        self.cpu0 = time.process_time()
+
+    @property
+    def enabled(self):
+        return bool(self.metrics_path or self.prom_path)
+
+    def emit(self, record):
+        if not self.metrics_path:
+            return
+        record = dict(ts=round(time.time(), 3), run=self.run_id, script=self.script, pid=os.getpid(), **record)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        if self.metrics_path == "-":
+            sys.stderr.write(line)
+            return
+        try:
+            # 每条记录一次 write，O_APPEND 保证多个进程并发追加时行不会交错
+            with open(self.metrics_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"⚠️ 无法写入指标文件: {e}", file=sys.stderr)
+            self.metrics_path = None
+
+
+_recorder = _Recorder()
+# 当前上下文中进行中的阶段 (外层在前)
+_stack = contextvars.ContextVar("pipeline_metrics_stack", default=())
+
+
+def configure(script=None, metrics=None, prom=None, profile=None):
+    """
+    启用指标输出 (参数为 None 时读取环境变量)。可重复调用，只有第一次生效；
+    fork 出的子进程 (进程池) 再次调用时以新的脚本名重新开始记录，只输出 JSON Lines
+    """
+    r = _recorder
+    if r.configured and r.pid == os.getpid():
+        return r
+    if r.configured:
+        r.pid = os.getpid()
+        r.run_id = uuid.uuid4().hex[:12]
+        r.totals, r.stages = {}, {}
+        r.profiler = r.prom_path = None
+        r.script = script or r.script
+        return r
+    r.configured = True
+    if script:
+        r.script = script
+    r.metrics_path = metrics or os.environ.get(ENV_METRICS) or None
+    if r.metrics_path and r.metrics_path != "-":
+        # 子进程 (绘图进程池等) 通过环境变量继承，追加到同一个文件
+        r.metrics_path = os.path.abspath(r.metrics_path)
+        os.environ[ENV_METRICS] = r.metrics_path
+    r.prom_path = prom or os.environ.get(ENV_PROM) or None
+    r.profile_path = profile or os.environ.get(ENV_PROFILE) or None
+    if r.profile_path:
+        r.profiler = _start_profiler(r.profile_path)
+    if r.enabled or r.profiler:
+        atexit.register(finish)
+    return r
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group('性能指标')
+    group.add_argument('--metrics', default=None, help=f'各阶段指标 JSON Lines 输出路径，"-" 为标准错误 (或环境变量 {ENV_METRICS})')
+    group.add_argument('--prom-file', default=None, help=f'Prometheus textfile 输出路径或目录 (或环境变量 {ENV_PROM})')
+    group.add_argument('--profile', default=None, help=f'性能剖析输出: .prof 为 cProfile, .html 为 pyinstrument (或环境变量 {ENV_PROFILE})')
+    return group
+
+
+def configure_from_args(script, args):
+    return configure(script, getattr(args, "metrics", None), getattr(args, "prom_file", None), getattr(args, "profile", None))
+
+
+def enabled():
+    return _recorder.enabled
+
+
+def count(key, value=1):
+    """
+    计数累加到所有进行中的阶段以及整次运行的总计 (可在工作线程中调用)
+    """
+    r = _recorder
+    with r.lock:
+        r.totals[key] = r.totals.get(key, 0) + value
+        for st in _stack.get():
+            st.add(key, value)
+
+
+def bind(fn):
+    """
+    返回在当前上下文 (含进行中的阶段) 中执行 fn 的函数，提交到线程池时使用，每次提交调用一次
+    """
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+@contextlib.contextmanager
+def stage(name, **labels):
+    """
+    记录一个阶段的墙钟时间、CPU 时间、计数与峰值内存；阶段可以嵌套，内层计数同时计入外层
+    """
+    r = _recorder
+    st = Stage(name, labels)
+    token = _stack.set(_stack.get() + (st,))
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    try:
+        yield st
+    except BaseException:
+        st.status = "error"
+        raise
+    finally:
+        st.wall = time.perf_counter() - wall0
+        st.cpu = time.process_time() - cpu0
+        _stack.reset(token)
+        with r.lock:
+            agg = r.stages.setdefault(name, {"wall": 0.0, "cpu": 0.0, "runs": 0})
+            agg["wall"] += st.wall
+            agg["cpu"] += st.cpu
+            agg["runs"] += 1
+        if r.enabled:
+            rss = peak_rss_bytes()
+            r.emit({"type": "stage", "stage": name, "labels": labels, "status": st.status,
+                    "wall_s": round(st.wall, 6), "cpu_s": round(st.cpu, 6),
+                    "peak_rss_mb": round(rss / 2 ** 20, 1) if rss else None, "counters": st.counters})
+
+
+# ----------------- 性能剖析 -----------------
+def _start_profiler(path):
+    if path.endswith(".html"):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️ 未安装 pyinstrument，改用 cProfile 输出", file=sys.stderr)
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, path):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        if path.endswith(".html"):
+            path = os.path.splitext(path)[0] + ".prof"
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    return path
+
+
+# ----------------- Prometheus textfile -----------------
+def _prom_escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def prometheus_text(r, wall, cpu, rss):
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {PROM_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROM_PREFIX}_{name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_prom_escape(v)}"' for k, v in [("script", r.script)] + labels)
+            lines.append(f"{PROM_PREFIX}_{name}{{{label_text}}} {value}")
+
+    metric("stage_wall_seconds", "gauge", "Wall-clock seconds spent in each stage during the last run",
+           [([("stage", n)], round(a["wall"], 6)) for n, a in sorted(r.stages.items())])
+    metric("stage_cpu_seconds", "gauge", "CPU seconds spent in each stage during the last run",
+           [([("stage", n)], round(a["cpu"], 6)) for n, a in sorted(r.stages.items())])
+    metric("stage_runs", "gauge", "Number of times each stage ran during the last run",
+           [([("stage", n)], a["runs"]) for n, a in sorted(r.stages.items())])
+    metric("counter", "gauge", "Pipeline counters (requests, bytes, rows, retries, backoff seconds) for the last run",
+           [([("name", k)], v) for k, v in sorted(r.totals.items())])
+    metric("run_wall_seconds", "gauge", "Total wall-clock seconds of the last run", [([], round(wall, 6))])
+    metric("run_cpu_seconds", "gauge", "Total CPU seconds of the last run", [([], round(cpu, 6))])
+    if rss:
+        metric("peak_rss_bytes", "gauge", "Peak resident set size of the last run", [([], rss)])
+    metric("last_run_timestamp_seconds", "gauge", "Unix time when the last run finished", [([], round(time.time(), 3))])
+    return "\n".join(lines) + "\n"
+
+
+def _write_prom(r, text):
+    path = r.prom_path
+    if os.path.isdir(path):
+        path = os.path.join(path, f"{PROM_PREFIX}_{r.script}.prom")
+    # 原子替换，textfile collector 不会读到写了一半的文件
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".prom_", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return path
+
+
+def finish():
+    """
+    输出整次运行的汇总 (进程退出时自动调用)
+    """
+    r = _recorder
+    wall = time.perf_counter() - r.wall0
+    cpu = time.process_time() - r.cpu0
+    rss = peak_rss_bytes()
+    if r.profiler is not None:
+        path = _stop_profiler(r.profiler, r.profile_path)
+        r.profiler = None
+        print(f"🔬 性能剖析已写入: {path}", file=sys.stderr)
+    r.emit({"type": "run", "status": "done", "wall_s": round(wall, 6), "cpu_s": round(cpu, 6),
+            "peak_rss_mb": round(rss / 2 ** 20, 1) if rss else None, "counters": dict(r.totals),
+            "stages": {n: {k: round(v, 6) for k, v in a.items()} for n, a in r.stages.items()}})
+    if r.prom_path:
+        try:
+            _write_prom(r, prometheus_text(r, wall, cpu, rss))
+        except OSError as e:
+            print(f"⚠️ 无法写入 Prometheus 文件: {e}", file=sys.stderr)
+    # 只汇总一次
+    r.metrics_path = r.prom_path = None
@@ -0,0 +1,166 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+import wyckoff_events
+from kline_bars import price_decimals
+
+# ================= AI 提示词数据载荷 =================
+# 原先直接提交 df.to_csv() 的全部 13 列 (Human_Time / Close_time / Ignore / 全精度成交额...)，
+# 一半以上的 token 对分析没有帮助。这里按编码方式生成更紧凑的数据片段:
+#   csv     - 原始 13 列 (兼容旧行为)
+#   minimal - 只保留 时间 + OHLCV，价格按实际精度、成交量按量级取整
+#   delta   - 价格以首根收盘价为基准、按最小变动单位表示为整数偏移，时间用序号表示
+# 可选将较早的 K 线按 N 根合并 (近期保持原始粒度)，并附上 wyckoff_events 预先识别的区间与事件摘要，
+# 在相同的 token 预算内提交更长的有效历史。
+
+ENCODINGS = ("csv", "minimal", "delta")
+DEFAULT_ENCODING = "minimal"
+# 降采样时保持原始粒度的最近 K 线根数
+DEFAULT_RECENT = 100
+# 摘要中列出的最近事件数
+SUMMARY_EVENTS = 15
+# 事件识别的滚动窗口需要的额外预热 K 线
+EVENT_LOOKBACK = 200
+
+_CJK = re.compile(r"[⺀-鿿＀-￯]")
+
+
+def estimate_tokens(text):
+    """
+    粗略估算 token 数: ASCII 约 4 字符 1 token，中日韩字符约 1 字 1 token
+    """
+    cjk = len(_CJK.findall(text))
+    return int((len(text) - cjk) / 4 + cjk)
+
+
+def downsample(df, factor, recent=DEFAULT_RECENT):
+    """
+    最近 recent 根保持原样，更早的 K 线每 factor 根合并为一根 (开/高/低/收/量)
+    """
+    if factor <= 1 or len(df) <= recent:
+        return df
+    old, new = df.iloc[:len(df) - recent], df.iloc[len(df) - recent:]
+    # 分组从最老的一端对齐，保证最后一组紧挨着近期数据且是完整的
+    first = len(old) % factor
+    old = old.iloc[first:] if len(old) - first >= factor else old
+    starts = np.arange(0, len(old), factor)
+    agg = pd.DataFrame({
+        "Human_Time": old["Human_Time"].to_numpy()[starts],
+        "Open_time": old["Open_time"].to_numpy()[starts],
+        "Open": old["Open"].to_numpy()[starts],
+        "High": np.maximum.reduceat(old["High"].to_numpy(), starts),
+        "Low": np.minimum.reduceat(old["Low"].to_numpy(), starts),
+        "Close": old["Close"].to_numpy()[np.minimum(starts + factor, len(old)) - 1],
+        "Volume": np.add.reduceat(old["Volume"].to_numpy(), starts),
+    })
+    return pd.concat([agg, new[list(agg.columns)]], ignore_index=True)
+
+
+def _time_format(df):
+    t = pd.to_datetime(df["Human_Time"])
+    daily = len(t) > 0 and (t.dt.hour == 0).all() and (t.dt.minute == 0).all()
+    return "%Y-%m-%d" if daily else "%Y-%m-%d %H:%M"
+
+
+def encode_minimal(df):
+    d = price_decimals(df[["Open", "High", "Low", "Close"]].to_numpy().ravel())
+    vol_d = 0 if df["Volume"].median() >= 100 else 2
+    price = f"{{:.{d}f}}".format
+    out = pd.DataFrame({
+        "t": pd.to_datetime(df["Human_Time"]).dt.strftime(_time_format(df)),
+        "o": df["Open"].map(price), "h": df["High"].map(price),
+        "l": df["Low"].map(price), "c": df["Close"].map(price),
+        "v": df["Volume"].map(f"{{:.{vol_d}f}}".format),
+    })
+    header = "格式: t=时间(UTC+8), o/h/l/c=开高低收, v=成交量\n"
+    return header + out.to_csv(index=False)
+
+
+def encode_delta(df):
+    d = price_decimals(df[["Open", "High", "Low", "Close"]].to_numpy().ravel())
+    tick = 10.0 ** -d
+    base = float(df["Close"].iloc[0])
+    ticks = {col: np.round((df[col].to_numpy() - base) / tick).astype(np.int64) for col in ("Open", "High", "Low", "Close")}
+    vol_d = 0 if df["Volume"].median() >= 100 else 2
+    times = pd.to_datetime(df["Human_Time"])
+    fmt = _time_format(df)
+
+    lines = [
+        f"格式: 价格 = {base:.{d}f} + 值 × {tick:.{d}f}; i=K线序号, 首根时间 {times.iloc[0].strftime(fmt)} (UTC+8)",
+        "i,o,h,l,c,v",
+    ]
+    vols = df["Volume"].round(vol_d).to_numpy()
+    open_time = df["Open_time"].to_numpy()
+    # 降采样后各行跨度不同，序号用首根 K 线周期折算，保持时间上的比例
+    step = np.diff(open_time).min() if len(open_time) > 1 else 1
+    idx = ((open_time - open_time[0]) // max(step, 1)).astype(np.int64)
+    for j in range(len(df)):
+        v = f"{vols[j]:.{vol_d}f}"
+        lines.append(f"{idx[j]},{ticks['Open'][j]},{ticks['High'][j]},{ticks['Low'][j]},{ticks['Close'][j]},{v}")
+    return "\n".join(lines) + "\n"
+
+
+def summarize_structure(df, window_start, max_events=SUMMARY_EVENTS):
+    """
+    用 wyckoff_events 在 (窗口 + 预热) 数据上识别区间与事件，返回 Markdown 摘要
+    window_start: 提交给 AI 的窗口在 df 中的起始行
+    """
+    events, ranges = wyckoff_events.detect_from_frame(df)
+    times = pd.to_datetime(df["Human_Time"])
+    fmt = _time_format(df)
+    d = price_decimals(df[["Open", "High", "Low", "Close"]].to_numpy().ravel())
+
+    lines = ["### 预识别结构 (算法识别，供参考)"]
+    ranges = ranges[ranges["end"] >= window_start] if len(ranges) else ranges
+    for r in ranges:
+        state = "进行中" if r["active"] else f"结束于 {times.iloc[int(r['end'])].strftime(fmt)}"
+        lines.append(f"- 区间#{r['range_id']} {'吸筹' if r['kind'] == 'accumulation' else '派发'}: "
+                     f"{times.iloc[int(r['start'])].strftime(fmt)} 起, 上沿 {r['top']:.{d}f}, 下沿 {r['bottom']:.{d}f}, {state}")
+    if not len(ranges):
+        lines.append("- 窗口内未识别到交易区间")
+
+    events = events[events["bar"] >= window_start] if len(events) else events
+    if len(events):
+        lines.append("")
+        lines.append("时间,事件,价格,置信度")
+        for ev in events[-max_events:]:
+            lines.append(f"{times.iloc[int(ev['bar'])].strftime(fmt)},{ev['event']},{ev['price']:.{d}f},{ev['confidence']:.2f}")
+
+    last = df.iloc[-1]
+    hi, lo = df["High"].iloc[window_start:].max(), df["Low"].iloc[window_start:].min()
+    pos = (last["Close"] - lo) / (hi - lo) if hi > lo else 0.5
+    lines.append("")
+    lines.append(f"窗口最高 {hi:.{d}f} / 最低 {lo:.{d}f}, 最新收盘 {last['Close']:.{d}f} 位于窗口 {pos:.0%} 位置")
+    return "\n".join(lines) + "\n"
+
+
+def build_payload(df, history, encoding=DEFAULT_ENCODING, factor=1, recent=DEFAULT_RECENT, events=True):
+    """
+    生成提交给 AI 的数据片段，返回 (文本, 统计信息)
+    df: 至少包含最近 history 根 K 线 (更早的行作为事件识别的预热)
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"未知编码: {encoding} (可选 {', '.join(ENCODINGS)})")
+    window_start = max(len(df) - history, 0)
+    window = df.iloc[window_start:]
+
+    if encoding == "csv":
+        data = window.to_csv(index=False)
+    else:
+        window = downsample(window, factor, recent)
+        data = encode_minimal(window) if encoding == "minimal" else encode_delta(window)
+
+    text = data
+    if events:
+        text = summarize_structure(df, window_start) + "\n### K 线数据\n" + data
+
+    stats = {
+        "encoding": encoding,
+        "bars": len(df) - window_start,
+        "rows": len(window),
+        "bytes": len(text.encode("utf-8")),
+        "tokens": estimate_tokens(text),
+    }
+    return text, stats
@@ -0,0 +1,63 @@
+import threading
+import time
+
+# ================= 令牌桶限速器 =================
+# 按请求权重 (而不是固定 sleep) 控制请求速率:
+# 桶容量 = 每分钟权重上限，令牌按 容量/60 每秒匀速补充，每次请求消耗其权重对应的令牌。
+# 桶满时可以瞬间发出一批并发请求，耗尽后自动按限额节流。
+
+
+class TokenBucket:
+    def __init__(self, capacity, per_seconds=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / per_seconds
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def acquire(self, weight=1):
+        """
+        阻塞直到取得 weight 个令牌，返回本次等待的秒数
+        """
+        weight = min(float(weight), self.capacity)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                elif self.tokens >= weight:
+                    self.tokens -= weight
+                    return waited
+                else:
+                    delay = (weight - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """
+        服务端要求退避 (429 / 418 Retry-After) 时暂停所有请求，并清空令牌
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0.0
+            self.updated = self.paused_until
+
+    def sync_used(self, used, limit=None):
+        """
+        根据服务端返回的已用权重 (如 X-MBX-USED-WEIGHT-1M) 校正本地余量
+        """
+        limit = float(limit) if limit else self.capacity
+        with self.lock:
+            self._refill(time.monotonic())
+            remaining = max(0.0, limit - float(used)) * self.capacity / limit
+            self.tokens = min(self.tokens, remaining)
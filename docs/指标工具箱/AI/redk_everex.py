@@ -0,0 +1,532 @@
+import os
+import sys
+import math
+import time
+import argparse
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import kline_bars
+
+# ================= RedK EVEREX (投入与产出) 指标引擎 =================
+# 对应 ../RedK_EVEREX/RedK_EVEREX_v2_Modified.pine，提供两种计算方式，结果一致:
+#   批量   compute(...)           整段历史向量化 (WMA / SMA 用 np.convolve，EMA / RMA 用 pandas ewm 递推)
+#   增量   EverexEngine.update()  每根收盘 K 线 O(1) 更新 (实时模式 / 逐根回放)
+# 两者共用相同的均线定义 (MA_TYPES，与 Pine 的 GetAverage 对应):
+#   SMA / WMA   最近 n 个值的简单 / 线性加权平均
+#   EMA / RMA   alpha = 2 / (n + 1) / 1 / n，以前 n 个值的 SMA 作为种子
+#   HMA         WMA(2 * WMA(x, n / 2) - WMA(x, n), floor(sqrt(n)))
+# 与 TradingView 内置函数一致，输入中的 na 被忽略 (按最近 n 个非 na 值计算，na 所在的 K 线沿用上一个值)；
+# Pine 中除以 0 得到 na，这里同样记为 NaN (例如最高价 = 最低价的 K 线没有收盘位置)。
+#
+# 输出: vol_n (相对成交量)、price_n (六项价格强度均值)、bar_flow、bulls_avg / bears_avg、
+#       rrof / rrof_s (平滑后)、signal (信号线)、bias (长周期情绪)、ev_ratio 与 EoM / Compression 标记，
+#       以及 alert_up / alert_dn / alert_swing (rrof_s 上穿 / 下穿 / 穿越 0 轴)。
+
+MA_TYPES = ("WMA", "EMA", "SMA", "HMA", "RMA")
+
+DEFAULT_PARAMS = {
+    "length": 10,               # Rate of Flow 均线长度
+    "ma_type": "WMA",
+    "smooth": 3,                # RROF 平滑 (固定为 WMA)
+    "sig_length": 5,            # 信号线
+    "sig_type": "WMA",
+    "lookback": 20,             # 成交量 / 价差 / 位移的平均基准
+    "lookback_calc": "Simple",  # Simple = SMA，Same as RRoF = 与 ma_type 相同
+    "bias_length": 30,          # 长周期情绪
+    "bias_type": "WMA",
+    "eom_ratio": 150,           # 价格强度 / 成交量强度 >= 该比例标记为轻松移动 (EoM)
+    "compression_ratio": 30,    # <= 该比例标记为压缩 (Compression)
+}
+
+# 增量均线的滑动和每累计 RESYNC 次更新从窗口重新求和一次，避免长时间运行的浮点误差累积
+RESYNC = 10_000
+
+# 增量 / 批量结果对比的容差
+CHECK_TOL = 1e-6
+DEFAULT_CHECK_BARS = 20_000
+
+OUTPUTS = ("vol_n", "price_n", "bar_flow", "bulls_avg", "bears_avg", "rrof", "rrof_s", "signal", "bias",
+           "n_price", "n_vol", "ev_ratio")
+FLAGS = ("eom", "compression", "positive", "alert_up", "alert_dn", "alert_swing")
+
+
+def _lookback_type(p):
+    return "SMA" if p["lookback_calc"] == "Simple" else p["ma_type"]
+
+
+def _hma_lengths(n):
+    # Pine 中 length / 2 传给 wma 时取整
+    return max(n // 2, 1), max(int(math.sqrt(n)), 1)
+
+
+def warmup_bars(params=None):
+    """
+    只计算最近一段时需要额外读取的历史根数 (EMA / RMA 的种子影响衰减到可忽略，窗口类均线完全填满)
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    longest = max(p["length"], p["lookback"], p["bias_length"])
+    return 10 * longest + p["smooth"] + p["sig_length"]
+
+
+# ----------------- 批量均线 (向量化) -----------------
+def _sma(x, n):
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        out[n - 1:] = np.convolve(x, np.ones(n), "valid") / n
+    return out
+
+
+def _wma(x, n):
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        # convolve 会翻转权重: 最新的值权重 n，最早的值权重 1
+        out[n - 1:] = np.convolve(x, np.arange(n, 0, -1, dtype=float), "valid") / (n * (n + 1) / 2)
+    return out
+
+
+def _ewm(x, n, alpha):
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        seeded = np.concatenate([[x[:n].mean()], x[n:]])
+        out[n - 1:] = pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return out
+
+
+def _hma(x, n):
+    # x 不含 NaN，内层 WMA 只有开头的 NaN
+    half, root = _hma_lengths(n)
+    return _skip_na(_wma, 2 * _wma(x, half) - _wma(x, n), root)
+
+
+def _skip_na(fn, x, n):
+    """
+    去掉 NaN 后计算，再放回原位置；NaN 所在位置沿用上一个结果
+    """
+    x = np.asarray(x, dtype=float)
+    valid = ~np.isnan(x)
+    if valid.all():
+        return fn(x, n)
+    out = np.full(len(x), np.nan)
+    pos = np.flatnonzero(valid)
+    out[pos] = fn(x[pos], n)
+    last = np.maximum.accumulate(np.where(valid, np.arange(len(x)), -1))
+    known = last >= 0
+    out[known] = out[last[known]]
+    return out
+
+
+def moving_average(x, n, ma_type):
+    """
+    Pine GetAverage 的批量版本 (忽略 NaN 输入)
+    """
+    if ma_type == "SMA":
+        return _skip_na(_sma, x, n)
+    if ma_type == "EMA":
+        return _skip_na(lambda v, k: _ewm(v, k, 2.0 / (k + 1)), x, n)
+    if ma_type == "RMA":
+        return _skip_na(lambda v, k: _ewm(v, k, 1.0 / k), x, n)
+    if ma_type == "HMA":
+        # 整个 HMA 一起跳过 NaN 输入 (与增量版本一致)，而不是让内层 WMA 各自沿用上一个值
+        return _skip_na(_hma, x, n)
+    return _skip_na(_wma, x, n)
+
+
+# ----------------- 增量均线 (每次 O(1)) -----------------
+class _WindowMA:
+    """
+    SMA / WMA: 维护窗口内的和与加权和。新值权重 n，移出窗口的值权重已降为 1:
+    加权和' = 加权和 - 和 + n * 新值 (窗口未满时不减去移出值)。
+    窗口内全为 0 时两个和直接归零，避免相减的残差 (如 -1e-12) 让本应除以 0 的 RROF 变成有限值
+    """
+
+    def __init__(self, n, weighted):
+        self.n, self.weighted = n, weighted
+        self.window = deque(maxlen=n)
+        self.total = self.wsum = 0.0
+        self.nonzero = 0
+        self.updates = 0
+        self.value = np.nan
+
+    def update(self, x):
+        if x != x:
+            return self.value
+        full = len(self.window) == self.n
+        if full:
+            old = self.window[0]
+            self.wsum += self.n * x - self.total
+            self.total += x - old
+            self.nonzero -= old != 0
+        else:
+            self.wsum += (len(self.window) + 1) * x
+            self.total += x
+        self.window.append(x)
+        self.nonzero += x != 0
+        self.updates += 1
+        if not self.nonzero:
+            self.total = self.wsum = 0.0
+        elif self.updates % RESYNC == 0:
+            self.total = math.fsum(self.window)
+            self.wsum = math.fsum((i + 1) * v for i, v in enumerate(self.window))
+        if len(self.window) == self.n:
+            self.value = self.wsum / (self.n * (self.n + 1) / 2) if self.weighted else self.total / self.n
+        return self.value
+
+
+class _EwmMA:
+    """
+    EMA / RMA: 前 n 个值取 SMA 作为种子，之后 y = alpha * x + (1 - alpha) * y
+    """
+
+    def __init__(self, n, alpha):
+        self.n, self.alpha = n, alpha
+        self.seed = []
+        self.value = np.nan
+
+    def update(self, x):
+        if x != x:
+            return self.value
+        if self.seed is not None:
+            self.seed.append(x)
+            if len(self.seed) == self.n:
+                self.value = sum(self.seed) / self.n
+                self.seed = None
+            return self.value
+        self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class _HullMA:
+    def __init__(self, n):
+        half, root = _hma_lengths(n)
+        self.half, self.full, self.outer = _WindowMA(half, True), _WindowMA(n, True), _WindowMA(root, True)
+
+    @property
+    def value(self):
+        return self.outer.value
+
+    def update(self, x):
+        if x != x:
+            return self.outer.value
+        return self.outer.update(2 * self.half.update(x) - self.full.update(x))
+
+
+def make_ma(n, ma_type):
+    """
+    Pine GetAverage 的增量版本: 返回带 update(x) 方法的对象
+    """
+    if ma_type == "SMA":
+        return _WindowMA(n, False)
+    if ma_type == "EMA":
+        return _EwmMA(n, 2.0 / (n + 1))
+    if ma_type == "RMA":
+        return _EwmMA(n, 1.0 / n)
+    if ma_type == "HMA":
+        return _HullMA(n)
+    return _WindowMA(n, True)
+
+
+# ----------------- 公共计算 -----------------
+# Pine Normalize 的分档: 比值大于门槛时取对应档位，都不满足 (含 na) 时为 0.1
+NORMALIZE_BANDS = ((1.5, 1.0), (1.2, 0.9), (1.0, 0.8), (0.8, 0.7), (0.6, 0.6), (0.4, 0.5), (0.2, 0.25))
+NORMALIZE_FLOOR = 0.1
+# 比值恰好落在分档边界 (如 1.2) 时，不同求和顺序的末位误差会改变分档，先舍入到 10 位小数
+ROUND_SCALE = 1e10
+
+
+def normalize(value, avg):
+    """
+    Pine Normalize: 按 value / avg 分档 (avg 为 na 或 0 时比值为 na，落入最低档)
+    """
+    x = np.rint(_div(value, avg) * ROUND_SCALE) / ROUND_SCALE
+    with np.errstate(invalid="ignore"):
+        return np.select([x > t for t, _ in NORMALIZE_BANDS], [b for _, b in NORMALIZE_BANDS], NORMALIZE_FLOOR)
+
+
+def _div(a, b):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.asarray(a, dtype=float) / np.asarray(b, dtype=float)
+    return np.where(np.isfinite(out), out, np.nan)
+
+
+def _rrof(bulls_avg, bears_avg):
+    return 2 * (100 - 100 / (1 + _div(bulls_avg, bears_avg))) - 100
+
+
+# 增量计算每根 K 线只处理标量，用纯 Python 版本避免 NumPy 标量运算的开销
+def _div1(a, b):
+    if b == 0 or a != a or b != b:
+        return np.nan
+    out = a / b
+    return out if math.isfinite(out) else np.nan
+
+
+def _normalize1(value, avg):
+    x = _div1(value, avg)
+    if x != x:
+        return NORMALIZE_FLOOR
+    x = round(x * ROUND_SCALE) / ROUND_SCALE
+    for threshold, band in NORMALIZE_BANDS:
+        if x > threshold:
+            return band
+    return NORMALIZE_FLOOR
+
+
+def _sign1(x):
+    return np.nan if x != x else float((x > 0) - (x < 0))
+
+
+def _rrof1(bulls_avg, bears_avg):
+    return 2 * (100 - 100 / (1 + _div1(bulls_avg, bears_avg))) - 100
+
+
+def _markers(price_n, vol_n, p):
+    n_price = np.clip(price_n, -100, 100)
+    n_vol = np.clip(vol_n, -100, 100)
+    ev_ratio = _div(100 * np.abs(n_price), n_vol)
+    with np.errstate(invalid="ignore"):
+        return n_price, n_vol, ev_ratio, ev_ratio >= p["eom_ratio"], ev_ratio <= p["compression_ratio"], n_price > 0
+
+
+# ----------------- 批量计算 -----------------
+def compute(open_, high, low, close, volume, params=None):
+    """
+    整段历史一次性计算，返回 {输出名: 数组} (OUTPUTS 为 float64，FLAGS 为 bool)
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    o, h, l, c = (np.asarray(a, dtype=float) for a in (open_, high, low, close))
+    v = np.asarray(volume, dtype=float)
+    no_vol = np.isnan(v)
+    v = np.where(no_vol, 1.0, v)
+    lk_type = _lookback_type(p)
+    lookback = p["lookback"]
+
+    def prev(x):
+        return np.concatenate([[np.nan], x[:-1]])
+
+    vol_n = np.where(no_vol, 100.0, normalize(v, moving_average(v, lookback, lk_type)) * 100)
+
+    spread = c - o
+    bar_range = h - l
+    low2 = np.fmin(l, prev(l))
+    low2[0] = np.nan
+    r2 = np.fmax(h, prev(h)) - low2
+    shift = c - prev(c)
+
+    barclosing = _div(2 * (c - l), bar_range) * 100 - 100
+    s2r = _div(spread, bar_range) * 100
+    spread_abs = np.abs(spread)
+    spread_n = normalize(spread_abs, moving_average(spread_abs, lookback, lk_type)) * 100 * np.sign(spread)
+    barclosing_2 = _div(2 * (c - low2), r2) * 100 - 100
+    shift_to_r2 = _div(shift, r2) * 100
+    shift_abs = np.abs(shift)
+    shift_n = normalize(shift_abs, moving_average(shift_abs, lookback, lk_type)) * 100 * np.sign(shift)
+
+    price_n = (barclosing + s2r + spread_n + barclosing_2 + shift_to_r2 + shift_n) / 6
+    bar_flow = price_n * vol_n / 100
+    bulls = np.maximum(bar_flow, 0)
+    bears = -np.minimum(bar_flow, 0)
+
+    bulls_avg = moving_average(bulls, p["length"], p["ma_type"])
+    bears_avg = moving_average(bears, p["length"], p["ma_type"])
+    rrof = _rrof(bulls_avg, bears_avg)
+    rrof_s = moving_average(rrof, p["smooth"], "WMA")
+    signal = moving_average(rrof_s, p["sig_length"], p["sig_type"])
+    bias_raw = _rrof(moving_average(bulls, p["bias_length"], p["bias_type"]),
+                     moving_average(bears, p["bias_length"], p["bias_type"]))
+    bias = moving_average(bias_raw, p["smooth"], "WMA")
+
+    n_price, n_vol, ev_ratio, eom, compression, positive = _markers(price_n, vol_n, p)
+    prev_s = prev(rrof_s)
+    with np.errstate(invalid="ignore"):
+        alert_up = (rrof_s > 0) & (prev_s <= 0)
+        alert_dn = (rrof_s < 0) & (prev_s >= 0)
+
+    return {
+        "vol_n": vol_n, "price_n": price_n, "bar_flow": bar_flow, "bulls_avg": bulls_avg, "bears_avg": bears_avg,
+        "rrof": rrof, "rrof_s": rrof_s, "signal": signal, "bias": bias,
+        "n_price": n_price, "n_vol": n_vol, "ev_ratio": ev_ratio,
+        "eom": eom, "compression": compression, "positive": positive,
+        "alert_up": alert_up, "alert_dn": alert_dn, "alert_swing": alert_up | alert_dn,
+    }
+
+
+def compute_from_frame(df, params=None):
+    """
+    直接接受 *_Cleaned 格式的 DataFrame
+    """
+    return compute(*(df[col].to_numpy() for col in ("Open", "High", "Low", "Close", "Volume")), params=params)
+
+
+def compute_file(csv_path, params=None, tail=None):
+    """
+    读取单个存储并计算，tail 时额外读取 warmup_bars 根预热。返回 (Bars, 输出 dict)，两者都只保留最后 tail 根
+    """
+    warmup = warmup_bars(params) if tail else 0
+    bars = kline_bars.load_bars(csv_path, tail=tail, lookback=warmup)
+    result = compute(*(bars.values(col) for col in ("Open", "High", "Low", "Close", "Volume")), params=params)
+    if tail and len(bars) > tail:
+        cut = len(bars) - tail
+        bars = bars[cut:]
+        result = {k: v[cut:] for k, v in result.items()}
+    return bars, result
+
+
+# ----------------- 增量计算 -----------------
+class EverexEngine:
+    """
+    单个交易对的增量计算器。update() 每次接收一根已收盘 K 线，返回该根的 {输出名: 标量}，
+    与 compute() 在同一段数据上的结果一致
+    """
+
+    def __init__(self, params=None):
+        self.p = p = dict(DEFAULT_PARAMS, **(params or {}))
+        lk_type = _lookback_type(p)
+        self.vol_avg = make_ma(p["lookback"], lk_type)
+        self.spread_avg = make_ma(p["lookback"], lk_type)
+        self.shift_avg = make_ma(p["lookback"], lk_type)
+        self.bulls_ma = make_ma(p["length"], p["ma_type"])
+        self.bears_ma = make_ma(p["length"], p["ma_type"])
+        self.rrof_ma = make_ma(p["smooth"], "WMA")
+        self.signal_ma = make_ma(p["sig_length"], p["sig_type"])
+        self.bias_bulls = make_ma(p["bias_length"], p["bias_type"])
+        self.bias_bears = make_ma(p["bias_length"], p["bias_type"])
+        self.bias_ma = make_ma(p["smooth"], "WMA")
+        self.prev_high = self.prev_low = self.prev_close = np.nan
+        self.prev_rrof_s = np.nan
+        self.count = 0
+
+    def update(self, open_, high, low, close, volume):
+        p = self.p
+        no_vol = volume != volume
+        v = 1.0 if no_vol else float(volume)
+        vol_avg = self.vol_avg.update(v)
+        vol_n = 100.0 if no_vol else _normalize1(v, vol_avg) * 100
+
+        spread = close - open_
+        bar_range = high - low
+        low2 = min(low, self.prev_low) if self.count else np.nan
+        r2 = max(high, self.prev_high) - low2
+        shift = close - self.prev_close
+
+        barclosing = _div1(2 * (close - low), bar_range) * 100 - 100
+        s2r = _div1(spread, bar_range) * 100
+        spread_n = _normalize1(abs(spread), self.spread_avg.update(abs(spread))) * 100 * _sign1(spread)
+        barclosing_2 = _div1(2 * (close - low2), r2) * 100 - 100
+        shift_to_r2 = _div1(shift, r2) * 100
+        shift_n = _normalize1(abs(shift), self.shift_avg.update(abs(shift))) * 100 * _sign1(shift)
+
+        price_n = (barclosing + s2r + spread_n + barclosing_2 + shift_to_r2 + shift_n) / 6
+        bar_flow = price_n * vol_n / 100
+        bulls = max(bar_flow, 0.0) if bar_flow == bar_flow else np.nan
+        bears = -min(bar_flow, 0.0) if bar_flow == bar_flow else np.nan
+
+        bulls_avg = self.bulls_ma.update(bulls)
+        bears_avg = self.bears_ma.update(bears)
+        rrof = _rrof1(bulls_avg, bears_avg)
+        rrof_s = self.rrof_ma.update(rrof)
+        signal = self.signal_ma.update(rrof_s)
+        bias = self.bias_ma.update(_rrof1(self.bias_bulls.update(bulls), self.bias_bears.update(bears)))
+
+        # Pine 的 math.max / math.min 遇到 na 返回 na
+        n_price = max(min(price_n, 100.0), -100.0) if price_n == price_n else np.nan
+        n_vol = max(min(vol_n, 100.0), -100.0)
+        ev_ratio = _div1(100 * abs(n_price), n_vol)
+        prev_s = self.prev_rrof_s
+        alert_up = bool(rrof_s > 0 and prev_s <= 0)
+        alert_dn = bool(rrof_s < 0 and prev_s >= 0)
+
+        self.prev_high, self.prev_low, self.prev_close = high, low, close
+        self.prev_rrof_s = rrof_s
+        self.count += 1
+        return {
+            "vol_n": vol_n, "price_n": price_n, "bar_flow": bar_flow, "bulls_avg": bulls_avg, "bears_avg": bears_avg,
+            "rrof": rrof, "rrof_s": rrof_s, "signal": signal, "bias": bias,
+            "n_price": n_price, "n_vol": n_vol, "ev_ratio": ev_ratio,
+            "eom": ev_ratio >= p["eom_ratio"], "compression": ev_ratio <= p["compression_ratio"], "positive": n_price > 0,
+            "alert_up": alert_up, "alert_dn": alert_dn, "alert_swing": alert_up or alert_dn,
+        }
+
+
+def replay(open_, high, low, close, volume, params=None):
+    """
+    逐根输入增量引擎，返回与 compute 相同结构的数组 (用于校验)
+    """
+    engine = EverexEngine(params)
+    columns = (np.asarray(x, dtype=float).tolist() for x in (open_, high, low, close, volume))
+    rows = [engine.update(*bar) for bar in zip(*columns)]
+    return {k: np.array([r[k] for r in rows], dtype=bool if k in FLAGS else float) for k in OUTPUTS + FLAGS}
+
+
+def check(open_, high, low, close, volume, params=None, tol=CHECK_TOL):
+    """
+    对比批量与增量结果，返回不一致项列表 (空列表表示一致)
+    """
+    batch = compute(open_, high, low, close, volume, params)
+    inc = replay(open_, high, low, close, volume, params)
+    problems = []
+    for key in OUTPUTS:
+        a, b = batch[key], inc[key]
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            problems.append(f"{key}: NaN 位置不一致")
+        elif not np.allclose(a, b, rtol=tol, atol=tol, equal_nan=True):
+            problems.append(f"{key}: 最大误差 {np.nanmax(np.abs(a - b)):.3g}")
+    for key in FLAGS:
+        diff = np.flatnonzero(batch[key] != inc[key])
+        if len(diff):
+            problems.append(f"{key}: {len(diff)} 根不一致 (首个 bar {diff[0]})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RedK EVEREX 投入与产出指标 (RROF / 信号线 / 情绪 / 0 轴穿越提醒)')
+    parser.add_argument('csv_paths', nargs='+', help='*_Cleaned.csv 路径 (可多个)')
+    parser.add_argument('--length', type=int, default=DEFAULT_PARAMS["length"], help=f'RoF 长度 (默认 {DEFAULT_PARAMS["length"]})')
+    parser.add_argument('--ma-type', choices=MA_TYPES, default=DEFAULT_PARAMS["ma_type"], help='RoF 均线类型')
+    parser.add_argument('--smooth', type=int, default=DEFAULT_PARAMS["smooth"], help=f'RROF 平滑 (默认 {DEFAULT_PARAMS["smooth"]})')
+    parser.add_argument('--sig-length', type=int, default=DEFAULT_PARAMS["sig_length"], help=f'信号线长度 (默认 {DEFAULT_PARAMS["sig_length"]})')
+    parser.add_argument('--sig-type', choices=MA_TYPES, default=DEFAULT_PARAMS["sig_type"], help='信号线均线类型')
+    parser.add_argument('--lookback', type=int, default=DEFAULT_PARAMS["lookback"], help=f'平均基准长度 (默认 {DEFAULT_PARAMS["lookback"]})')
+    parser.add_argument('--lookback-calc', choices=("Simple", "Same as RRoF"), default=DEFAULT_PARAMS["lookback_calc"], help='平均基准的均线')
+    parser.add_argument('--bias-length', type=int, default=DEFAULT_PARAMS["bias_length"], help=f'情绪长度 (默认 {DEFAULT_PARAMS["bias_length"]})')
+    parser.add_argument('--bias-type', choices=MA_TYPES, default=DEFAULT_PARAMS["bias_type"], help='情绪均线类型')
+    parser.add_argument('--tail', type=int, default=None, help='只计算最后 N 根 K 线 (自动加上预热)')
+    parser.add_argument('--show', type=int, default=5, help='列出最近 N 次 0 轴穿越 (默认 5)')
+    parser.add_argument('--check', type=int, nargs='?', const=DEFAULT_CHECK_BARS, default=None,
+                        help=f'在最后 N 根 K 线上校验增量与批量结果一致 (默认 {DEFAULT_CHECK_BARS})')
+    args = parser.parse_args()
+    params = {k: getattr(args, k) for k in DEFAULT_PARAMS if hasattr(args, k)}
+
+    failed = False
+    for path in args.csv_paths:
+        if not os.path.exists(path):
+            print(f"❌ 错误: 找不到文件 {path}")
+            sys.exit(1)
+        t0 = time.perf_counter()
+        bars, result = compute_file(path, params, tail=args.tail)
+        elapsed = time.perf_counter() - t0
+        print(f"📊 {os.path.basename(path)}: {len(bars)} 根, 计算 {elapsed:.3f} 秒, "
+              f"上穿 {int(result['alert_up'].sum())} 次 / 下穿 {int(result['alert_dn'].sum())} 次")
+        if len(bars):
+            print(f"   RROF {result['rrof_s'][-1]:.1f}  信号线 {result['signal'][-1]:.1f}  情绪 {result['bias'][-1]:.1f}  "
+                  f"量 {result['n_vol'][-1]:.0f} / 价 {result['n_price'][-1]:.0f}")
+        open_time = bars.open_time()
+        swings = np.flatnonzero(result["alert_swing"])
+        for i in swings[-args.show:] if args.show > 0 else []:
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.gmtime(open_time[i] / 1000))
+            print(f"   {stamp} UTC  {'⬆️ 上穿 0 轴' if result['alert_up'][i] else '⬇️ 下穿 0 轴'}  RROF {result['rrof_s'][i]:.1f}")
+
+        if args.check:
+            sub = bars.tail(args.check)
+            t0 = time.perf_counter()
+            problems = check(*(sub.values(col) for col in ("Open", "High", "Low", "Close", "Volume")), params=params)
+            status = "✅ 增量与批量结果一致" if not problems else "❌ 增量与批量结果不一致: " + "; ".join(problems)
+            print(f"   {status} (最后 {len(sub)} 根, {time.perf_counter() - t0:.2f} 秒)")
+            failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
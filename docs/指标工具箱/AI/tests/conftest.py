@@ -0,0 +1,56 @@
+import os
+import sys
+import functools
+
+import pandas as pd
+import pytest
+
+# ================= 测试公共配置 =================
+# 测试直接导入 AI 目录下的脚本模块和 bench/ 中的合成数据工具；
+# 样本数据为仓库内的 ADAUSDC_*_Cleaned.csv (从 Binance 下载)，合成数据由 synth_klines 按固定 seed 生成。
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+AI_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, os.path.join(AI_DIR, "bench"))
+sys.path.insert(0, AI_DIR)
+
+SAMPLE_SYMBOL = "ADAUSDC"
+SAMPLE_INTERVALS = ("1m", "15m", "4h", "1d")
+# 固定时间轴终点，合成数据与运行时刻无关 (2026-01-01 00:00 UTC)
+SYNTH_END_MS = 1_767_225_600_000
+SYNTH_BARS = 20_000
+# 1 / 5 / 7 覆盖了高潮排队、补扫 ST 与 LPS 窗口边界等增量模式的边角情况
+SYNTH_SEEDS = (1, 5, 7)
+
+
+def sample_path(interval):
+    return os.path.join(AI_DIR, f"{SAMPLE_SYMBOL}_{interval}_Cleaned.csv")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_sample(interval):
+    # 直接解析 CSV，不在样本旁边生成二进制缓存
+    return pd.read_csv(sample_path(interval))
+
+
+@functools.lru_cache(maxsize=None)
+def _generate(seed, bars, interval):
+    import synth_klines
+    records, _ = synth_klines.generate(bars, interval, seed, end_ms=SYNTH_END_MS)
+    return records
+
+
+@pytest.fixture(scope="session")
+def sample():
+    """
+    按周期读取样本 CSV: sample("4h") -> DataFrame (*_Cleaned 列结构)
+    """
+    return lambda interval: _load_sample(interval).copy()
+
+
+@pytest.fixture(scope="session")
+def synth():
+    """
+    生成合成 K 线: synth(seed, bars=SYNTH_BARS, interval="1m") -> kline_cache.RECORD_DTYPE 记录
+    """
+    return lambda seed, bars=SYNTH_BARS, interval="1m": _generate(seed, bars, interval).copy()
@@ -0,0 +1,62 @@
+import os
+import time
+
+import ai_cache
+
+
+def _touch(cache_dir, key, used):
+    """
+    把条目的最近使用时间改到 used 秒前
+    """
+    path = os.path.join(cache_dir, f"{key}.json")
+    os.utime(path, (time.time() - used, os.stat(path).st_mtime))
+
+
+def test_key_changes_with_every_input():
+    base = ai_cache.cache_key("m", "prompt", "data", {"t": 1})
+    assert base == ai_cache.cache_key("m", "prompt", "data", {"t": 1})
+    assert len({base, ai_cache.cache_key("m2", "prompt", "data", {"t": 1}), ai_cache.cache_key("m", "p", "data", {"t": 1}),
+                ai_cache.cache_key("m", "prompt", "d", {"t": 1}), ai_cache.cache_key("m", "prompt", "data", {"t": 2})}) == 5
+
+
+def test_get_expires_by_creation_time(tmp_path):
+    d = str(tmp_path)
+    ai_cache.put("k", "text", cache_dir=d)
+    assert ai_cache.get("k", cache_dir=d) == "text"
+    # 命中会刷新最近使用时间，但不会延长 TTL
+    assert ai_cache.get("k", ttl=0.5, cache_dir=d) == "text"
+    time.sleep(0.6)
+    assert ai_cache.get("k", ttl=60, cache_dir=d) == "text"
+    assert ai_cache.get("k", ttl=0.5, cache_dir=d) is None
+    assert not os.listdir(d)
+
+
+def test_evict_removes_expired_entries(tmp_path):
+    d = str(tmp_path)
+    ai_cache.put("old", "x", cache_dir=d)
+    time.sleep(0.6)
+    ai_cache.put("new", "x", cache_dir=d)
+    # 最近被使用过的条目同样按写入时间过期
+    ai_cache.get("old", cache_dir=d)
+    assert ai_cache.evict(cache_dir=d, ttl=0.5) == 1
+    assert sorted(os.listdir(d)) == ["new.json"]
+
+
+def test_evict_by_size_keeps_recently_used(tmp_path):
+    d = str(tmp_path)
+    for i, key in enumerate(("a", "b", "c", "d")):
+        ai_cache.put(key, "x" * 1000, cache_dir=d)
+        _touch(d, key, 100 - i)
+    ai_cache.get("a", cache_dir=d)
+    # 每个条目约 1 KB，上限只容得下两个
+    assert ai_cache.evict(cache_dir=d, max_bytes=2500) == 2
+    assert sorted(os.listdir(d)) == ["a.json", "d.json"]
+
+
+def test_put_evicts_over_limit(tmp_path):
+    d = str(tmp_path)
+    for i in range(5):
+        ai_cache.put(f"k{i}", "x" * 1000, cache_dir=d, max_bytes=2500)
+        _touch(d, f"k{i}", 100 - i)
+    assert ai_cache.stats(d)["entries"] == 2
+    assert ai_cache.get("k4", cache_dir=d) == "x" * 1000
@@ -0,0 +1,56 @@
+import time
+import asyncio
+import threading
+
+import ai_analyze
+import ai_queue
+
+RETRY_AFTER = 0.3
+
+
+def _jobs(names):
+    return [{"name": name, "data": f"data {name}", "stats": {"tokens": 100}} for name in names]
+
+
+def _run(jobs, tmp_path, **kwargs):
+    return asyncio.run(ai_queue.run_jobs(jobs, "http://mock", system_prompt="prompt", output_dir=str(tmp_path),
+                                         use_cache=False, rpm=600, **kwargs))
+
+
+def test_retry_after_pauses_whole_queue(tmp_path, monkeypatch):
+    lock = threading.Lock()
+    calls, limited = [], []
+
+    def post_once(payload, api_url):
+        with lock:
+            calls.append(time.monotonic())
+            first = len(calls) == 1
+        if first:
+            limited.append(time.monotonic())
+            return "retry", RETRY_AFTER
+        time.sleep(0.05)
+        return "ok", "analysis"
+
+    saved = []
+    monkeypatch.setattr(ai_analyze, "post_once", post_once)
+    monkeypatch.setattr(ai_analyze, "save_report", lambda name, text, output_dir=None: saved.append(name))
+    results = _run(_jobs("ABCDE"), tmp_path, concurrency=2)
+
+    assert sorted(saved) == list("ABCDE")
+    assert all(m["status"] == "ok" for m in results)
+    assert sum(m["attempts"] for m in results) == 6
+    # 429 之后整个队列都等待 Retry-After (已经发出的请求除外)，而不是只有触发限流的任务。
+    # 不暂停时第三个请求会在 0.05 秒后发出
+    assert not [t for t in calls if limited[0] + 0.01 < t < limited[0] + RETRY_AFTER - 0.01]
+
+
+def test_write_error_fails_only_its_job(tmp_path, monkeypatch):
+    def save_report(name, text, output_dir=None):
+        if name == "B":
+            raise OSError("disk full")
+
+    monkeypatch.setattr(ai_analyze, "post_once", lambda payload, api_url: ("ok", "analysis"))
+    monkeypatch.setattr(ai_analyze, "save_report", save_report)
+    results = _run(_jobs(["A", "B", "C"]), tmp_path)
+    status = {m["name"]: m["status"] for m in results}
+    assert status == {"A": "ok", "B": "error", "C": "ok"}
@@ -0,0 +1,61 @@
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import binance_archive
+import binance_data_pro
+import kline_cache
+import kline_store
+
+SYMBOL = "ADAUSDC"
+INTERVAL = "1m"
+DAY_MS = 86_400_000
+
+
+def _write_archive(archive_dir, df, day, microseconds=False, header=False):
+    """
+    按 data.binance.vision 的格式写入某一天的归档 (12 列 API 顺序)
+    """
+    start = int(pd.Timestamp(day, tz="UTC").timestamp() * 1000)
+    rows = df[(df["Open_time"] >= start) & (df["Open_time"] < start + DAY_MS)][binance_data_pro.COLUMNS].copy()
+    if microseconds:
+        rows["Open_time"] *= 1000
+        rows["Close_time"] = rows["Close_time"] * 1000 + 999
+    path = os.path.join(archive_dir, binance_archive.archive_name(SYMBOL, INTERVAL, day))
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(os.path.basename(path)[:-4] + ".csv", rows.to_csv(index=False, header=header))
+    return path
+
+
+def test_archive_period():
+    start, end = binance_archive.archive_period("ADAUSDC-1m-2024-02.zip")
+    assert end - start == 29 * DAY_MS
+    start, end = binance_archive.archive_period("ADAUSDC-1m-2024-02-28.zip")
+    assert end - start == DAY_MS
+
+
+def test_ingest_fills_gaps_and_extends_store(tmp_path, sample):
+    data_dir = str(tmp_path)
+    df = sample(INTERVAL)
+    day2 = int(pd.Timestamp("2026-01-02", tz="UTC").timestamp() * 1000)
+    # 本地存储: 到 2026-01-01 12:00 为止，中间缺 20 根
+    store = df[df["Open_time"] < day2 - 12 * 3_600_000]
+    kline_store.write_klines(data_dir, SYMBOL, INTERVAL, store.drop(store.index[1000:1020]))
+    archives = [_write_archive(data_dir, df, "2026-01-01", microseconds=True),
+                _write_archive(data_dir, df, "2026-01-02", header=True)]
+
+    stats = binance_archive.ingest_archives(archives, data_dir, SYMBOL, INTERVAL)
+    expected = df[df["Open_time"] < day2 + DAY_MS]
+    assert stats["filled"] == 20
+    assert stats["appended"] == len(expected) - len(store)
+    stored = kline_cache.load_klines(kline_store.csv_path(data_dir, SYMBOL, INTERVAL))
+    np.testing.assert_array_equal(stored["Open_time"], expected["Open_time"])
+    np.testing.assert_array_equal(stored["Close_time"], expected["Close_time"])
+    np.testing.assert_allclose(stored["Close"], expected["Close"])
+    # 状态文件跟随新的最后一根，下次增量拉取从其收盘之后开始
+    assert kline_store.get_resume_ts(data_dir, SYMBOL, INTERVAL) == int(expected["Close_time"].iloc[-1]) + 1
+
+    stats = binance_archive.ingest_archives(archives, data_dir, SYMBOL, INTERVAL)
+    assert stats["archives_skipped"] == 2 and stats["rows_read"] == 0
@@ -0,0 +1,26 @@
+import requests
+
+import binance_data_pro
+
+
+class _Response:
+    status_code = 429
+    headers = {"Retry-After": "0"}
+    content = b""
+    text = ""
+
+    def json(self):
+        return []
+
+
+def test_persistent_rate_limit_stops_after_max_retries(monkeypatch):
+    calls = []
+
+    def get(*args, **kwargs):
+        calls.append(kwargs.get("params"))
+        return _Response()
+
+    monkeypatch.setattr(requests, "get", get)
+    # 一直返回 429 时不会无限重试
+    assert len(binance_data_pro.fetch_all_data("ADAUSDC", "1m", 0)) == 0
+    assert len(calls) == binance_data_pro.MAX_RETRIES + 1
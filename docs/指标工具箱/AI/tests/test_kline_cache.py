@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import kline_cache
+from conftest import sample_path
+
+
+def _copy_sample(tmp_path, interval="1m"):
+    path = os.path.join(tmp_path, os.path.basename(sample_path(interval)))
+    shutil.copyfile(sample_path(interval), path)
+    return path
+
+
+def _assert_same_klines(a, b):
+    for name in kline_cache.RECORD_DTYPE.names:
+        np.testing.assert_array_equal(a[name].to_numpy(dtype=float), b[name].to_numpy(dtype=float), err_msg=name)
+
+
+def test_cache_matches_csv(tmp_path):
+    path = _copy_sample(tmp_path)
+    expected = pd.read_csv(path)
+    first = kline_cache.load_klines(path)
+    # 第一次读取解析 CSV 并写入缓存，之后直接读取缓存
+    assert kline_cache.is_fresh(path)
+    cached = kline_cache.load_klines(path)
+    _assert_same_klines(first, expected)
+    _assert_same_klines(cached, expected)
+    assert (cached["Human_Time"] == pd.to_datetime(expected["Human_Time"])).all()
+
+
+def test_cache_goes_stale_when_csv_changes(tmp_path):
+    path = _copy_sample(tmp_path)
+    kline_cache.load_klines(path)
+    df = pd.read_csv(path).iloc[:-10]
+    df.to_csv(path, index=False)
+    assert not kline_cache.is_fresh(path)
+    assert len(kline_cache.load_klines(path)) == len(df)
+    assert kline_cache.is_fresh(path)
+
+
+def test_unparseable_rows_are_dropped(tmp_path):
+    path = _copy_sample(tmp_path)
+    rows = len(pd.read_csv(path))
+    # 写入中断留下的半行
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("2026-01-01 08:00:00,17672\n")
+    df = kline_cache.load_klines(path)
+    assert len(df) == rows
+    assert len(kline_cache.open_cache(path)) == rows
+
+
+def test_tail_matches_full_load(tmp_path):
+    path = _copy_sample(tmp_path)
+    full = pd.read_csv(path)
+    # 缓存不存在时从文件末尾按块读取，不写缓存
+    tail = kline_cache.load_klines(path, tail=100, lookback=20)
+    assert not kline_cache.is_fresh(path)
+    _assert_same_klines(tail, full.iloc[-120:].reset_index(drop=True))
+    kline_cache.load_klines(path)
+    tail = kline_cache.load_klines(path, tail=100, lookback=20)
+    _assert_same_klines(tail, full.iloc[-120:].reset_index(drop=True))
+    assert [line for _, line in kline_cache.tail_lines(path, 2)] == open(path, encoding="utf-8").read().splitlines()[-2:]
@@ -0,0 +1,60 @@
+import numpy as np
+
+import binance_data_pro
+import kline_quality
+import kline_store
+
+SYMBOL = "ADAUSDC"
+INTERVAL = "1m"
+STEP = 60_000
+
+
+def test_scan_counts_gaps_duplicates_and_order():
+    t = np.array([0, 1, 2, 2, 6, 5, 9], dtype=np.int64) * STEP
+    report = kline_quality.scan(t, STEP)
+    assert report["duplicates"] == 1 and report["out_of_order"] == 1
+    assert report["expected"] == 10 and report["missing_bars"] == 4
+    assert report["gaps"] == [{"start": 3 * STEP, "end": 4 * STEP, "bars": 2},
+                              {"start": 7 * STEP, "end": 8 * STEP, "bars": 2}]
+
+
+def test_scan_clamps_short_misaligned_gap():
+    # 间隔 1.5 个周期: 缺 1 根，终点不早于起点
+    report = kline_quality.scan(np.array([0, 90_000, 150_000]), STEP)
+    assert report["misaligned"] == 2
+    assert report["gaps"] == [{"start": STEP, "end": STEP, "bars": 1}]
+
+
+def test_verify_store_refetches_only_gaps(tmp_path, sample, monkeypatch):
+    df = sample(INTERVAL).iloc[:600]
+    missing = df.iloc[200:230]
+    kline_store.write_klines(str(tmp_path), SYMBOL, INTERVAL, df.drop(missing.index))
+    calls = []
+
+    def refetch(symbol, interval, gaps, max_retries=None):
+        calls.append(gaps)
+        return missing[binance_data_pro.COLUMNS].values.tolist(), gaps, []
+
+    monkeypatch.setattr(kline_quality, "refetch_gaps", refetch)
+    report = kline_quality.verify_store(str(tmp_path), SYMBOL, INTERVAL)
+    assert len(calls) == 1 and calls[0][0]["bars"] == 30
+    assert calls[0][0]["start"] == int(missing["Open_time"].iloc[0])
+    assert report["gaps"] == [] and report["rows"] == 600 and report["refetched_bars"] == 30
+
+
+def test_verify_store_confirms_empty_gaps(tmp_path, sample, monkeypatch):
+    df = sample(INTERVAL).iloc[:600]
+    kline_store.write_klines(str(tmp_path), SYMBOL, INTERVAL, df.drop(df.index[100:110]))
+    calls = []
+
+    def refetch(symbol, interval, gaps, max_retries=None):
+        # 交易所在该时段没有数据: 请求成功但返回为空
+        calls.append(gaps)
+        return [], gaps, []
+
+    monkeypatch.setattr(kline_quality, "refetch_gaps", refetch)
+    report = kline_quality.verify_store(str(tmp_path), SYMBOL, INTERVAL)
+    assert len(report["confirmed_gaps"]) == 1
+    # 已确认的缺口下次不再请求
+    report = kline_quality.verify_store(str(tmp_path), SYMBOL, INTERVAL)
+    assert len(calls) == 1 and len(report["confirmed_gaps"]) == 1
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import kline_cache
+import kline_resample
+import kline_store
+
+# ADAUSDC 最小价格变动单位。Binance 的 1m 与 15m 数据偶尔在开盘价/最低价上差一个最小单位
+PRICE_TICK = 1e-4
+PRICE_FIELDS = ("Open", "High", "Low", "Close")
+
+
+def _records(df):
+    return kline_cache.frame_to_records(df)
+
+
+@pytest.mark.parametrize("interval", ["15m", "4h", "1d"])
+def test_resampled_matches_binance_samples(sample, interval):
+    base = _records(sample("1m"))
+    native = _records(sample(interval))[:-1]  # 最后一根下载时可能尚未收盘
+    derived = kline_resample.resample_records(base, interval)
+    derived = derived[derived["Close_time"] <= base["Close_time"][-1]]
+
+    _, i, j = np.intersect1d(derived["Open_time"], native["Open_time"], return_indices=True)
+    assert len(i) > 0
+    a, b = derived[i], native[j]
+    np.testing.assert_array_equal(a["Close_time"], b["Close_time"])
+    np.testing.assert_array_equal(a["Number_of_trades"], b["Number_of_trades"])
+    for name in PRICE_FIELDS:
+        np.testing.assert_allclose(a[name], b[name], rtol=0, atol=PRICE_TICK * 1.01)
+    for name in kline_resample.SUM_FIELDS:
+        np.testing.assert_allclose(a[name], b[name], rtol=1e-9, atol=1e-6)
+
+
+def test_incremental_update_matches_full_resample(tmp_path, synth):
+    records = synth(1)
+    targets = ["5m", "1h", "4h", "1d", "1w"]
+    # 在 1h/4h/1d 桶中间切开，第二次更新要覆盖上次写入的未收盘 K 线
+    split = len(records) * 3 // 5 + 17
+    symbol = "SYNTHUSDT"
+    kline_store.write_klines(tmp_path, symbol, "1m", kline_cache.records_to_frame(records[:split]))
+    kline_resample.update_all(tmp_path, symbol, targets)
+    kline_store.append_klines(tmp_path, symbol, "1m", kline_cache.records_to_frame(records[split:]))
+    kline_resample.update_all(tmp_path, symbol, targets)
+
+    for interval in targets:
+        stored = _records(kline_cache.load_klines(kline_store.csv_path(tmp_path, symbol, interval)))
+        expected = kline_resample.resample_records(records, interval)
+        assert len(stored) == len(expected), interval
+        for name in kline_cache.RECORD_DTYPE.names:
+            np.testing.assert_allclose(stored[name], expected[name], rtol=0, atol=1e-8, err_msg=f"{interval} {name}")
+
+
+def test_weekly_buckets_start_on_monday(synth):
+    weeks = kline_resample.resample_records(synth(2, bars=30_000, interval="15m"), "1w")
+    assert len(weeks) > 10
+    opens = pd.to_datetime(weeks["Open_time"], unit="ms")
+    assert (opens.dayofweek == 0).all()
+    assert (opens.hour == 0).all() and (opens.minute == 0).all()
+    np.testing.assert_array_equal(weeks["Close_time"] - weeks["Open_time"], 7 * 86_400_000 - 1)
@@ -0,0 +1,64 @@
+import os
+import stat
+
+import pandas as pd
+
+import kline_store
+
+SYMBOL = "ADAUSDC"
+INTERVAL = "1m"
+
+
+def _read(data_dir):
+    return pd.read_csv(kline_store.csv_path(data_dir, SYMBOL, INTERVAL))
+
+
+def test_append_replaces_overlapping_tail(tmp_path, sample):
+    df = sample(INTERVAL)
+    kline_store.write_klines(str(tmp_path), SYMBOL, INTERVAL, df.iloc[:1000])
+    # 新数据从已存储的最后一根 (写入时未收盘) 开始，该行被覆盖而不是重复
+    new = df.iloc[999:1500].copy()
+    new.loc[new.index[0], "Close"] = 9.9999
+    result = kline_store.append_klines(str(tmp_path), SYMBOL, INTERVAL, new)
+
+    assert result["appended"] == 500 and result["replaced"] == 1
+    stored = _read(str(tmp_path))
+    assert len(stored) == 1500
+    assert stored["Open_time"].is_monotonic_increasing and stored["Open_time"].is_unique
+    assert stored["Close"].iloc[999] == 9.9999
+    pd.testing.assert_frame_equal(stored.iloc[1000:].reset_index(drop=True), df.iloc[1000:1500].reset_index(drop=True))
+
+
+def test_resume_from_last_bar(tmp_path, sample):
+    df = sample(INTERVAL).iloc[:100]
+    last_open, last_close = int(df["Open_time"].iloc[-1]), int(df["Close_time"].iloc[-1])
+
+    # 最后一根写入时尚未收盘 -> 从它的 Open_time 重新拉取
+    kline_store.write_klines(str(tmp_path), SYMBOL, INTERVAL, df, fetched_at=last_close - 1)
+    assert kline_store.get_resume_ts(str(tmp_path), SYMBOL, INTERVAL) == last_open
+    # 已收盘 -> 从 Close_time + 1 开始
+    kline_store.write_klines(str(tmp_path), SYMBOL, INTERVAL, df, fetched_at=last_close + 1)
+    assert kline_store.get_resume_ts(str(tmp_path), SYMBOL, INTERVAL) == last_close + 1
+    assert kline_store.last_bar(str(tmp_path), SYMBOL, INTERVAL) == (last_open, last_close)
+    assert kline_store.get_resume_ts(str(tmp_path), "NONE", INTERVAL) is None
+
+
+def test_append_inside_history_merges(tmp_path, sample):
+    df = sample(INTERVAL).iloc[:2000]
+    kline_store.write_klines(str(tmp_path), SYMBOL, INTERVAL, df.drop(df.index[500:600]))
+    # 补回中间缺失的 100 根: 超出尾部扫描范围，走完整合并
+    result = kline_store.append_klines(str(tmp_path), SYMBOL, INTERVAL, df.iloc[480:620])
+
+    assert result["appended"] == 100 and result["replaced"] == 40
+    stored = _read(str(tmp_path))
+    assert stored["Open_time"].tolist() == df["Open_time"].tolist()
+
+
+def test_atomic_writes_leave_readable_files(tmp_path, sample):
+    df = sample(INTERVAL)
+    kline_store.write_klines(str(tmp_path), SYMBOL, INTERVAL, df.iloc[:10])
+    kline_store.append_klines(str(tmp_path), SYMBOL, INTERVAL, df.iloc[10:20])
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    # 临时文件 (mkstemp 为 0600) 替换后不应只有当前用户可读
+    for name in (os.path.basename(kline_store.csv_path(str(tmp_path), SYMBOL, INTERVAL)), kline_store.STATE_FILE):
+        assert stat.S_IMODE(os.stat(os.path.join(tmp_path, name)).st_mode) == 0o644
@@ -0,0 +1,18 @@
+import pytest
+
+import redk_everex
+from conftest import SAMPLE_INTERVALS, SYNTH_SEEDS
+
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+
+@pytest.mark.parametrize("interval", SAMPLE_INTERVALS)
+def test_incremental_matches_batch_on_samples(sample, interval):
+    df = sample(interval)
+    assert redk_everex.check(*(df[name].to_numpy(dtype=float) for name in FIELDS)) == []
+
+
+@pytest.mark.parametrize("seed", SYNTH_SEEDS)
+def test_incremental_matches_batch_on_synth(synth, seed):
+    r = synth(seed)
+    assert redk_everex.check(*(r[name] for name in FIELDS)) == []
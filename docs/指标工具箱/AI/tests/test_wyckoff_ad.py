@@ -0,0 +1,16 @@
+import pytest
+
+import wyckoff_ad
+from conftest import SAMPLE_INTERVALS, SYNTH_SEEDS
+
+
+@pytest.mark.parametrize("interval", SAMPLE_INTERVALS)
+def test_vectorized_matches_reference_on_samples(sample, interval):
+    df = sample(interval)
+    assert wyckoff_ad.verify(*(df[name].to_numpy(dtype=float) for name in ("High", "Low", "Close"))) == []
+
+
+@pytest.mark.parametrize("seed", SYNTH_SEEDS)
+def test_vectorized_matches_reference_on_synth(synth, seed):
+    r = synth(seed, bars=wyckoff_ad.DEFAULT_VERIFY_BARS)
+    assert wyckoff_ad.verify(r["High"], r["Low"], r["Close"]) == []
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import wyckoff_events
+from conftest import SAMPLE_INTERVALS, SYNTH_SEEDS
+
+
+def _columns(df):
+    return tuple(df[name].to_numpy(dtype=float) for name in ("High", "Low", "Close", "Volume")) + (df["Open_time"].to_numpy(),)
+
+
+def _assert_same_events(high, low, close, volume, open_time, params=None):
+    """
+    逐根输入 IncrementalDetector 的事件与 detect_events 一次性识别的结果一致 (置信度允许浮点误差)
+    """
+    events, _ = wyckoff_events.detect_events(high, low, close, volume, open_time, params=params)
+    det = wyckoff_events.IncrementalDetector(params, buffer_size=len(close))
+    live = [m for bar in zip(open_time.tolist(), high.tolist(), low.tolist(), close.tolist(), volume.tolist())
+            for m in det.update(*bar) if m["type"] == "event"]
+
+    batch = sorted((int(e["bar"]), str(e["event"]), int(e["confirm"]), float(e["price"]), int(e["range_id"]),
+                    float(e["confidence"])) for e in events)
+    inc = sorted((m["bar"], m["event"], m["confirm"], m["price"], m["range_id"], m["confidence"]) for m in live)
+    assert [b[:5] for b in batch] == [m[:5] for m in inc]
+    np.testing.assert_allclose([b[5] for b in batch], [m[5] for m in inc], atol=1e-3)
+    return len(batch)
+
+
+@pytest.mark.parametrize("interval", SAMPLE_INTERVALS)
+def test_incremental_matches_batch_on_samples(sample, interval):
+    assert _assert_same_events(*_columns(sample(interval))) > 0
+
+
+@pytest.mark.parametrize("seed", SYNTH_SEEDS)
+def test_incremental_matches_batch_on_synth(synth, seed):
+    r = synth(seed)
+    assert _assert_same_events(r["High"], r["Low"], r["Close"], r["Volume"], r["Open_time"]) > 0
+
+
+def test_incremental_matches_batch_with_params(synth):
+    r = synth(SYNTH_SEEDS[0], bars=10_000)
+    params = {"pivot": 3, "ar_max": 20, "lps_max": 10}
+    _assert_same_events(r["High"], r["Low"], r["Close"], r["Volume"], r["Open_time"], params)
+
+
+def test_ring_buffer_window_starts_at_bar_zero():
+    buf = wyckoff_events.RingBuffer(5)
+    for v in (1.0, 2.0, 3.0):
+        buf.push(high=v)
+    np.testing.assert_array_equal(buf.window("high", -2, 3), [1.0, 2.0, 3.0])
+    for v in (4.0, 5.0, 6.0, 7.0):
+        buf.push(high=v)
+    # 已移出缓冲区的 K 线不会被读到
+    np.testing.assert_array_equal(buf.window("high", 0, 7), [3.0, 4.0, 5.0, 6.0, 7.0])
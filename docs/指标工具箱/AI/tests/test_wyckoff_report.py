@@ -0,0 +1,51 @@
+import os
+
+import wyckoff_report
+
+PAIR = "ADAUSDC_4h"
+
+
+def _result(close=0.35, generated="2026-01-01"):
+    return {
+        "version": wyckoff_report.RESULT_VERSION, "pair": PAIR, "generated": generated,
+        "chart": wyckoff_report.chart_name(PAIR), "start": "2025-10-01 08:00", "end": "2026-01-01 08:00",
+        "tr_top": 0.42, "tr_bottom": 0.31, "sc_time": "2025-10-11 04:00", "has_sc": True, "close": close,
+        "events": [{"time": "2025-10-11 04:00", "event": "SC", "price": 0.31, "confidence": 0.8}],
+    }
+
+
+def _mtimes(output_dir):
+    return {name: os.stat(os.path.join(output_dir, name)).st_mtime_ns for name in os.listdir(output_dir)}
+
+
+def test_unchanged_results_are_not_rewritten(tmp_path):
+    d = str(tmp_path)
+    wyckoff_report.save_result(_result(), d)
+    summary = wyckoff_report.render_all(d)
+    assert len(summary["written"]) == 1 and summary["index"]
+    before = _mtimes(d)
+
+    # 同样的行情结构在另一天重新生成: 保留原来的生成日期，任何文件都不重写
+    saved = wyckoff_report.save_result(_result(generated="2026-01-02"), d)
+    summary = wyckoff_report.render_all(d)
+    assert saved["generated"] == "2026-01-01"
+    assert summary["written"] == [] and summary["unchanged"] == 1 and not summary["index"]
+    assert _mtimes(d) == before
+
+
+def test_structure_change_drops_stale_ai_text(tmp_path):
+    d = str(tmp_path)
+    wyckoff_report.save_result(_result(), d)
+    report = wyckoff_report.attach_ai(PAIR, "AI 分析", d)
+    with open(report, encoding="utf-8") as f:
+        text = f.read()
+    assert "AI 分析" in text and wyckoff_report.chart_name(PAIR) in text
+
+    # 结构未变化时 AI 文本保留
+    assert wyckoff_report.save_result(_result(), d)["ai"]["text"] == "AI 分析"
+    # 价格变化后旧的 AI 文本过期，报告回到模板版本
+    assert "ai" not in wyckoff_report.save_result(_result(close=0.45), d)
+    wyckoff_report.render_all(d)
+    with open(report, encoding="utf-8") as f:
+        text = f.read()
+    assert "AI 分析" not in text and "寻求趋势突破" in text
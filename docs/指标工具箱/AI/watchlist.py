@@ -0,0 +1,32 @@
+import os
+
+# ================= watchlist 解析 =================
+# 只依赖标准库: 回测 / 参数扫描 / 筛选器 / 报告按 watchlist 选择交易对时，不必导入 wyckoff_batch
+# (它会连带加载 AI 队列、拉取与绘图相关的模块)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WATCHLIST = os.path.join(HERE, "watchlist.txt")
+
+
+def parse_watchlist(path=None, pairs=None):
+    """
+    解析 watchlist，返回 [(symbol, interval), ...]
+    文件格式: 每行 `SYMBOL 周期1 周期2 ...` 或 `SYMBOL:周期`，# 开头为注释
+    """
+    lines = list(pairs or [])
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            lines.extend(f.read().splitlines())
+
+    result = []
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        parts = line.replace(":", " ").replace(",", " ").split()
+        symbol = parts[0].upper()
+        for interval in parts[1:] or ["4h"]:
+            pair = (symbol, interval.lower())
+            if pair not in result:
+                result.append(pair)
+    return result
@@ -0,0 +1,342 @@
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import kline_bars
+
+# ================= Wyckoff_AD (RSI 横盘箱体) 向量化移植 =================
+# 对应 ../Wyckoff_Accumulation_Distribution/Wyckoff_AD.pine。TradingView 版本受 calc_bars_count = 1000 限制，
+# 且 myhigh / mylow 每根 K 线重建数组 (O(n·len))；这里在完整历史上整体计算，全部为 O(n):
+#   RSI        Wilder RMA (前 len 个涨跌幅的 SMA 作为种子)，递推交给 pandas ewm(adjust=False)
+#   UTAD       RSI 自上向下穿越 50 + sens      Spring  RSI 自下向上穿越 50 - sens
+#   side       本根或上一根 RSI 位于 (50 - sens, 50 + sens) 之间
+#   bull/bear  连续两根 RSI 高于 50 + sens / 低于 50 - sens
+#   boxlen     ta.barssince(side 开始)，箱体上下沿 = 自 side 开始以来的最高/最低 (分组累计最大/最小值)，再取 [2]
+# side 结束的 K 线生成一个箱体 [x1, x2]，之后最近一次 bull / bear 决定其标签 (Accumulation / Distribution)，
+# 直到下一个箱体生成为止 (与 Pine 中 trendBox 持续被 box.set_text 更新一致)。
+# 未移植 Pine 末尾基于摆动点的 SC/AR/ST/BC 标记，这部分由 wyckoff_events.py 负责。
+#
+# reference() 是逐根 K 线、逐句对照 Pine 的直译实现 (含 O(n·len) 的 myhigh / mylow)，
+# 仅用于 --verify 交叉校验向量化结果。
+
+DEFAULT_PARAMS = {
+    "rsi_len": 14,      # RSI Length
+    "sens": 20,         # trend Sensitivity: 横盘区间为 50 ± sens
+}
+
+ACCUMULATION = "Accumulation"
+DISTRIBUTION = "Distribution"
+
+BOX_DTYPE = np.dtype([
+    ("start", "<i8"),       # x1: side 开始的 K 线
+    ("end", "<i8"),         # x2: side 结束前一根的前一根 (Pine 中 bar_index[1] - 1)
+    ("created", "<i8"),     # 生成箱体的 K 线 (side 结束)
+    ("top", "<f8"),
+    ("bottom", "<f8"),
+    ("phase", "U12"),       # Accumulation / Distribution / 空 (尚无趋势)
+    ("filled", "?"),        # Pine 中仅 x1 < x2 时填充背景
+    ("active", "?"),        # 最后一个箱体，标签仍可能随新 K 线变化
+])
+
+DEFAULT_VERIFY_BARS = 5000
+
+
+# ----------------- 向量化实现 -----------------
+def rsi(close, length):
+    """
+    ta.rsi: 前 length 根为 NaN
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    out = np.full(n, np.nan)
+    if n <= length:
+        return out
+    change = np.diff(close)
+    up = np.maximum(change, 0.0)
+    down = np.maximum(-change, 0.0)
+
+    def rma(x):
+        # change[0] 对应第 1 根 K 线; 种子落在第 length 根，之后 y = a * x + (1 - a) * y[1]
+        seeded = np.concatenate([[x[:length].mean()], x[length:]])
+        return pd.Series(seeded).ewm(alpha=1.0 / length, adjust=False).mean().to_numpy()
+
+    u, d = rma(up), rma(down)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        value = 100.0 - 100.0 / (1.0 + u / d)
+    out[length:] = np.where(d == 0, 100.0, np.where(u == 0, 0.0, value))
+    return out
+
+
+def _prev(x, fill=False):
+    out = np.empty_like(x)
+    out[0] = fill
+    out[1:] = x[:-1]
+    return out
+
+
+def compute(high, low, close, params=None):
+    """
+    返回 (逐根 K 线的指标 dict, 箱体数组 BOX_DTYPE)。
+    boxlen 与 box_top / box_bottom 中 Pine 的 na 分别记为 -1 与 NaN
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    n = len(high)
+    r = rsi(close, p["rsi_len"])
+    r1 = _prev(r, np.nan)
+    hi, lo = 50.0 + p["sens"], 50.0 - p["sens"]
+
+    # 与 NaN 比较为 False，与 Pine 中 na 参与比较的结果一致
+    with np.errstate(invalid="ignore"):
+        utad = (r < hi) & (r1 > hi)
+        spring = (r > lo) & (r1 < lo)
+        side = ((r < hi) & (r > lo)) | ((r1 < hi) & (r1 > lo))
+        bull = (r > hi) & (r1 > hi)
+        bear = (r < lo) & (r1 < lo)
+
+    idx = np.arange(n)
+    start = side & ~_prev(side)
+    last_start = np.maximum.accumulate(np.where(start, idx, -1)) if n else idx
+    boxlen = np.where(last_start >= 0, idx - last_start, -1)
+
+    # myhigh(boxlen + 1) = 自最近一次 side 开始以来的最高价: 按 side 开始的次数分组做累计最大值
+    group = np.cumsum(start)
+    running_high = np.where(group > 0, pd.Series(high).groupby(group).cummax().to_numpy(), np.nan)
+    running_low = np.where(group > 0, pd.Series(low).groupby(group).cummin().to_numpy(), np.nan)
+    box_top = np.full(n, np.nan)
+    box_bottom = np.full(n, np.nan)
+    box_top[2:] = running_high[:-2]
+    box_bottom[2:] = running_low[:-2]
+
+    # after_trend: 最近一次 bull / bear (1 / -1)，之前为 0
+    trend_bars = np.flatnonzero(bull | bear)
+    trend = np.zeros(n, dtype=np.int8)
+    if len(trend_bars):
+        pos = np.searchsorted(trend_bars, idx, side="right") - 1
+        known = pos >= 0
+        trend[known] = np.where(bull[trend_bars[pos[known]]], 1, -1)
+
+    created = np.flatnonzero(_prev(side) & ~side)
+    boxes = np.zeros(len(created), dtype=BOX_DTYPE)
+    if len(created):
+        boxes["created"] = created
+        boxes["start"] = last_start[created]
+        boxes["end"] = created - 2
+        boxes["top"] = box_top[created]
+        boxes["bottom"] = box_bottom[created]
+        boxes["filled"] = boxes["start"] < boxes["end"]
+        # 标签取到下一个箱体生成前一根为止 (最后一个箱体取到最新一根)
+        final = np.append(created[1:] - 1, n - 1)
+        boxes["phase"] = np.choose(trend[final] + 1, [DISTRIBUTION, "", ACCUMULATION])
+        boxes["active"][-1] = True
+
+    indicators = {
+        "rsi": r, "utad": utad, "spring": spring, "side": side, "bull": bull, "bear": bear,
+        "boxlen": boxlen, "box_top": box_top, "box_bottom": box_bottom, "trend": trend,
+    }
+    return indicators, boxes
+
+
+def compute_from_frame(df, params=None):
+    """
+    直接接受 *_Cleaned 格式的 DataFrame
+    """
+    return compute(df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy(), params=params)
+
+
+# ----------------- Pine 直译 (校验用) -----------------
+def reference(high, low, close, params=None):
+    """
+    逐根 K 线按 Pine 语义执行，返回与 compute 相同结构的结果。na 用 None 表示后再转换
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    length, sens = p["rsi_len"], p["sens"]
+    n = len(close)
+    alpha = 1.0 / length
+    hi, lo = 50 + sens, 50 - sens
+
+    def gt(a, b):
+        return a is not None and b is not None and a > b
+
+    def lt(a, b):
+        return a is not None and b is not None and a < b
+
+    rsi_v, side_v, boxlen_v, myhigh_v, mylow_v = [], [], [], [], []
+    out = {k: [] for k in ("utad", "spring", "side", "bull", "bear", "boxlen", "box_top", "box_bottom", "trend")}
+    up_hist, down_hist = [], []
+    up_rma = down_rma = None
+    last_start = None
+    last_bull_bear = 0
+    boxes = []
+    trend_box = None
+    for t in range(n):
+        # ta.rsi -> ta.rma(u, len): sum := na(sum[1]) ? ta.sma(src, len) : alpha * src + (1 - alpha) * nz(sum[1])
+        if t == 0:
+            u = d = None
+        else:
+            u = max(close[t] - close[t - 1], 0.0)
+            d = max(close[t - 1] - close[t], 0.0)
+        up_hist.append(u)
+        down_hist.append(d)
+        if up_rma is None:
+            window_u, window_d = up_hist[-length:], down_hist[-length:]
+            if len(window_u) == length and None not in window_u:
+                up_rma, down_rma = sum(window_u) / length, sum(window_d) / length
+        else:
+            up_rma = alpha * u + (1 - alpha) * up_rma
+            down_rma = alpha * d + (1 - alpha) * down_rma
+        if up_rma is None:
+            r = None
+        elif down_rma == 0:
+            r = 100.0
+        elif up_rma == 0:
+            r = 0.0
+        else:
+            r = 100.0 - 100.0 / (1.0 + up_rma / down_rma)
+        rsi_v.append(r)
+        r1 = rsi_v[t - 1] if t > 0 else None
+
+        utad = lt(r, hi) and gt(r1, hi)
+        spring = gt(r, lo) and lt(r1, lo)
+        side = (lt(r, hi) and gt(r, lo)) or (lt(r1, hi) and gt(r1, lo))
+        bull = gt(r, hi) and gt(r1, hi)
+        bear = lt(r, lo) and lt(r1, lo)
+        side_v.append(side)
+        side1 = side_v[t - 1] if t > 0 else False
+
+        if side and not side1:
+            last_start = t
+        boxlen = t - last_start if last_start is not None else None
+        boxlen_v.append(boxlen)
+
+        # myhigh(math.max(1, boxlen + 1)): math.max(1, na) 为 na，for 0 to na - 1 不执行，array.max 为 na
+        if boxlen is None:
+            myhigh_v.append(None)
+            mylow_v.append(None)
+        else:
+            length_hl = max(1, boxlen + 1)
+            myhigh_v.append(max(high[t - i] for i in range(length_hl)))
+            mylow_v.append(min(low[t - i] for i in range(length_hl)))
+        y1 = myhigh_v[t - 2] if t >= 2 else None
+        y2 = mylow_v[t - 2] if t >= 2 else None
+
+        if side1 and not side:
+            x1, x2 = last_start, (t - 1) - 1
+            trend_box = {"start": x1, "end": x2, "created": t, "top": y1, "bottom": y2, "phase": "", "filled": x1 < x2}
+            boxes.append(trend_box)
+        if bull:
+            last_bull_bear = 1
+        elif bear:
+            last_bull_bear = -1
+        if trend_box is not None and last_bull_bear:
+            trend_box["phase"] = ACCUMULATION if last_bull_bear == 1 else DISTRIBUTION
+
+        for key, value in (("utad", utad), ("spring", spring), ("side", side), ("bull", bull), ("bear", bear),
+                           ("boxlen", boxlen), ("box_top", y1), ("box_bottom", y2), ("trend", last_bull_bear)):
+            out[key].append(value)
+
+    indicators = {"rsi": np.array([np.nan if v is None else v for v in rsi_v])}
+    for key in ("utad", "spring", "side", "bull", "bear"):
+        indicators[key] = np.array(out[key], dtype=bool)
+    indicators["boxlen"] = np.array([-1 if v is None else v for v in out["boxlen"]], dtype=np.int64)
+    for key in ("box_top", "box_bottom"):
+        indicators[key] = np.array([np.nan if v is None else v for v in out[key]])
+    indicators["trend"] = np.array(out["trend"], dtype=np.int8)
+
+    result = np.zeros(len(boxes), dtype=BOX_DTYPE)
+    for i, box in enumerate(boxes):
+        for key, value in box.items():
+            result[key][i] = np.nan if value is None else value
+    if len(result):
+        result["active"][-1] = True
+    return indicators, result
+
+
+def verify(high, low, close, params=None, rsi_tol=1e-8):
+    """
+    对比向量化实现与 Pine 直译，返回不一致项列表 (空列表表示一致)
+    """
+    fast, fast_boxes = compute(high, low, close, params)
+    ref, ref_boxes = reference(high, low, close, params)
+    problems = []
+    if not np.allclose(fast["rsi"], ref["rsi"], rtol=0, atol=rsi_tol, equal_nan=True):
+        problems.append(f"rsi 最大误差 {np.nanmax(np.abs(fast['rsi'] - ref['rsi'])):.3g}")
+    for key in ("utad", "spring", "side", "bull", "bear", "boxlen", "trend"):
+        diff = np.flatnonzero(fast[key] != ref[key])
+        if len(diff):
+            problems.append(f"{key}: {len(diff)} 根不一致 (首个 bar {diff[0]})")
+    for key in ("box_top", "box_bottom"):
+        if not np.array_equal(fast[key], ref[key], equal_nan=True):
+            problems.append(f"{key} 不一致")
+    if len(fast_boxes) != len(ref_boxes):
+        problems.append(f"箱体数量 {len(fast_boxes)} != {len(ref_boxes)}")
+    else:
+        for name in BOX_DTYPE.names:
+            a, b = fast_boxes[name], ref_boxes[name]
+            same = np.array_equal(a, b, equal_nan=True) if a.dtype.kind == "f" else np.array_equal(a, b)
+            if not same:
+                problems.append(f"箱体字段 {name} 不一致")
+    return problems
+
+
+def to_frame(boxes, open_time=None):
+    df = pd.DataFrame(boxes)
+    if open_time is not None and len(df):
+        for col in ("start", "end", "created"):
+            df[f"{col}_time"] = pd.to_datetime(open_time[df[col].clip(lower=0)], unit="ms")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Wyckoff_AD.pine 的 RSI 横盘箱体 (吸筹 / 派发) 向量化计算')
+    parser.add_argument('csv_paths', nargs='+', help='*_Cleaned.csv 路径 (可多个)')
+    parser.add_argument('--rsi-len', type=int, default=DEFAULT_PARAMS["rsi_len"], help=f'RSI 周期 (默认 {DEFAULT_PARAMS["rsi_len"]})')
+    parser.add_argument('--sens', type=int, default=DEFAULT_PARAMS["sens"], help=f'趋势灵敏度，横盘区间为 50 ± sens (默认 {DEFAULT_PARAMS["sens"]})')
+    parser.add_argument('--tail', type=int, default=None, help='只计算最后 N 根 K 线 (默认完整历史)')
+    parser.add_argument('--show', type=int, default=10, help='列出最近 N 个箱体 (默认 10)')
+    parser.add_argument('--verify', type=int, nargs='?', const=DEFAULT_VERIFY_BARS, default=None,
+                        help=f'在最后 N 根 K 线上与 Pine 逐根直译交叉校验 (默认 {DEFAULT_VERIFY_BARS})')
+    args = parser.parse_args()
+    params = {"rsi_len": args.rsi_len, "sens": args.sens}
+
+    failed = False
+    for path in args.csv_paths:
+        if not os.path.exists(path):
+            print(f"❌ 错误: 找不到文件 {path}")
+            sys.exit(1)
+        bars = kline_bars.load_bars(path, tail=args.tail, columns=("High", "Low", "Close"))
+        high, low, close = bars.values("High"), bars.values("Low"), bars.values("Close")
+        t0 = time.perf_counter()
+        indicators, boxes = compute(high, low, close, params)
+        elapsed = time.perf_counter() - t0
+        phases = {name: int((boxes["phase"] == name).sum()) for name in (ACCUMULATION, DISTRIBUTION)}
+        print(f"📦 {os.path.basename(path)}: {len(bars)} 根, 箱体 {len(boxes)} 个 "
+              f"(吸筹 {phases[ACCUMULATION]}, 派发 {phases[DISTRIBUTION]}), 计算 {elapsed:.3f} 秒")
+        if len(bars):
+            print(f"   当前 RSI {indicators['rsi'][-1]:.2f}, 横盘 {'是' if indicators['side'][-1] else '否'}, "
+                  f"boxlen {indicators['boxlen'][-1]}")
+
+        open_time = bars.open_time()
+        for box in boxes[-args.show:] if args.show > 0 else []:
+            start = time.strftime("%Y-%m-%d %H:%M", time.gmtime(open_time[max(box["start"], 0)] / 1000))
+            end = time.strftime("%Y-%m-%d %H:%M", time.gmtime(open_time[max(box["end"], 0)] / 1000))
+            print(f"   {start} ~ {end} UTC  {box['bottom']:.4f} - {box['top']:.4f}  {box['phase'] or '-'}"
+                  f"{' (进行中)' if box['active'] else ''}")
+
+        if args.verify:
+            sub = slice(max(len(bars) - args.verify, 0), None)
+            t0 = time.perf_counter()
+            problems = verify(high[sub], low[sub], close[sub], params)
+            status = "✅ 与 Pine 直译一致" if not problems else "❌ 与 Pine 直译不一致: " + "; ".join(problems)
+            print(f"   {status} (最后 {len(close[sub])} 根, {time.perf_counter() - t0:.2f} 秒)")
+            failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import kline_bars
+import kline_store
+import redk_everex
+import watchlist
+
+# ================= 威科夫交易区间回测 =================
+# 将 wyckoff_plot.analyze_structure 的 TR 启发式 (窗口内最低点为 SC/TR 下沿，其后最高点为 AR/TR 上沿，
+# 没有后续 K 线时上沿取 窗口最高点 × 0.98) 滑动应用到每一根 K 线上，而不是逐根重跑 400 根窗口的脚本:
+# 用稀疏表 (Sparse Table) 预处理最高价/最低价，任意区间的最值及其位置都是 O(1) 查询，
+# 所有 K 线的 TR 上下沿一次性向量化求出。
+#
+# 信号在 K 线收盘时用上一根 K 线的 TR (不含当前 K 线) 判断，下一根开盘价入场，避免未来函数:
+#   breakout - 收盘价有效突破 TR 上沿 (做多)，止损 TR 下沿，目标 入场价 + TR 高度
+#   spring   - 最低价刺穿 TR 下沿后收回 (做多)，止损 Spring 最低价，目标 TR 上沿
+#   everex   - 收盘价位于 TR 内且 EVEREX 的 RROF 上穿 0 轴 (redk_everex 的 Alert_up，做多)，止损 TR 下沿，目标 TR 上沿
+# 同一时间只持有一笔仓位，超过 hold 根 K 线未触发止盈止损则按收盘价平仓。手续费按每边 fee_bps 计算。
+
+DEFAULT_WINDOW = 400
+DEFAULT_FALLBACK = 0.98
+DEFAULT_HOLD = 100
+DEFAULT_FEE_BPS = 10.0
+DEFAULT_BREAK_PCT = 0.002
+SIGNALS = ("breakout", "spring", "everex")
+
+TRADE_DTYPE = np.dtype([
+    ("signal", "U8"),
+    ("entry_bar", "<i8"),
+    ("exit_bar", "<i8"),
+    ("entry", "<f8"),
+    ("exit", "<f8"),
+    ("stop", "<f8"),
+    ("target", "<f8"),
+    ("ret", "<f8"),        # 扣除手续费后的收益率
+    ("reason", "U6"),      # target / stop / time
+])
+
+
+# ----------------- 稀疏表区间最值 -----------------
+def sparse_table(values, kind="max", max_len=None):
+    """
+    构建区间最值位置的稀疏表: table[k][i] 为 [i, i + 2^k) 内最值的位置 (相同值取最左)
+    max_len: 查询区间的最大长度 (TR 窗口)，只构建到 2^k <= max_len 的层；每层都是完整长度的数组，
+    不限制时层数随历史长度增长 (1.6M 根 K 线约 21 层)
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    limit = min(n, max_len) if max_len else n
+    better = np.greater if kind == "max" else np.less
+    table = [np.arange(n, dtype=np.int32 if n < 2 ** 31 else np.int64)]
+    k = 1
+    while (1 << k) <= limit:
+        prev = table[-1]
+        half = 1 << (k - 1)
+        left, right = prev[:n - (1 << k) + 1], prev[half:half + n - (1 << k) + 1]
+        table.append(np.where(better(values[right], values[left]), right, left))
+        k += 1
+    return table
+
+
+def range_arg(table, values, left, right, kind="max"):
+    """
+    向量化查询闭区间 [left, right] 的最值位置 (left/right 为等长数组，要求 left <= right，
+    区间长度不超过构建稀疏表时的 max_len)
+    """
+    left = np.asarray(left)
+    right = np.asarray(right)
+    length = right - left + 1
+    k = np.floor(np.log2(np.maximum(length, 1))).astype(np.int64)
+    out = np.empty(len(left), dtype=np.int64)
+    better = np.greater if kind == "max" else np.less
+    for level in np.unique(k):
+        m = k == level
+        a = table[level][left[m]]
+        b = table[level][right[m] - (1 << level) + 1]
+        out[m] = np.where(better(values[b], values[a]), b, a)
+    return out
+
+
+def tr_indices(high, low, window=DEFAULT_WINDOW, tables=None):
+    """
+    每根 K 线 t 以 [t-window+1, t] 为窗口，返回 (SC 位置, SC 之后最高点位置, 窗口最高点位置)
+    只与窗口长度有关，参数扫描时同一窗口的不同阈值可复用
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    n = len(high)
+    hi_table, lo_table = tables if tables is not None else (sparse_table(high, "max", window), sparse_table(low, "min", window))
+    t = np.arange(n)
+    start = np.maximum(t - window + 1, 0)
+    sc_idx = range_arg(lo_table, low, start, t, "min")
+    ar_idx = range_arg(hi_table, high, np.minimum(sc_idx + 1, t), t, "max")
+    bc_idx = range_arg(hi_table, high, start, t, "max")
+    return sc_idx, ar_idx, bc_idx
+
+
+def tr_levels(high, low, indices, window=DEFAULT_WINDOW, fallback=DEFAULT_FALLBACK, ar_gap=1):
+    """
+    由 tr_indices 的结果计算 TR 上下沿，SC 之后不足 ar_gap 根 K 线时视为没有 AR，上沿取 窗口最高 × fallback
+    """
+    sc_idx, ar_idx, bc_idx = indices
+    t = np.arange(len(sc_idx))
+    has_ar = sc_idx + ar_gap <= t
+    tr_top = np.where(has_ar, high[ar_idx], high[bc_idx] * fallback)
+    return {"sc_idx": sc_idx, "tr_bottom": low[sc_idx], "tr_top": tr_top, "has_ar": has_ar, "window_ready": t >= window - 1}
+
+
+def sliding_tr(high, low, window=DEFAULT_WINDOW, fallback=DEFAULT_FALLBACK, tables=None, ar_gap=1):
+    """
+    每根 K 线 t 以 [t-window+1, t] 为窗口计算 TR，返回 dict:
+    sc_idx (窗口最低点位置), tr_bottom, tr_top, has_ar (SC 之后是否还有 K 线), window_ready (窗口已满)
+    tables: 可复用的 (最高价表, 最低价表)，参数扫描时避免重复构建 (max_len 不能小于 window)
+    ar_gap: AR 至少出现在 SC 之后第几根 K 线 (默认 1，与 wyckoff_plot 一致)
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    indices = tr_indices(high, low, window, tables)
+    return tr_levels(high, low, indices, window, fallback, ar_gap)
+
+
+# ----------------- 信号与成交模拟 -----------------
+def find_signals(open_, high, low, close, tr, signals=SIGNALS, break_pct=DEFAULT_BREAK_PCT, everex_up=None):
+    """
+    返回 [(信号名, 信号 K 线位置数组, 止损数组, 目标数组), ...]，只用到信号 K 线及之前的数据
+    everex_up: redk_everex 的 alert_up 数组 (没有成交量数据时为 None，跳过 everex 信号)
+    """
+    top = np.concatenate([[np.nan], tr["tr_top"][:-1]])
+    bottom = np.concatenate([[np.nan], tr["tr_bottom"][:-1]])
+    ready = np.concatenate([[False], tr["window_ready"][:-1]])
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    height = top - bottom
+    result = []
+    if "breakout" in signals:
+        mask = ready & (close > top * (1 + break_pct)) & (prev_close <= top * (1 + break_pct))
+        idx = np.flatnonzero(mask)
+        result.append(("breakout", idx, bottom[idx], close[idx] + height[idx]))
+    if "spring" in signals:
+        mask = ready & (low < bottom) & (close > bottom)
+        idx = np.flatnonzero(mask)
+        result.append(("spring", idx, low[idx], top[idx]))
+    if "everex" in signals and everex_up is not None:
+        mask = ready & everex_up & (close > bottom) & (close < top)
+        idx = np.flatnonzero(mask)
+        result.append(("everex", idx, bottom[idx], top[idx]))
+    return result
+
+
+def simulate(open_, high, low, close, entries, hold=DEFAULT_HOLD, fee_bps=DEFAULT_FEE_BPS):
+    """
+    entries: 按信号 K 线排序的 [(信号名, 位置, 止损, 目标), ...]，下一根开盘价入场，一次只持有一笔
+    止损与目标在同一根 K 线内同时触发时按止损处理 (保守)
+    """
+    n = len(close)
+    fee = fee_bps / 10000.0
+    trades = []
+    busy_until = -1
+    for name, i, stop, target in entries:
+        e = i + 1
+        if e >= n or e <= busy_until:
+            continue
+        entry = open_[e]
+        if not (stop < entry < target):
+            continue
+        last = min(e + hold, n - 1)
+        hit_stop = low[e:last + 1] <= stop
+        hit_target = high[e:last + 1] >= target
+        s = int(np.argmax(hit_stop)) if hit_stop.any() else None
+        g = int(np.argmax(hit_target)) if hit_target.any() else None
+        if s is not None and (g is None or s <= g):
+            x, price, reason = e + s, stop, "stop"
+        elif g is not None:
+            x, price, reason = e + g, target, "target"
+        else:
+            x, price, reason = last, close[last], "time"
+        ret = (price * (1 - fee)) / (entry * (1 + fee)) - 1
+        trades.append((name, e, x, entry, price, stop, target, ret, reason))
+        busy_until = x
+    return np.array(trades, dtype=TRADE_DTYPE)
+
+
+def summarize(trades):
+    """
+    胜率、平均盈亏、期望值 (每笔平均收益)、盈亏比、复利总收益与最大回撤
+    """
+    n = len(trades)
+    if n == 0:
+        return {"trades": 0, "hit_rate": 0.0, "avg_win": 0.0, "avg_loss": 0.0, "expectancy": 0.0,
+                "profit_factor": 0.0, "total_return": 0.0, "max_drawdown": 0.0}
+    ret = trades["ret"]
+    wins, losses = ret[ret > 0], ret[ret <= 0]
+    equity = np.cumprod(1 + ret)
+    peak = np.maximum.accumulate(np.concatenate([[1.0], equity]))[1:]
+    return {
+        "trades": int(n),
+        "hit_rate": float(len(wins) / n),
+        "avg_win": float(wins.mean()) if len(wins) else 0.0,
+        "avg_loss": float(losses.mean()) if len(losses) else 0.0,
+        "expectancy": float(ret.mean()),
+        "profit_factor": float(wins.sum() / -losses.sum()) if losses.sum() < 0 else float("inf"),
+        "total_return": float(equity[-1] - 1),
+        "max_drawdown": float((1 - equity / peak).max()),
+    }
+
+
+def json_safe(value):
+    """
+    无穷大 / NaN (例如没有亏损交易时的 profit_factor) 转为 None，JSON 中写为 null
+    """
+    if isinstance(value, dict):
+        return {k: json_safe(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [json_safe(v) for v in value]
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def backtest_tr(open_, high, low, close, tr, signals=SIGNALS, hold=DEFAULT_HOLD, fee_bps=DEFAULT_FEE_BPS,
+                break_pct=DEFAULT_BREAK_PCT, everex_up=None):
+    """
+    在已计算好的 TR 上生成信号并模拟成交，返回 {信号: (成交明细, 统计)}
+    """
+    results = {}
+    for name, idx, stop, target in find_signals(open_, high, low, close, tr, signals, break_pct, everex_up):
+        entries = [(name, int(i), float(s), float(g)) for i, s, g in zip(idx, stop, target)]
+        trades = simulate(open_, high, low, close, entries, hold, fee_bps)
+        results[name] = (trades, summarize(trades))
+    return results
+
+
+def backtest_arrays(open_, high, low, close, window=DEFAULT_WINDOW, fallback=DEFAULT_FALLBACK, signals=SIGNALS,
+                    hold=DEFAULT_HOLD, fee_bps=DEFAULT_FEE_BPS, break_pct=DEFAULT_BREAK_PCT, tables=None, ar_gap=1,
+                    volume=None):
+    tr = sliding_tr(high, low, window, fallback, tables, ar_gap)
+    everex_up = everex_signal(open_, high, low, close, volume) if "everex" in signals else None
+    return backtest_tr(open_, high, low, close, tr, signals, hold, fee_bps, break_pct, everex_up)
+
+
+def everex_signal(open_, high, low, close, volume, params=None):
+    """
+    EVEREX 上穿 0 轴 (与 TR 无关，回测 / 参数扫描中每个数据集只算一次)
+    """
+    if volume is None:
+        return None
+    return redk_everex.compute(open_, high, low, close, volume, params)["alert_up"]
+
+
+def backtest_file(csv_path, **params):
+    """
+    对单个 *_Cleaned.csv 回测 (供进程池调用)，返回 {信号: 统计}
+    """
+    t0 = time.perf_counter()
+    # 全部历史只经过紧凑容器，不构建完整的 DataFrame
+    bars = kline_bars.load_bars(csv_path, columns=("Open", "High", "Low", "Close", "Volume"))
+    arrays = [bars.values(c) for c in ("Open", "High", "Low", "Close")]
+    results = backtest_arrays(*arrays, volume=bars.values("Volume"), **params)
+    return {
+        "name": os.path.splitext(os.path.basename(csv_path))[0].replace("_Cleaned", ""),
+        "bars": len(bars),
+        "seconds": time.perf_counter() - t0,
+        "stats": {name: stats for name, (_, stats) in results.items()},
+        "trades": {name: trades for name, (trades, _) in results.items()},
+    }
+
+
+def print_results(results):
+    header = (f"{'PAIR':<16}{'SIGNAL':<10}{'BARS':>9}{'TRADES':>8}{'HIT':>7}{'EXPECT':>9}"
+              f"{'PF':>7}{'TOTAL':>9}{'MAXDD':>8}{'SEC':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        for name, s in r["stats"].items():
+            pf = f"{s['profit_factor']:.2f}" if np.isfinite(s["profit_factor"]) else "inf"
+            print(f"{r['name']:<16}{name:<10}{r['bars']:>9}{s['trades']:>8}{s['hit_rate']:>7.1%}"
+                  f"{s['expectancy']:>9.3%}{pf:>7}{s['total_return']:>9.1%}{s['max_drawdown']:>8.1%}{r['seconds']:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='威科夫 TR 突破 / Spring / EVEREX 信号回测')
+    parser.add_argument('csv_paths', nargs='*', help='*_Cleaned.csv 路径 (可多个)')
+    parser.add_argument('--pairs', nargs='*', default=[], help='交易对:周期，如 ADAUSDC:1m,4h (读取本目录存储)')
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW, help=f'TR 识别窗口 (默认 {DEFAULT_WINDOW})')
+    parser.add_argument('--fallback', type=float, default=DEFAULT_FALLBACK, help=f'无 AR 时上沿 = 窗口最高 × 该系数 (默认 {DEFAULT_FALLBACK})')
+    parser.add_argument('--signals', nargs='+', choices=SIGNALS, default=list(SIGNALS), help='回测的信号类型')
+    parser.add_argument('--hold', type=int, default=DEFAULT_HOLD, help=f'最长持仓 K 线数 (默认 {DEFAULT_HOLD})')
+    parser.add_argument('--fee-bps', type=float, default=DEFAULT_FEE_BPS, help=f'每边手续费 (基点，默认 {DEFAULT_FEE_BPS})')
+    parser.add_argument('--break-pct', type=float, default=DEFAULT_BREAK_PCT, help=f'突破确认幅度 (默认 {DEFAULT_BREAK_PCT})')
+    parser.add_argument('--procs', type=int, default=None, help='进程数 (默认 CPU 核数)')
+    parser.add_argument('--json', default=None, help='将统计结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = list(args.csv_paths)
+    paths += [kline_store.csv_path(here, s, i) for s, i in watchlist.parse_watchlist(pairs=args.pairs)]
+    if not paths:
+        paths = [kline_store.csv_path(here, s, i) for s, i in watchlist.parse_watchlist(watchlist.DEFAULT_WATCHLIST)]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        print(f"⚠️ 跳过不存在的文件: {', '.join(missing)}")
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        print("❌ 没有可回测的数据")
+        sys.exit(1)
+
+    params = dict(window=args.window, fallback=args.fallback, signals=tuple(args.signals), hold=args.hold,
+                  fee_bps=args.fee_bps, break_pct=args.break_pct)
+    print(f"🧪 回测 {len(paths)} 个数据集: window={args.window}, hold={args.hold}, fee={args.fee_bps}bps")
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.procs) as pool:
+        futures = [pool.submit(backtest_file, p, **params) for p in paths]
+        results = [f.result() for f in futures]
+    print_results(results)
+    print(f"\n✅ 回测完成，总耗时 {time.perf_counter() - t0:.2f} 秒")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([{k: json_safe(r[k]) for k in ("name", "bars", "seconds", "stats")} for r in results], f,
+                      ensure_ascii=False, indent=2, allow_nan=False)
+        print(f"💾 统计结果已写入: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+# 批量流水线: 一个进程内完成 watchlist 中所有交易对的 获取 -> 清洗 -> 绘图 -> 报告 (-> AI 分析)
+# 替代逐对调用 run_wyckoff.sh (每次都要启动 3 个 Python 进程、重复导入 pandas/matplotlib 并 mv 文件)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(HERE, "output")
+
+# wyckoff_plot.py 位于 output/ 目录下
+sys.path.insert(0, OUTPUT_DIR)
+
+import binance_data_pro
+import ai_analyze
+import ai_queue
+import kline_store
+import kline_resample
+import pipeline_metrics
+import prompt_payload
+from watchlist import DEFAULT_WATCHLIST, parse_watchlist
+import wyckoff_report
+
+STAGES = ["fetch", "load", "analyze", "plot", "report", "ai"]
+
+
+# ----------------- 绘图进程池 -----------------
+def _init_plot_worker():
+    # 每个工作进程只导入一次 matplotlib/mplfinance、只做一次字体探测并只创建一次画布模板
+    import wyckoff_plot
+    pipeline_metrics.configure("wyckoff_plot")
+    with pipeline_metrics.stage("font"):
+        wyckoff_plot.configure_font()
+    wyckoff_plot.get_template()
+
+
+def _plot_context():
+    # 绘图进程在获取线程运行期间才启动: fork 会把其他线程持有的锁 (requests/urllib3 连接池、指标记录) 复制到子进程，
+    # 子进程可能因此死锁。改用 forkserver 从干净的服务进程派生 (不支持时用 spawn)
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _plot_job(csv_path, output_dir, force=False):
+    import wyckoff_plot
+    return wyckoff_plot.run(csv_path, output_dir, fast=True, force=force)
+
+
+# ----------------- 流水线 -----------------
+def fetch_pair(symbol, interval, days, workers):
+    t0 = time.perf_counter()
+    start_ts = binance_data_pro.get_start_ts(days)
+    summary = binance_data_pro.sync_klines(symbol, interval, start_ts, out_dir=HERE, days=days, workers=workers)
+    return summary, time.perf_counter() - t0
+
+
+def derived_pairs(pairs):
+    """
+    同一交易对同时包含 1m 时，其余周期改为由 1m 聚合生成，返回 {(symbol, interval): 1m 交易对}
+    """
+    base = kline_resample.BASE_INTERVAL
+    return {pair: (pair[0], base) for pair in pairs
+            if pair[1] != base and (pair[0], base) in pairs and pair[1] in binance_data_pro.INTERVAL_MS}
+
+
+def resample_pair(symbol, intervals):
+    with pipeline_metrics.stage("resample", symbol=symbol, intervals=",".join(intervals)) as st:
+        kline_resample.update_all(HERE, symbol, intervals)
+    return st.wall
+
+
+def run_pipeline(pairs, days=0, workers=1, fetch_threads=4, procs=None, history=400, use_ai=True, skip_fetch=False,
+                 force_plot=False, encoding=None, factor=1, use_cache=True, ai_concurrency=ai_queue.DEFAULT_CONCURRENCY,
+                 resample=False):
+    """
+    获取阶段在线程池中并发执行 (共享同一个权重令牌桶)，
+    每个交易对数据就绪后立即提交到绘图进程池 (快速渲染，数据未变化的图表直接跳过)，最后并发执行 AI 分析。
+    resample=True 时，watchlist 中包含 1m 的交易对只下载 1m，其余周期由 1m 聚合 (fetch 列记录聚合耗时)。
+    返回 {(symbol, interval): {阶段: 秒数, "status": ...}}
+    """
+    timings = {pair: {"status": "ok"} for pair in pairs}
+    ready = []
+    derived = derived_pairs(pairs) if resample else {}
+    fetched = [pair for pair in pairs if pair not in derived]
+
+    with ProcessPoolExecutor(max_workers=procs, mp_context=_plot_context(), initializer=_init_plot_worker) as plot_pool:
+        plot_futures = {}
+
+        def submit_plot(pair):
+            csv_path = kline_store.csv_path(HERE, *pair)
+            if not os.path.exists(csv_path):
+                timings[pair]["status"] = "no data"
+                return
+            plot_futures[plot_pool.submit(_plot_job, csv_path, OUTPUT_DIR, force_plot)] = pair
+
+        def base_ready(pair):
+            # 1m 数据就绪: 先聚合出派生周期，再一起提交绘图
+            submit_plot(pair)
+            children = [p for p, base in derived.items() if base == pair]
+            if not children:
+                return
+            try:
+                elapsed = resample_pair(pair[0], [p[1] for p in children])
+            except Exception as e:
+                print(f"❌ {pair[0]} 重采样失败: {e}")
+                for child in children:
+                    timings[child]["status"] = "resample failed"
+                return
+            for child in children:
+                timings[child]["fetch"] = elapsed
+                submit_plot(child)
+
+        if skip_fetch:
+            for pair in fetched:
+                base_ready(pair)
+        else:
+            with ThreadPoolExecutor(max_workers=fetch_threads) as fetch_pool:
+                fetch_futures = {fetch_pool.submit(fetch_pair, *pair, days, workers): pair for pair in fetched}
+                for future in as_completed(fetch_futures):
+                    pair = fetch_futures[future]
+                    try:
+                        summary, elapsed = future.result()
+                    except Exception as e:
+                        print(f"❌ {pair[0]} {pair[1]} 数据获取失败: {e}")
+                        timings[pair]["status"] = "fetch failed"
+                        continue
+                    timings[pair]["fetch"] = elapsed
+                    if summary["path"] is None:
+                        timings[pair]["status"] = "no data"
+                        continue
+                    base_ready(pair)
+
+        for future in as_completed(plot_futures):
+            pair = plot_futures[future]
+            try:
+                timings[pair].update(future.result())
+                ready.append(pair)
+            except Exception as e:
+                print(f"❌ {pair[0]} {pair[1]} 绘图失败: {e}")
+                timings[pair]["status"] = "plot failed"
+
+    api_url = ai_analyze.get_api_url() if use_ai else None
+    if use_ai and not api_url:
+        print("ℹ️ 未检测到 GOOGLE_API_KEY，跳过 AI 深度分析 (保留模板报告)。")
+    if api_url and ready:
+        # 所有交易对的 AI 分析并发执行，共享同一个 RPM/TPM 预算
+        ready = sorted(ready, key=pairs.index)
+        csv_paths = [kline_store.csv_path(HERE, *pair) for pair in ready]
+        results = ai_queue.analyze_many(csv_paths, history, api_url, output_dir=OUTPUT_DIR,
+                                        encoding=encoding or prompt_payload.DEFAULT_ENCODING, factor=factor,
+                                        concurrency=ai_concurrency, use_cache=use_cache)
+        for pair, path in zip(ready, csv_paths):
+            metrics = results[path]
+            timings[pair]["ai"] = metrics["wait"] + metrics["latency"]
+            if metrics["status"] != "ok":
+                timings[pair]["status"] = "ai failed"
+        ai_queue.print_metrics(results.values())
+
+    # 各交易对的报告已在绘图 / AI 阶段渲染，这里只刷新汇总页 (内容未变化时不写入)
+    path, written = wyckoff_report.render_index(OUTPUT_DIR, [f"{symbol}_{interval}" for symbol, interval in pairs])
+    if written:
+        print(f"📚 汇总页已更新: {path}")
+    return timings
+
+
+def print_timings(pairs, timings):
+    header = f"{'PAIR':<18}" + "".join(f"{s:>9}" for s in STAGES) + f"{'TOTAL':>9}  STATUS"
+    print("\n⏱️ 各阶段耗时 (秒)")
+    print(header)
+    print("-" * len(header))
+    for pair in pairs:
+        row = timings[pair]
+        cells = "".join(f"{row[s]:>9.2f}" if s in row else f"{'-':>9}" for s in STAGES)
+        total = sum(row[s] for s in STAGES if s in row)
+        status = row['status'] + (" (图表未变化)" if row.get("rendered") is False else "")
+        print(f"{pair[0] + ' ' + pair[1]:<18}{cells}{total:>9.2f}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='威科夫批量分析流水线 (watchlist 中所有交易对/周期)')
+    parser.add_argument('watchlist', nargs='?', default=DEFAULT_WATCHLIST, help='watchlist 文件路径 (默认 watchlist.txt)')
+    parser.add_argument('--pairs', nargs='*', default=[], help='额外的交易对，如 ADAUSDC:4h BTCUSDT:1h,1d')
+    parser.add_argument('--days', type=int, default=0, help='无本地数据时从最近 N 天前开始拉取 (默认 0 表示从 2024-01-01 开始)')
+    parser.add_argument('--workers', type=int, default=1, help='单个交易对的并发拉取线程数 (默认 1)')
+    parser.add_argument('--fetch-threads', type=int, default=4, help='同时拉取的交易对数量 (默认 4)')
+    parser.add_argument('--procs', type=int, default=None, help='绘图进程数 (默认 CPU 核数)')
+    parser.add_argument('--history', type=int, default=400, help='提交给 AI 的历史 K 线行数 (默认 400)')
+    parser.add_argument('--no-ai', action='store_true', help='跳过 Gemini AI 分析')
+    parser.add_argument('--encoding', choices=prompt_payload.ENCODINGS, default=prompt_payload.DEFAULT_ENCODING, help='提交给 AI 的数据编码')
+    parser.add_argument('--downsample', type=int, default=1, help='提交给 AI 时较早的 K 线每 N 根合并为一根')
+    parser.add_argument('--no-cache', action='store_true', help='忽略 AI 分析缓存，强制调用 API')
+    parser.add_argument('--ai-concurrency', type=int, default=ai_queue.DEFAULT_CONCURRENCY, help='同时进行的 AI 请求数')
+    parser.add_argument('--skip-fetch', action='store_true', help='不拉取新数据，直接使用本地存储')
+    parser.add_argument('--resample', action='store_true', help='包含 1m 的交易对只下载 1m，其余周期由 1m 聚合')
+    parser.add_argument('--force-plot', action='store_true', help='即使数据未变化也重新绘图')
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure_from_args("wyckoff_batch", args)
+
+    watchlist = args.watchlist if os.path.exists(args.watchlist) else None
+    if watchlist is None and not args.pairs:
+        print(f"❌ 找不到 watchlist 文件: {args.watchlist}")
+        sys.exit(1)
+    pairs = parse_watchlist(watchlist, args.pairs)
+    if not pairs:
+        print("❌ watchlist 为空")
+        sys.exit(1)
+
+    print(f"🚀 批量分析 {len(pairs)} 个交易对/周期: " + ", ".join(f"{s} {i}" for s, i in pairs))
+    t0 = time.perf_counter()
+    timings = run_pipeline(pairs, days=args.days, workers=args.workers, fetch_threads=args.fetch_threads,
+                           procs=args.procs, history=args.history, use_ai=not args.no_ai,
+                           skip_fetch=args.skip_fetch, force_plot=args.force_plot,
+                           encoding=args.encoding, factor=args.downsample, use_cache=not args.no_cache,
+                           ai_concurrency=args.ai_concurrency, resample=args.resample)
+    print_timings(pairs, timings)
+    print(f"\n✅ 批量流程完成，总耗时 {time.perf_counter() - t0:.2f} 秒")
+
+    if any(row["status"] != "ok" for row in timings.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
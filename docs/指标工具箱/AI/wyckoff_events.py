@@ -0,0 +1,642 @@
+import numpy as np
+
+# ================= 威科夫事件识别引擎 =================
+# 基于 NumPy 滚动窗口的向量化特征 (摆动高低点、成交量 z-score、振幅、收盘位置、区间突破)，
+# 在完整历史上识别多个交易区间 (TR) 以及 SC/BC、AR、ST、Spring、UTAD、SOS/SOW、LPS/LPSY 事件。
+#
+# 特征计算均为 O(n)；区间状态机只在稀疏的候选 K 线 (高潮、摆动点) 之间跳转。
+# 每个区间只处理它自己的 K 线: 突破点用按块倍增的向前搜索，摆动点用 searchsorted 切片，
+# 下一个区间从本区间结束处开始，因此各区间的工作量之和与历史长度线性相关。
+#
+# 每个事件同时记录 bar (事件所在 K 线) 与 confirm (可确认该事件的最早 K 线，
+# 例如摆动点需要右侧 pivot 根 K 线)，回测/实时模式用 confirm 可避免未来函数。
+
+DEFAULT_PARAMS = {
+    "pivot": 5,             # 摆动点左右各需 pivot 根 K 线确认
+    "climax_lookback": 50,  # 高潮 K 线需创出最近 N 根的新低/新高
+    "vol_window": 50,       # 成交量/振幅均值统计窗口
+    "vol_z": 2.0,           # 高潮 K 线成交量 z-score 阈值
+    "spread_ratio": 1.5,    # 高潮 K 线振幅需达到平均振幅的倍数
+    "ar_max": 40,           # 高潮后最多 N 根 K 线内寻找 AR
+    "break_pct": 0.01,      # 收盘价超出区间该比例视为突破，区间结束
+    "st_tol": 0.1,          # ST 与 SC/BC 价位的距离容差 (区间高度的比例)
+    "lps_max": 30,          # 突破后最多 N 根 K 线内寻找 LPS/LPSY
+}
+
+EVENT_DTYPE = np.dtype([
+    ("bar", "<i8"),
+    ("confirm", "<i8"),
+    ("time", "<i8"),
+    ("event", "U8"),
+    ("price", "<f8"),
+    ("confidence", "<f8"),
+    ("range_id", "<i4"),
+])
+
+RANGE_DTYPE = np.dtype([
+    ("range_id", "<i4"),
+    ("kind", "U12"),
+    ("start", "<i8"),
+    ("end", "<i8"),
+    ("top", "<f8"),
+    ("bottom", "<f8"),
+    ("active", "?"),
+])
+
+
+# ----------------- O(n) 滚动窗口基础函数 -----------------
+def rolling_max(x, w):
+    """
+    以 i 结尾、长度 w 的窗口最大值 (van Herk/Gil-Werman 分块前缀/后缀最大值)，
+    前 w-1 根使用扩展窗口。
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if w <= 1 or n == 0:
+        return x.copy()
+    pad = (-n) % w
+    blocks = np.concatenate([x, np.full(pad, -np.inf)]).reshape(-1, w)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out = np.empty(n)
+    head = min(w - 1, n)
+    out[:head] = np.maximum.accumulate(x[:head])
+    if n >= w:
+        i = np.arange(w - 1, n)
+        out[w - 1:] = np.maximum(suffix[i - w + 1], prefix[i])
+    return out
+
+
+def rolling_min(x, w):
+    return -rolling_max(-np.asarray(x, dtype=float), w)
+
+
+def rolling_mean_std(x, w):
+    """
+    以 i 结尾、长度 w 的窗口均值与标准差 (前缀和实现)，前 w-1 根使用扩展窗口
+    """
+    x = np.asarray(x, dtype=float)
+    # 先减去整体均值再做前缀和，降低长序列上平方和相减的精度损失
+    base = x.mean() if len(x) else 0.0
+    x = x - base
+    c1 = np.concatenate([[0.0], np.cumsum(x)])
+    c2 = np.concatenate([[0.0], np.cumsum(x * x)])
+    idx = np.arange(1, len(x) + 1)
+    lo = np.maximum(idx - w, 0)
+    cnt = idx - lo
+    mean = (c1[idx] - c1[lo]) / cnt
+    var = np.maximum((c2[idx] - c2[lo]) / cnt - mean * mean, 0.0)
+    return mean + base, np.sqrt(var)
+
+
+def shift(x, k, fill=np.nan):
+    """
+    向后平移 k 根 (k>0 时 out[i] = x[i-k])
+    """
+    out = np.full(len(x), fill, dtype=float)
+    if k == 0:
+        out[:] = x
+    elif k > 0:
+        out[k:] = x[:-k]
+    else:
+        out[:k] = x[-k:]
+    return out
+
+
+def pivots(high, low, k):
+    """
+    摆动高/低点: 在左右各 k 根 K 线内为最高/最低 (左侧严格，避免平台重复标记)，
+    需要 i+k 根 K 线后才能确认，历史末尾 k 根不会被标记。
+    """
+    n = len(high)
+    w = 2 * k + 1
+    center_max = shift(rolling_max(high, w), -k, fill=np.inf)
+    center_min = shift(rolling_min(low, w), -k, fill=-np.inf)
+    left_max = shift(rolling_max(high, k), 1, fill=-np.inf)
+    left_min = shift(rolling_min(low, k), 1, fill=np.inf)
+    ph = (high >= center_max) & (high > left_max)
+    pl = (low <= center_min) & (low < left_min)
+    if n > k:
+        ph[n - k:] = False
+        pl[n - k:] = False
+    return ph, pl
+
+
+def _clip01(x):
+    return float(min(max(x, 0.0), 1.0))
+
+
+def first_breakout(close, start, upper, lower, chunk=64):
+    """
+    从 start 开始第一根收盘价高于 upper 或低于 lower 的 K 线 (没有时返回 len(close))。
+    按倍增的块向前搜索，耗时与 (结果 - start) 成正比，不会每次都扫到历史末尾。
+    """
+    n = len(close)
+    while start < n:
+        seg = close[start:start + chunk]
+        hit = np.flatnonzero((seg > upper) | (seg < lower))
+        if len(hit):
+            return start + int(hit[0])
+        start += len(seg)
+        chunk *= 2
+    return n
+
+
+# ----------------- 特征 -----------------
+def compute_features(high, low, close, volume, params=None):
+    """
+    计算事件识别所需的全部向量化特征，返回 dict (sweep/回测可缓存复用)
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+
+    spread = high - low
+    vol_mean, vol_std = rolling_mean_std(volume, p["vol_window"])
+    spread_mean, _ = rolling_mean_std(spread, p["vol_window"])
+    # 统计量使用前一根为止的窗口，避免当前放量 K 线稀释自己的 z-score
+    vol_mean = shift(vol_mean, 1, fill=np.nan)
+    vol_std = shift(vol_std, 1, fill=np.nan)
+    spread_mean = shift(spread_mean, 1, fill=np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vol_z = np.where(vol_std > 0, (volume - vol_mean) / vol_std, 0.0)
+        spread_ratio = np.where(spread_mean > 0, spread / spread_mean, 0.0)
+        close_pos = np.where(spread > 0, (close - low) / spread, 0.5)
+    vol_z = np.nan_to_num(vol_z)
+    spread_ratio = np.nan_to_num(spread_ratio)
+
+    lb = p["climax_lookback"]
+    new_low = low <= rolling_min(low, lb)
+    new_high = high >= rolling_max(high, lb)
+    ph, pl = pivots(high, low, p["pivot"])
+
+    return {
+        "high": high, "low": low, "close": close, "volume": volume,
+        "spread": spread, "vol_mean": vol_mean, "vol_z": vol_z,
+        "spread_ratio": spread_ratio, "close_pos": close_pos,
+        "new_low": new_low, "new_high": new_high,
+        "pivot_high": ph, "pivot_low": pl,
+    }
+
+
+# ----------------- 事件识别 -----------------
+def detect_events(high, low, close, volume, open_time=None, params=None, features=None):
+    """
+    在完整历史上识别交易区间与威科夫事件。
+    返回 (events, ranges) 两个 numpy 结构化数组 (EVENT_DTYPE / RANGE_DTYPE)。
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    f = features if features is not None else compute_features(high, low, close, volume, p)
+    high, low, close, volume = f["high"], f["low"], f["close"], f["volume"]
+    n = len(close)
+    times = np.asarray(open_time, dtype=np.int64) if open_time is not None else np.arange(n, dtype=np.int64)
+    k = p["pivot"]
+
+    climax_ok = (f["vol_z"] >= p["vol_z"]) & (f["spread_ratio"] >= p["spread_ratio"])
+    sc_idx = np.flatnonzero(climax_ok & f["new_low"])
+    bc_idx = np.flatnonzero(climax_ok & f["new_high"])
+    climaxes = np.concatenate([sc_idx, bc_idx])
+    kinds = np.concatenate([np.zeros(len(sc_idx), bool), np.ones(len(bc_idx), bool)])
+    order = np.argsort(climaxes, kind="stable")
+    climaxes, kinds = climaxes[order], kinds[order]
+
+    ph_idx = np.flatnonzero(f["pivot_high"])
+    pl_idx = np.flatnonzero(f["pivot_low"])
+
+    events = []
+    ranges = []
+
+    def add(bar, confirm, name, price, conf, rid):
+        events.append((bar, confirm, times[bar], name, price, conf, rid))
+
+    def first_pivot(pivot_idx, after, limit):
+        j = np.searchsorted(pivot_idx, after, side="right")
+        if j < len(pivot_idx) and pivot_idx[j] <= limit:
+            return int(pivot_idx[j])
+        return None
+
+    # 高潮按顺序处理: 前一个高潮要到超时 (或 AR 被否定) 才让出位置，逐根运行时后面的区间最早在此时才能确认
+    wait = 0
+    ci = 0
+    while ci < len(climaxes):
+        c = int(climaxes[ci])
+        is_bc = bool(kinds[ci])
+        ci += 1
+
+        # AR: 高潮之后第一个反向摆动点
+        p_ar = first_pivot(pl_idx if is_bc else ph_idx, c, min(c + p["ar_max"], n - 1))
+        if p_ar is None:
+            wait = max(wait, c + p["ar_max"] + k)
+            continue
+        if is_bc:
+            top, bottom = high[c], low[p_ar]
+        else:
+            top, bottom = high[p_ar], low[c]
+        height = top - bottom
+        if height <= 0:
+            wait = max(wait, p_ar + k)
+            continue
+        ar_confirm = max(p_ar + k, wait)
+        if ar_confirm > n - 1:
+            # 数据末尾之前无法确认，之后的高潮只会更晚
+            break
+        wait = ar_confirm
+
+        rid = len(ranges)
+        vz, sr, cp = f["vol_z"][c], f["spread_ratio"][c], f["close_pos"][c]
+        climax_conf = 0.5 * _clip01(vz / 4) + 0.3 * _clip01(sr / 3) + 0.2 * _clip01(cp if not is_bc else 1 - cp)
+        add(c, c, "BC" if is_bc else "SC", high[c] if is_bc else low[c], climax_conf, rid)
+        ar_conf = 0.5 + 0.5 * _clip01(height / (f["spread"][c] * 3 + 1e-12))
+        add(p_ar, ar_confirm, "AR", low[p_ar] if is_bc else high[p_ar], ar_conf, rid)
+
+        # 区间结束: 第一根收盘价有效突破上沿/下沿的 K 线
+        s = p_ar + 1
+        upper, lower = top * (1 + p["break_pct"]), bottom * (1 - p["break_pct"])
+        e = first_breakout(close, s, upper, lower)
+        active = e >= n
+
+        # ST: 区间内回到 SC/BC 附近、但成交量低于高潮的摆动点
+        tol = p["st_tol"] * height
+        if is_bc:
+            lo, hi = np.searchsorted(ph_idx, [s, e])
+            cand = ph_idx[lo:hi]
+            cand = cand[(np.abs(high[cand] - top) <= tol) & (volume[cand] < volume[c])]
+        else:
+            lo, hi = np.searchsorted(pl_idx, [s, e])
+            cand = pl_idx[lo:hi]
+            cand = cand[(np.abs(low[cand] - bottom) <= tol) & (volume[cand] < volume[c])]
+        for j in cand:
+            conf = 0.5 * _clip01(1 - volume[j] / volume[c]) + 0.5 * _clip01(1 - abs((high[j] if is_bc else low[j]) - (top if is_bc else bottom)) / (tol + 1e-12))
+            add(j, min(j + k, n - 1), "ST", high[j] if is_bc else low[j], conf, rid)
+
+        # Spring / UTAD: 刺穿区间边界后当根收回
+        seg = slice(s, e)
+        spring = (low[seg] < bottom) & (close[seg] > bottom)
+        utad = (high[seg] > top) & (close[seg] < top)
+        for mask, name, price_arr in ((spring, "SPRING", low), (utad, "UTAD", high)):
+            # 连续多根只记第一根
+            first = mask & ~np.concatenate([[False], mask[:-1]])
+            for j in np.flatnonzero(first) + s:
+                conf = 0.5 * _clip01(1 - f["vol_z"][j] / 3) + 0.5 * _clip01(f["close_pos"][j] if name == "SPRING" else 1 - f["close_pos"][j])
+                add(j, j, name, price_arr[j], conf, rid)
+
+        # SOS / SOW 与随后的 LPS / LPSY
+        if not active:
+            up = bool(close[e] > upper)
+            conf = 0.5 * _clip01(f["vol_z"][e] / 3) + 0.5 * _clip01(f["spread_ratio"][e] / 2)
+            add(e, e, "SOS" if up else "SOW", close[e], conf, rid)
+            limit = min(e + p["lps_max"], n - 1)
+            if up:
+                j = first_pivot(pl_idx, e, limit)
+                if j is not None and low[j] > bottom + 0.5 * height:
+                    add(j, min(j + k, n - 1), "LPS", low[j], _clip01(1 - volume[j] / (f["vol_mean"][j] * 2 + 1e-12)) * 0.5 + 0.5, rid)
+            else:
+                j = first_pivot(ph_idx, e, limit)
+                if j is not None and high[j] < top - 0.5 * height:
+                    add(j, min(j + k, n - 1), "LPSY", high[j], _clip01(1 - volume[j] / (f["vol_mean"][j] * 2 + 1e-12)) * 0.5 + 0.5, rid)
+
+        ranges.append((rid, "distribution" if is_bc else "accumulation", c, min(e, n - 1), top, bottom, active))
+
+        # 下一个区间从本区间结束后的高潮开始寻找
+        ci = int(np.searchsorted(climaxes, e, side="left"))
+
+    ev = np.array(events, dtype=EVENT_DTYPE)
+    if len(ev):
+        ev = ev[np.argsort(ev["bar"], kind="stable")]
+    return ev, np.array(ranges, dtype=RANGE_DTYPE)
+
+
+def detect_file(csv_path, params=None):
+    """
+    在整个本地存储上识别。状态机总是从历史起点开始，结果不随读取的窗口移动；
+    bar / confirm 为全历史中的序号，用 window_events 换算到截取的窗口
+    """
+    import kline_bars
+    names = ("High", "Low", "Close", "Volume")
+    bars = kline_bars.load_bars(csv_path, columns=names)
+    return detect_events(*(bars.values(name) for name in names), open_time=bars.open_time(), params=params)
+
+
+def window_events(events, open_time):
+    """
+    只保留落在窗口 (升序的开盘时间 open_time) 内的事件，bar / confirm 换算为窗口内的位置
+    """
+    events = events[np.isin(events["time"], open_time)]
+    shift = events["bar"] - np.searchsorted(open_time, events["time"])
+    events["bar"] -= shift
+    events["confirm"] -= shift
+    return events
+
+
+def detect_from_frame(df, params=None):
+    """
+    直接接受 *_Cleaned 格式的 DataFrame
+    """
+    return detect_events(
+        df["High"].to_numpy(), df["Low"].to_numpy(), df["Close"].to_numpy(), df["Volume"].to_numpy(),
+        open_time=df["Open_time"].to_numpy() if "Open_time" in df else None, params=params,
+    )
+
+
+def to_frame(events):
+    import pandas as pd
+    return pd.DataFrame(events)
+
+
+# ================= 增量识别 (实时模式) =================
+# 与 detect_events 使用相同的特征定义与阈值，但每根收盘 K 线只做 O(1) 的更新:
+# 滚动最高/最低用单调队列，成交量/振幅统计用滑动和，摆动点在 pivot 根之后确认，
+# K 线保存在固定长度的环形缓冲区中。等待 AR 期间出现的后续高潮按顺序排队，
+# 与批量模式一样只有前一个高潮超时未出现 AR 时才轮到下一个，因此逐根输入完整历史得到的事件与 detect_events 一致。
+
+class RingBuffer:
+    """
+    固定长度的环形缓冲区，按全局 K 线序号读写
+    """
+    FIELDS = ("time", "high", "low", "close", "volume", "vol_mean", "vol_z", "spread_ratio", "close_pos")
+
+    def __init__(self, size):
+        self.size = size
+        self.count = 0
+        self.data = {name: np.zeros(size) for name in self.FIELDS}
+
+    def push(self, **values):
+        pos = self.count % self.size
+        for name, value in values.items():
+            self.data[name][pos] = value
+        self.count += 1
+        return self.count - 1
+
+    def get(self, name, i):
+        if i < self.count - self.size or i >= self.count:
+            raise IndexError(f"bar {i} 已移出缓冲区")
+        return self.data[name][i % self.size]
+
+    def window(self, name, start, stop):
+        return np.array([self.data[name][j % self.size] for j in range(max(start, 0, self.count - self.size), stop)])
+
+
+class _MonoQueue:
+    # 单调队列: 维护长度 w 滑动窗口的最大值 (sign=-1 时为最小值)
+    def __init__(self, w, sign=1):
+        from collections import deque
+        self.w, self.sign, self.q = w, sign, deque()
+
+    def push(self, i, v):
+        v = v * self.sign
+        while self.q and self.q[-1][1] <= v:
+            self.q.pop()
+        self.q.append((i, v))
+        while self.q[0][0] <= i - self.w:
+            self.q.popleft()
+        return self.q[0][1] * self.sign
+
+
+class _SlidingStats:
+    # 最近 w 个值的均值/标准差 (滑动和)，数值偏移同 rolling_mean_std
+    def __init__(self, w):
+        from collections import deque
+        self.w, self.q, self.s1, self.s2, self.base = w, deque(), 0.0, 0.0, None
+
+    def stats(self):
+        if not self.q:
+            return np.nan, np.nan
+        cnt = len(self.q)
+        mean = self.s1 / cnt
+        return mean + self.base, np.sqrt(max(self.s2 / cnt - mean * mean, 0.0))
+
+    def push(self, v):
+        if self.base is None:
+            self.base = v
+        x = v - self.base
+        self.q.append(x)
+        self.s1 += x
+        self.s2 += x * x
+        if len(self.q) > self.w:
+            old = self.q.popleft()
+            self.s1 -= old
+            self.s2 -= old * old
+
+
+class IncrementalDetector:
+    """
+    单个交易对的增量事件识别器。update() 每次接收一根已收盘 K 线，
+    返回本根 K 线引起的状态变化列表 (事件 / 区间边界变化)，没有变化时返回空列表。
+    """
+
+    def __init__(self, params=None, buffer_size=1000):
+        self.p = dict(DEFAULT_PARAMS, **(params or {}))
+        p = self.p
+        self.buf = RingBuffer(max(buffer_size, p["ar_max"] + p["lps_max"] + 4 * p["pivot"] + 2))
+        self.low_min = _MonoQueue(p["climax_lookback"], sign=-1)
+        self.high_max = _MonoQueue(p["climax_lookback"])
+        self.vol_stats = _SlidingStats(p["vol_window"])
+        self.spread_stats = _SlidingStats(p["vol_window"])
+        self.state = "idle"      # idle -> await_ar -> range -> idle
+        self.climaxes = []       # 等待 AR 的高潮队列 [(bar, is_bc), ...]
+        self.pivot_log = []      # 最近确认的摆动点 [(bar, 是否高点, 是否低点), ...]
+        self.range = None        # 当前/最近一个区间
+        self.pending_lps = None  # (突破 bar, 向上?, range)
+        self.range_count = 0
+
+    # ---------- 特征 ----------
+    def _push_bar(self, t, high, low, close, volume):
+        vol_mean, vol_std = self.vol_stats.stats()
+        spread_mean, _ = self.spread_stats.stats()
+        spread = high - low
+        vol_z = (volume - vol_mean) / vol_std if vol_std and vol_std > 0 else 0.0
+        spread_ratio = spread / spread_mean if spread_mean and spread_mean > 0 else 0.0
+        close_pos = (close - low) / spread if spread > 0 else 0.5
+        self.vol_stats.push(volume)
+        self.spread_stats.push(spread)
+
+        i = self.buf.push(time=t, high=high, low=low, close=close, volume=volume,
+                          vol_mean=vol_mean, vol_z=vol_z, spread_ratio=spread_ratio, close_pos=close_pos)
+        new_low = low <= self.low_min.push(i, low)
+        new_high = high >= self.high_max.push(i, high)
+        return i, new_low, new_high
+
+    def _pivot_at(self, i):
+        # 第 j = i - k 根是否为摆动高/低点 (与 pivots() 定义一致)
+        k = self.p["pivot"]
+        j = i - k
+        if j < 0:
+            return j, False, False
+        highs = self.buf.window("high", j - k, i + 1)
+        lows = self.buf.window("low", j - k, i + 1)
+        c = len(highs) - 1 - k
+        ph = highs[c] >= highs.max() and (c == 0 or highs[c] > highs[:c].max())
+        pl = lows[c] <= lows.min() and (c == 0 or lows[c] < lows[:c].min())
+        return j, ph, pl
+
+    # ---------- 输出 ----------
+    def _event(self, out, bar, confirm, name, price, conf, range_id=None):
+        if range_id is None:
+            range_id = self.range["range_id"] if self.range else -1
+        out.append({
+            "type": "event", "event": name, "bar": int(bar), "confirm": int(confirm),
+            "time": int(self.buf.get("time", bar)), "price": float(price),
+            "confidence": round(float(conf), 4), "range_id": range_id,
+        })
+
+    def _range_msg(self, out):
+        r = self.range
+        out.append({"type": "range", "range_id": r["range_id"], "kind": r["kind"], "top": float(r["top"]),
+                    "bottom": float(r["bottom"]), "active": r["end"] is None})
+
+    # ---------- 主流程 ----------
+    def update(self, t, high, low, close, volume):
+        p, k, buf = self.p, self.p["pivot"], self.buf
+        out = []
+        i, new_low, new_high = self._push_bar(t, high, low, close, volume)
+        j, ph, pl = self._pivot_at(i)
+        vz, sr = buf.get("vol_z", i), buf.get("spread_ratio", i)
+        climax = vz >= p["vol_z"] and sr >= p["spread_ratio"] and (new_low or new_high)
+
+        # 突破后的 LPS / LPSY
+        if self.pending_lps:
+            self._check_lps(out, j, i, ph, pl)
+
+        # 区间内的 ST (摆动点确认滞后 k 根，区间结束后仍可能确认)
+        r = self.range
+        if r and j >= r["start_scan"] and (r["end"] is None or j < r["end"]):
+            self._check_st(out, j, i, ph, pl)
+
+        if ph or pl:
+            self.pivot_log.append((j, ph, pl))
+            horizon = j - p["ar_max"] - k
+            while self.pivot_log and self.pivot_log[0][0] < horizon:
+                self.pivot_log.pop(0)
+
+        if self.state == "range":
+            self._scan_range_bar(out, i)
+        if self.state != "range" and climax:
+            # 同一根同时创新低与新高时，与批量模式一样先按 SC、再按 BC 排队
+            if new_low:
+                self.climaxes.append((i, False))
+            if new_high:
+                self.climaxes.append((i, True))
+            self.state = "await_ar"
+        if self.state == "await_ar":
+            self._seek_ar(out, i)
+        return out
+
+    def _seek_ar(self, out, i):
+        # 依次为队首高潮寻找 AR (已确认的第一个反向摆动点)，超时则换下一个高潮
+        p, k = self.p, self.p["pivot"]
+        while self.climaxes:
+            c, is_bc = self.climaxes[0]
+            ar = next((j for j, ph, pl in self.pivot_log if j > c and (pl if is_bc else ph)), None)
+            if ar is not None and ar <= c + p["ar_max"]:
+                rest, self.climaxes = self.climaxes[1:], []
+                if not self._open_range(out, c, is_bc, ar, i):
+                    self.climaxes = rest
+                    continue
+                if self.state == "idle":
+                    # 补扫时区间已经结束: 与批量模式一样从结束处之后的高潮继续
+                    self.climaxes = [x for x in rest if x[0] >= self.range["end"]]
+                    if self.climaxes:
+                        self.state = "await_ar"
+                        self._seek_ar(out, i)
+                return
+            if ar is not None or i >= c + p["ar_max"] + k:
+                self.climaxes.pop(0)
+                continue
+            return
+        self.state = "idle"
+
+    def _open_range(self, out, c, is_bc, ar, i):
+        buf, p = self.buf, self.p
+        top = buf.get("high", c) if is_bc else buf.get("high", ar)
+        bottom = buf.get("low", ar) if is_bc else buf.get("low", c)
+        height = top - bottom
+        if height <= 0:
+            return False
+        self.range = {"range_id": self.range_count, "kind": "distribution" if is_bc else "accumulation",
+                      "is_bc": is_bc, "climax": c, "top": top, "bottom": bottom, "start_scan": ar + 1,
+                      "end": None, "prev_spring": False, "prev_utad": False}
+        self.range_count += 1
+        self.state = "range"
+
+        vz, sr, cp = buf.get("vol_z", c), buf.get("spread_ratio", c), buf.get("close_pos", c)
+        climax_conf = 0.5 * _clip01(vz / 4) + 0.3 * _clip01(sr / 3) + 0.2 * _clip01(cp if not is_bc else 1 - cp)
+        self._event(out, c, c, "BC" if is_bc else "SC", top if is_bc else bottom, climax_conf)
+        spread_c = buf.get("high", c) - buf.get("low", c)
+        self._event(out, ar, i, "AR", bottom if is_bc else top, 0.5 + 0.5 * _clip01(height / (spread_c * 3 + 1e-12)))
+        self._range_msg(out)
+
+        # AR 确认滞后 k 根 (前面的高潮超时前还会更晚)，按逐根到达的顺序补扫 AR 之后的 K 线:
+        # 已确认的摆动点补查 ST，区间在补扫中结束时继续补查本区间的 LPS / LPSY
+        k = p["pivot"]
+        flags = {j: (ph, pl) for j, ph, pl in self.pivot_log}
+        lps = self.pending_lps
+        for b in range(ar + 1, i + 1):
+            j = b - k
+            ph, pl = flags.get(j, (False, False))
+            if self.pending_lps and self.pending_lps is not lps:
+                self._check_lps(out, j, b, ph, pl)
+            r = self.range
+            if j >= r["start_scan"] and (r["end"] is None or j < r["end"]):
+                self._check_st(out, j, b, ph, pl)
+            if self.state == "range":
+                self._scan_range_bar(out, b)
+        return True
+
+    def _scan_range_bar(self, out, b):
+        buf, p, r = self.buf, self.p, self.range
+        top, bottom = r["top"], r["bottom"]
+        close, high, low = buf.get("close", b), buf.get("high", b), buf.get("low", b)
+
+        if close > top * (1 + p["break_pct"]) or close < bottom * (1 - p["break_pct"]):
+            up = close > top
+            conf = 0.5 * _clip01(buf.get("vol_z", b) / 3) + 0.5 * _clip01(buf.get("spread_ratio", b) / 2)
+            self._event(out, b, b, "SOS" if up else "SOW", close, conf)
+            r["end"] = b
+            self._range_msg(out)
+            self.pending_lps = (b, up, r)
+            self.state = "idle"
+            return
+
+        spring = low < bottom and close > bottom
+        utad = high > top and close < top
+        cp = buf.get("close_pos", b)
+        if spring and not r["prev_spring"]:
+            self._event(out, b, b, "SPRING", low, 0.5 * _clip01(1 - buf.get("vol_z", b) / 3) + 0.5 * _clip01(cp))
+        if utad and not r["prev_utad"]:
+            self._event(out, b, b, "UTAD", high, 0.5 * _clip01(1 - buf.get("vol_z", b) / 3) + 0.5 * _clip01(1 - cp))
+        r["prev_spring"], r["prev_utad"] = spring, utad
+
+    def _check_lps(self, out, j, i, ph, pl):
+        buf, p = self.buf, self.p
+        e, up, r = self.pending_lps
+        if j > e + p["lps_max"]:
+            self.pending_lps = None
+        elif j > e and (pl if up else ph):
+            height = r["top"] - r["bottom"]
+            if up and buf.get("low", j) > r["bottom"] + 0.5 * height:
+                self._event(out, j, i, "LPS", buf.get("low", j), self._lps_conf(j), r["range_id"])
+            elif not up and buf.get("high", j) < r["top"] - 0.5 * height:
+                self._event(out, j, i, "LPSY", buf.get("high", j), self._lps_conf(j), r["range_id"])
+            self.pending_lps = None
+
+    def _check_st(self, out, j, i, ph, pl):
+        buf, r = self.buf, self.range
+        height = r["top"] - r["bottom"]
+        tol = self.p["st_tol"] * height
+        c_vol = buf.get("volume", r["climax"]) if r["climax"] >= buf.count - buf.size else np.inf
+        if r["is_bc"] and ph:
+            price, level = buf.get("high", j), r["top"]
+        elif not r["is_bc"] and pl:
+            price, level = buf.get("low", j), r["bottom"]
+        else:
+            return
+        vol = buf.get("volume", j)
+        if abs(price - level) <= tol and vol < c_vol:
+            conf = 0.5 * _clip01(1 - vol / c_vol) + 0.5 * _clip01(1 - abs(price - level) / (tol + 1e-12))
+            self._event(out, j, i, "ST", price, conf)
+
+    def _lps_conf(self, j):
+        return _clip01(1 - self.buf.get("volume", j) / (self.buf.get("vol_mean", j) * 2 + 1e-12)) * 0.5 + 0.5
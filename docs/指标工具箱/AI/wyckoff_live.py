@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+import kline_store
+import kline_cache
+import wyckoff_events
+
+# ================= 威科夫实时监控 =================
+# 订阅 Binance K 线 WebSocket，每根 K 线收盘时增量更新交易区间与事件 (wyckoff_events.IncrementalDetector)，
+# 只在状态发生变化 (新事件 / 区间开启或结束) 时输出一行 JSON。
+# 启动时用本地存储的最近若干根 K 线预热，之后每根 K 线的处理是 O(1) 的，延迟在毫秒以内。
+# 没有网络或未安装 websockets 时，可用 --replay 从本地存储回放做演示和测试。
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STREAM_URL = "wss://data-stream.binance.vision/stream?streams="
+DEFAULT_WARMUP = 1000
+
+
+class LiveMonitor:
+    """
+    管理多个 (symbol, interval) 的增量识别器，并统计处理延迟
+    """
+
+    def __init__(self, out_file=None, params=None):
+        self.detectors = {}
+        self.last_time = {}
+        self.out_file = out_file
+        self.params = params
+        self.bars = 0
+        self.emitted = 0
+        self.latencies = []
+
+    def warmup(self, symbol, interval, df):
+        det = wyckoff_events.IncrementalDetector(self.params)
+        for row in df[["Open_time", "High", "Low", "Close", "Volume"]].itertuples(index=False):
+            det.update(*row)
+        self.detectors[(symbol, interval)] = det
+        self.last_time[(symbol, interval)] = int(df["Open_time"].iloc[-1]) if len(df) else -1
+        return det
+
+    def on_bar(self, symbol, interval, t, high, low, close, volume, received=None):
+        """
+        处理一根已收盘 K 线，返回输出的消息列表
+        received: 收到该 K 线时的 perf_counter 时间 (用于统计从接收到输出的延迟)
+        """
+        key = (symbol, interval)
+        if t <= self.last_time.get(key, -1):
+            # 预热数据已包含这根 K 线 (或重连后的重复推送)
+            return []
+        det = self.detectors.get(key) or self.warmup(symbol, interval, _empty_frame())
+        start = received if received is not None else time.perf_counter()
+        messages = det.update(t, high, low, close, volume)
+        self.last_time[key] = t
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.bars += 1
+        self.latencies.append(latency_ms)
+
+        for msg in messages:
+            msg.update(symbol=symbol, interval=interval, latency_ms=round(latency_ms, 3))
+            self.emit(msg)
+        return messages
+
+    def emit(self, msg):
+        line = json.dumps(msg, ensure_ascii=False)
+        print(line, flush=True)
+        if self.out_file:
+            self.out_file.write(line + "\n")
+            self.out_file.flush()
+        self.emitted += 1
+
+    def summary(self):
+        if not self.latencies:
+            print("ℹ️ 没有处理任何 K 线")
+            return
+        avg = sum(self.latencies) / len(self.latencies)
+        print(f"📊 共处理 {self.bars} 根 K 线，输出 {self.emitted} 条状态变化，"
+              f"平均延迟 {avg:.3f} ms，最大 {max(self.latencies):.3f} ms", file=sys.stderr)
+
+
+def _empty_frame():
+    import pandas as pd
+    return pd.DataFrame(columns=["Open_time", "High", "Low", "Close", "Volume"])
+
+
+def load_warmup(data_dir, symbol, interval, bars):
+    path = kline_store.csv_path(data_dir, symbol, interval)
+    if not os.path.exists(path):
+        print(f"⚠️ 本地没有 {symbol} {interval} 数据，将从空状态开始 (可先运行 binance_data_pro.py)", file=sys.stderr)
+        return _empty_frame()
+    return kline_cache.load_klines(path, tail=bars)
+
+
+# ----------------- 数据源: 本地回放 -----------------
+def run_replay(monitor, pairs, data_dir, warmup, replay, speed=0.0):
+    """
+    用存储中最后 replay 根 K 线模拟实时推送，之前的 warmup 根用于预热
+    speed > 0 时每根 K 线之间等待 speed 秒
+    """
+    streams = []
+    for symbol, interval in pairs:
+        df = load_warmup(data_dir, symbol, interval, warmup + replay)
+        split = max(len(df) - replay, 0)
+        monitor.warmup(symbol, interval, df.iloc[:split])
+        streams.append((symbol, interval, df.iloc[split:]))
+        print(f"🔁 {symbol} {interval}: 预热 {split} 根，回放 {len(df) - split} 根", file=sys.stderr)
+
+    # 按 Open_time 交错回放，模拟多个交易对同时推送
+    queue = []
+    for symbol, interval, df in streams:
+        for row in df[["Open_time", "High", "Low", "Close", "Volume"]].itertuples(index=False):
+            queue.append((int(row[0]), symbol, interval, row))
+    queue.sort(key=lambda x: x[0])
+
+    for _, symbol, interval, row in queue:
+        monitor.on_bar(symbol, interval, int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]),
+                       received=time.perf_counter())
+        if speed > 0:
+            time.sleep(speed)
+
+
+# ----------------- 数据源: Binance WebSocket -----------------
+def stream_url(pairs):
+    return STREAM_URL + "/".join(f"{symbol.lower()}@kline_{interval}" for symbol, interval in pairs)
+
+
+async def _consume(monitor, pairs, max_bars=None):
+    import websockets
+
+    url = stream_url(pairs)
+    backoff = 1
+    while True:
+        try:
+            async with websockets.connect(url, ping_interval=20) as ws:
+                print(f"🔌 已连接: {url}", file=sys.stderr)
+                backoff = 1
+                async for raw in ws:
+                    received = time.perf_counter()
+                    k = json.loads(raw).get("data", {}).get("k")
+                    # 只处理已收盘的 K 线 (x = true)，未收盘的中间推送直接忽略
+                    if not k or not k.get("x"):
+                        continue
+                    monitor.on_bar(k["s"], k["i"], int(k["t"]), float(k["h"]), float(k["l"]), float(k["c"]),
+                                   float(k["v"]), received=received)
+                    if max_bars and monitor.bars >= max_bars:
+                        return
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            print(f"⚠️ 连接断开: {e}，{backoff} 秒后重连...", file=sys.stderr)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
+def run_websocket(monitor, pairs, data_dir, warmup, max_bars=None):
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        print("❌ 实时模式需要 websockets 库: pip install websockets (或使用 --replay 回放本地数据)")
+        sys.exit(1)
+
+    for symbol, interval in pairs:
+        df = load_warmup(data_dir, symbol, interval, warmup)
+        monitor.warmup(symbol, interval, df)
+        print(f"🔥 {symbol} {interval}: 预热 {len(df)} 根", file=sys.stderr)
+    asyncio.run(_consume(monitor, pairs, max_bars))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='威科夫实时事件监控 (Binance K 线 WebSocket)')
+    parser.add_argument('pairs', nargs='*', default=['ADAUSDC:4h'], help='交易对:周期，如 ADAUSDC:4h BTCUSDT:1m (默认 ADAUSDC:4h)')
+    parser.add_argument('--data-dir', default=HERE, help='本地 K 线存储目录 (用于预热/回放)')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help=f'预热使用的历史 K 线根数 (默认 {DEFAULT_WARMUP})')
+    parser.add_argument('--replay', type=int, default=0, help='不连接网络，回放本地存储最后 N 根 K 线')
+    parser.add_argument('--speed', type=float, default=0.0, help='回放时每根 K 线的间隔秒数 (默认 0 尽快回放)')
+    parser.add_argument('--max-bars', type=int, default=None, help='实时模式下处理 N 根收盘 K 线后退出')
+    parser.add_argument('--out', default=None, help='同时将状态变化追加写入该 JSON Lines 文件')
+    args = parser.parse_args()
+
+    pairs = []
+    for item in args.pairs:
+        symbol, _, intervals = item.partition(":")
+        for interval in (intervals or "4h").split(","):
+            pairs.append((symbol.upper(), interval.lower()))
+
+    out_file = open(args.out, "a", encoding="utf-8") if args.out else None
+    monitor = LiveMonitor(out_file)
+    try:
+        if args.replay > 0:
+            run_replay(monitor, pairs, args.data_dir, args.warmup, args.replay, args.speed)
+        else:
+            run_websocket(monitor, pairs, args.data_dir, args.warmup, args.max_bars)
+    except KeyboardInterrupt:
+        print("\n🛑 已停止", file=sys.stderr)
+    finally:
+        monitor.summary()
+        if out_file:
+            out_file.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import pandas as pd
+
+import kline_cache
+import pipeline_metrics
+
+# ================= 报告生成阶段 =================
+# 绘图 (wyckoff_plot.py) 与 AI 分析 (ai_analyze.py) 不再直接拼写 Markdown，而是各自更新一份结构化的分析结果
+# output/{交易对}_Wyckoff_Result.json (TR 上下沿、事件、当前价格、可选的 AI 文本)，
+# 再由本模块按模板渲染 {交易对}_Wyckoff_Analysis.md 与汇总页 output/README.md。
+# 只有内容真正变化的文件才会写入，刷新报告只需毫秒级，VuePress 也只会重新构建变化的页面。
+#
+# 用法:
+#   python wyckoff_report.py                      # 按 output/ 下全部分析结果重新渲染报告与汇总页
+#   python wyckoff_report.py watchlist.txt        # 只渲染 watchlist 中的交易对 (汇总页仍包含全部报告)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.join(HERE, "output")
+INDEX_NAME = "README.md"
+# 分析结果格式变化时递增，旧结果中的 AI 文本随之失效
+RESULT_VERSION = 1
+EVENT_ROWS = 10
+
+REPORT_TEMPLATE = """# 威科夫深度研报: {title}
+
+**分析日期**: {generated}
+**数据范围**: {start_date} -> {end}
+
+---
+
+## 1. 威科夫全景透视图 (Master View)
+
+![Wyckoff Chart](./{chart})
+
+---
+
+## 2. 核心量价数据
+
+| 指标 | 数值 | 威科夫含义 |
+| :--- | :--- | :--- |
+| **TR 上沿 (Resistance)** | **{tr_top:.4f}** | 供应释放区 (AR/LPSY) |
+| **TR 下沿 (Support)** | **{tr_bottom:.4f}** | 需求介入区 (SC/Spring) |
+| **当前价格 (Closing)** | **{close:.4f}** | {state} |
+
+---
+
+## 3. 结构化简述
+
+1. **结构形态**: 价格目前处于由 {tr_bottom:.4f} 与 {tr_top:.4f} 构成的交易区间 (Trading Range) 内。
+2. **量价特征**: 识别到关键的 {low_label}。
+3. **主点位参考**:
+   - **防御位**: {tr_bottom:.4f} (若持续放量跌破，标志着派发完成)。
+   - **进攻位**: {tr_top:.4f} (若缩量回踩不破，标志着吸筹完成)。
+
+---
+
+## 4. 事件识别 (Event Detection)
+
+| 时间 | 事件 | 价格 | 置信度 |
+| :--- | :--- | :--- | :--- |
+{event_rows}
+
+---
+> *本报告由智能分析系统生成。威科夫法则提示：在结果显现之前，请耐心等待供求平衡的打破。*
+"""
+
+# AI 只生成文本: 没有引用图表时在前面补上标题与图片
+AI_HEADER_TEMPLATE = """# 威科夫深度分析报告: {pair}
+
+![{pair} Chart](./{chart})
+
+"""
+
+INDEX_TEMPLATE = """# 威科夫分析报告汇总
+
+**交易对数量**: {count}
+**最近更新**: {updated}
+
+| 交易对 | 周期 | 当前价格 | TR 下沿 | TR 上沿 | 状态 | 最近事件 | AI 分析 | 更新日期 |
+| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |
+{rows}
+"""
+
+
+# ----------------- 分析结果 -----------------
+def result_path(output_dir, base_name):
+    return os.path.join(output_dir, f"{base_name}_Wyckoff_Result.json")
+
+
+def report_path(output_dir, base_name):
+    return os.path.join(output_dir, f"{base_name}_Wyckoff_Analysis.md")
+
+
+def chart_name(base_name):
+    return f"{base_name}_Wyckoff_Chart.png"
+
+
+def build_result(structure, base_name, chart_file=None):
+    """
+    wyckoff_plot.analyze_structure 的结果 -> 可序列化的分析结果 (事件取完整历史中最近的几个，开盘时间换算为 UTC+8)
+    """
+    plot_df = structure["plot_df"]
+    index = plot_df.index
+    events = [
+        {"time": (pd.Timestamp(int(ev["time"]), unit="ms") + kline_cache.HUMAN_TIME_OFFSET).strftime("%Y-%m-%d %H:%M"),
+         "event": str(ev["event"]), "price": float(ev["price"]), "confidence": float(ev["confidence"])}
+        for ev in structure["recent_events"]
+    ]
+    return {
+        "version": RESULT_VERSION,
+        "pair": base_name,
+        "generated": pd.Timestamp.now().strftime("%Y-%m-%d"),
+        "chart": os.path.basename(chart_file) if chart_file else chart_name(base_name),
+        "start": index[0].strftime("%Y-%m-%d %H:%M"),
+        "end": index[-1].strftime("%Y-%m-%d %H:%M"),
+        "tr_top": float(structure["tr_top"]),
+        "tr_bottom": float(structure["tr_bottom"]),
+        "sc_time": pd.Timestamp(structure["min_idx"]).strftime("%Y-%m-%d %H:%M"),
+        "has_sc": structure["min_idx"] in index,
+        "close": float(plot_df["Close"].iloc[-1]),
+        "events": events,
+    }
+
+
+def load_result(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return result if result.get("version") == RESULT_VERSION else None
+
+
+def _comparable(result):
+    # 生成日期与 AI 文本不属于行情结构本身
+    return {k: v for k, v in result.items() if k not in ("generated", "ai")}
+
+
+def write_if_changed(path, text):
+    """
+    内容与现有文件相同时不写入 (保留修改时间，VuePress 不会重新构建)，返回是否写入
+    """
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return True
+
+
+def save_result(result, output_dir):
+    """
+    写入分析结果。行情结构未变化时保留原有的生成日期与 AI 文本；
+    结构变化时旧的 AI 文本已过期，报告回到模板版本，等待新的 AI 分析。返回实际保存的结果
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = result_path(output_dir, result["pair"])
+    old = load_result(path)
+    if old is not None and _comparable(old) == _comparable(result):
+        result = dict(result, generated=old["generated"])
+        if "ai" in old:
+            result["ai"] = old["ai"]
+    write_if_changed(path, json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+def attach_ai(base_name, text, output_dir=OUTPUT_DIR, model=None):
+    """
+    把 AI 分析文本写入分析结果并重新渲染该交易对的报告，返回报告路径。
+    没有绘图结果时 (单独运行 ai_analyze.py) 只保存 AI 文本
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    result = load_result(result_path(output_dir, base_name)) or {
+        "version": RESULT_VERSION, "pair": base_name, "chart": chart_name(base_name),
+    }
+    result["ai"] = {"text": text, "model": model, "date": pd.Timestamp.now().strftime("%Y-%m-%d")}
+    write_if_changed(result_path(output_dir, base_name), json.dumps(result, ensure_ascii=False, indent=2))
+    path, _ = render_pair(result, output_dir)
+    return path
+
+
+# ----------------- 渲染 -----------------
+def price_state(result):
+    if "tr_top" not in result:
+        return "-"
+    return "区间震荡中" if result["tr_bottom"] <= result["close"] <= result["tr_top"] else "寻求趋势突破"
+
+
+def render_report(result):
+    """
+    分析结果 -> 报告 Markdown。有 AI 文本时使用 AI 报告，否则使用结构化模板
+    """
+    ai = result.get("ai")
+    if ai:
+        text = ai["text"]
+        if result["chart"] not in text:
+            text = AI_HEADER_TEMPLATE.format(pair=result["pair"], chart=result["chart"]) + text
+        return text
+
+    event_rows = "\n".join(
+        f"| {ev['time']} | {ev['event']} | {ev['price']:.4f} | {ev['confidence']:.2f} |"
+        for ev in result["events"][-EVENT_ROWS:]
+    ) or "| - | 未识别到事件 | - | - |"
+    return REPORT_TEMPLATE.format(
+        title=result["pair"].replace("_", " "),
+        start_date=result["start"][:10],
+        state=price_state(result),
+        low_label="恐慌抛售 (SC)" if result["has_sc"] else "震荡低点",
+        event_rows=event_rows,
+        **{k: result[k] for k in ("generated", "end", "chart", "tr_top", "tr_bottom", "close")},
+    )
+
+
+def render_pair(result, output_dir):
+    """
+    渲染单个交易对的报告，返回 (路径, 是否写入)
+    """
+    path = report_path(output_dir, result["pair"])
+    return path, write_if_changed(path, render_report(result))
+
+
+def _split_pair(base_name):
+    symbol, _, interval = base_name.rpartition("_")
+    return (symbol, interval) if symbol else (base_name, "-")
+
+
+def render_index(output_dir, order=None):
+    """
+    汇总页: output 目录下全部报告 (包括手写 / 没有分析结果的报告)，watchlist 中的交易对排在前面
+    """
+    suffix = "_Wyckoff_Analysis.md"
+    names = sorted(f[:-len(suffix)] for f in os.listdir(output_dir) if f.endswith(suffix))
+    if order:
+        rank = {name: i for i, name in enumerate(order)}
+        names.sort(key=lambda name: (rank.get(name, len(rank)), name))
+
+    rows, dates = [], []
+    for name in names:
+        symbol, interval = _split_pair(name)
+        result = load_result(result_path(output_dir, name)) or {}
+        link = f"[{symbol}](./{name}{suffix})"
+        if "tr_top" in result:
+            last = result["events"][-1] if result["events"] else None
+            cells = [f"{result['close']:.4f}", f"{result['tr_bottom']:.4f}", f"{result['tr_top']:.4f}", price_state(result),
+                     f"{last['event']} ({last['time']})" if last else "-"]
+        else:
+            cells = ["-"] * 5
+        ai = result.get("ai")
+        date = (ai or {}).get("date") or result.get("generated") or "-"
+        if date != "-":
+            dates.append(date)
+        rows.append("| " + " | ".join([link, interval] + cells + ["✅" if ai else "-", date]) + " |")
+
+    text = INDEX_TEMPLATE.format(count=len(names), updated=max(dates) if dates else "-", rows="\n".join(rows))
+    path = os.path.join(output_dir, INDEX_NAME)
+    return path, write_if_changed(path, text)
+
+
+def render_all(output_dir=OUTPUT_DIR, pairs=None, index=True):
+    """
+    一次渲染多个交易对: pairs 为 [(symbol, interval), ...]，None 表示 output 目录下全部分析结果。
+    返回 {"written": [...], "unchanged": 数量, "missing": [...], "index": 汇总页是否写入}
+    """
+    suffix = "_Wyckoff_Result.json"
+    if pairs is None:
+        names = sorted(f[:-len(suffix)] for f in os.listdir(output_dir) if f.endswith(suffix))
+    else:
+        names = [f"{symbol}_{interval}" for symbol, interval in pairs]
+
+    summary = {"written": [], "unchanged": 0, "missing": [], "index": False}
+    with pipeline_metrics.stage("report", pairs=len(names)):
+        for name in names:
+            result = load_result(result_path(output_dir, name))
+            if result is None:
+                summary["missing"].append(name)
+                continue
+            path, written = render_pair(result, output_dir)
+            if written:
+                summary["written"].append(path)
+            else:
+                summary["unchanged"] += 1
+        if index:
+            _, summary["index"] = render_index(output_dir, names if pairs is not None else None)
+        pipeline_metrics.count("reports_written", len(summary["written"]))
+        pipeline_metrics.count("reports_unchanged", summary["unchanged"])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按分析结果批量渲染威科夫报告与汇总页 (只写入内容变化的文件)')
+    parser.add_argument('watchlist', nargs='?', default=None, help='只渲染 watchlist 中的交易对 (默认 output 目录下全部)')
+    parser.add_argument('--pairs', nargs='*', default=[], help='额外的交易对，如 ADAUSDC:4h BTCUSDT:1h,1d')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='报告目录 (默认 output/)')
+    parser.add_argument('--no-index', action='store_true', help='不更新汇总页')
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure_from_args("wyckoff_report", args)
+
+    if not os.path.isdir(args.output_dir):
+        print(f"❌ 找不到报告目录: {args.output_dir}")
+        sys.exit(1)
+    pairs = None
+    if args.watchlist or args.pairs:
+        import watchlist
+        pairs = watchlist.parse_watchlist(args.watchlist, args.pairs)
+
+    t0 = time.perf_counter()
+    summary = render_all(args.output_dir, pairs, index=not args.no_index)
+    for path in summary["written"]:
+        print(f"📝 报告已更新: {path}")
+    for name in summary["missing"]:
+        print(f"⚠️ {name} 没有分析结果，请先运行 wyckoff_plot.py 或 wyckoff_batch.py")
+    if summary["index"]:
+        print(f"📚 汇总页已更新: {os.path.join(args.output_dir, INDEX_NAME)}")
+    print(f"✅ 报告渲染完成: {len(summary['written'])} 个更新，{summary['unchanged']} 个未变化，"
+          f"耗时 {(time.perf_counter() - t0) * 1000:.1f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
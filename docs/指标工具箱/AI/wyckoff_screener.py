@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# wyckoff_plot.py 位于 output/ 目录下
+sys.path.insert(0, os.path.join(HERE, "output"))
+
+import kline_bars
+import kline_quality
+import pipeline_metrics
+import redk_everex
+import watchlist
+import wyckoff_events
+import wyckoff_plot
+
+# ================= 威科夫横截面筛选器 =================
+# 一次读取本地存储中所有交易对最近的窗口 (二进制缓存有效时只切片 memmap 尾部)，
+# 右对齐堆叠成 (交易对 × K 线) 的二维数组，TR 上下沿、距支撑/阻力的距离、成交量异常都按行一次性向量化计算。
+# TR 的定义与 wyckoff_plot.analyze_structure 完全一致 (窗口内最低点为 SC/TR 下沿，其后最高点为 AR/TR 上沿，
+# SC 为最后一根时上沿取 窗口最高 × 0.98)，因此排名靠前的交易对与其图表上看到的区间相同。
+# 事件识别 (wyckoff_events) 与 EVEREX (redk_everex) 是逐根推进的状态/递推计算，仍按交易对逐行调用:
+# EVEREX 只用窗口 + 预热的几百根 K 线；事件与图表一样在完整存储上识别 (线性时间)，只取窗口内的事件。
+#
+# 排名得分 (0 ~ 100，SCORE_WEIGHTS 可调):
+#   support  收盘价越靠近 TR 下沿越高 (区间位置 0 = 下沿，1 = 上沿)
+#   range    收盘价仍在 TR 内
+#   volume   最近 K 线成交量相对窗口的 z-score (0 ~ 3 线性映射)
+#   events   最近 RECENT_BARS 根内出现需求类事件 (SC/ST/Spring/SOS/LPS) 加分，供应类事件 (BC/UTAD/SOW/LPSY) 减分
+#   everex   EVEREX 平滑 RROF > 0 (买方主导)
+# 结果写出 CSV / JSON / Markdown 排名表，并把前 N 名写成 watchlist 格式的候选清单，
+# 只对这些交易对运行 wyckoff_batch.py (绘图 + Gemini 分析)。
+
+DEFAULT_OUT_PREFIX = "wyckoff_screener"
+DEFAULT_SHORTLIST = "wyckoff_shortlist.txt"
+DEFAULT_SHORTLIST_SIZE = 10
+DEFAULT_NEAR = 0.2          # 区间位置低于该值视为靠近支撑，高于 1 - 该值视为靠近阻力
+DEFAULT_RECENT_VOLUME = 3   # 成交量异常取最近 N 根的均值
+RECENT_BARS = 50            # 事件只统计最近 N 根
+MIN_BARS = 50               # 数据少于该根数的交易对不参与筛选
+FALLBACK = 0.98             # 与 wyckoff_plot 一致: 无 AR 时上沿 = 窗口最高 × 0.98
+
+DEMAND_EVENTS = ("SC", "ST", "SPRING", "SOS", "LPS")
+SUPPLY_EVENTS = ("BC", "UTAD", "SOW", "LPSY")
+
+SCORE_WEIGHTS = {"support": 40, "range": 15, "volume": 15, "events": 20, "everex": 10}
+
+COLUMNS = ["rank", "pair", "symbol", "interval", "score", "phase", "close", "tr_top", "tr_bottom",
+           "position", "dist_support", "dist_resistance", "range_pct", "bars_since_sc", "vol_z", "rel_volume",
+           "last_event", "event_bars_ago", "demand_events", "supply_events", "rrof", "everex_alert", "bars"]
+
+
+# ----------------- 读取 -----------------
+def discover(data_dir, intervals=None):
+    """
+    数据目录下的全部 {SYMBOL}_{INTERVAL}_Cleaned.csv，返回 [(symbol, interval, 路径), ...]
+    """
+    stores = []
+    for name in sorted(os.listdir(data_dir)):
+        parsed = kline_quality.parse_store_name(os.path.join(data_dir, name))
+        if parsed is None:
+            continue
+        _, symbol, interval = parsed
+        if not intervals or interval in intervals:
+            stores.append((symbol, interval, os.path.join(data_dir, name)))
+    return stores
+
+
+def load_panel(paths, window, lookback):
+    """
+    读取每个交易对最后 window + lookback 根，右对齐堆叠为二维数组 (不足的部分在左侧以 NaN 填充)。
+    返回 ({列名: 二维数组}, 每行的有效根数)
+    """
+    n = window + lookback
+    panel = {name: np.full((len(paths), n), np.nan) for name in kline_bars.DEFAULT_COLUMNS}
+    panel["Open_time"] = np.zeros((len(paths), n), dtype=np.int64)
+    rows = np.zeros(len(paths), dtype=np.int64)
+    for i, path in enumerate(paths):
+        bars = kline_bars.load_bars(path, tail=window, lookback=lookback)
+        m = len(bars)
+        rows[i] = m
+        if not m:
+            continue
+        panel["Open_time"][i, n - m:] = bars.open_time()
+        for name in kline_bars.DEFAULT_COLUMNS:
+            panel[name][i, n - m:] = bars.values(name)
+    return panel, rows
+
+
+# ----------------- 二维计算 -----------------
+def tr_levels(high, low, fallback=FALLBACK):
+    """
+    每行窗口内的 TR (与 analyze_structure 相同的启发式)，返回 dict，各项为一维数组
+    """
+    rows, cols = np.indices(low.shape)
+    valid = ~np.isnan(low)
+    # 最低价第一次出现的位置 (idxmin)，NaN 填充的列不参与
+    sc_idx = np.argmin(np.where(valid, low, np.inf), axis=1)
+    r = np.arange(len(low))
+    sc_price = low[r, sc_idx]
+    bc_price = np.max(np.where(valid, high, -np.inf), axis=1)
+    after = (cols > sc_idx[:, None]) & valid
+    masked = np.where(after, high, -np.inf)
+    ar_idx = np.argmax(masked, axis=1)
+    has_ar = after.any(axis=1)
+    tr_top = np.where(has_ar, high[r, ar_idx], bc_price * fallback)
+    return {"sc_idx": sc_idx, "tr_bottom": sc_price, "tr_top": tr_top, "ar_idx": ar_idx, "has_ar": has_ar}
+
+
+def volume_anomaly(volume, recent=DEFAULT_RECENT_VOLUME):
+    """
+    最近 recent 根平均成交量相对窗口其余部分的 z-score 与倍数
+    """
+    base = volume[:, :-recent]
+    mean = np.nanmean(base, axis=1)
+    std = np.nanstd(base, axis=1)
+    last = np.nanmean(volume[:, -recent:], axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = np.where(std > 0, (last - mean) / std, 0.0)
+        rel = np.where(mean > 0, last / mean, np.nan)
+    return z, rel
+
+
+def classify(close, tr_top, tr_bottom, near=DEFAULT_NEAR):
+    """
+    返回 (区间位置, 阶段标签数组)
+    """
+    height = tr_top - tr_bottom
+    with np.errstate(invalid="ignore", divide="ignore"):
+        position = np.where(height > 0, (close - tr_bottom) / height, 0.5)
+    phase = np.select(
+        [close > tr_top, position <= near, position >= 1 - near],
+        ["breakout", "near_support", "near_resistance"],
+        "in_range",
+    )
+    return position, phase
+
+
+def score(position, in_range, vol_z, demand, supply, rrof, weights=SCORE_WEIGHTS):
+    w = weights
+    with np.errstate(invalid="ignore"):
+        total = (w["support"] * (1 - np.clip(position, 0, 1))
+                 + w["range"] * in_range
+                 + w["volume"] * np.clip(np.nan_to_num(vol_z), 0, 3) / 3
+                 + w["events"] * ((demand > 0).astype(float) - (supply > 0))
+                 + w["everex"] * (rrof > 0))
+    return np.clip(total, 0, 100)
+
+
+# ----------------- 逐行计算 (状态机 / 递推) -----------------
+def row_signals(panel, rows, window, paths):
+    """
+    每个交易对的事件与 EVEREX 状态，返回 {列名: 一维数组}
+    """
+    count = len(rows)
+    width = panel["Close"].shape[1]
+    out = {
+        "last_event": np.full(count, "", dtype=object), "event_bars_ago": np.full(count, -1),
+        "demand_events": np.zeros(count, dtype=np.int64), "supply_events": np.zeros(count, dtype=np.int64),
+        "rrof": np.full(count, np.nan), "everex_alert": np.full(count, "", dtype=object),
+    }
+    for i, m in enumerate(rows):
+        if not m:
+            continue
+        cols = slice(width - m, width)
+        o, h, l, c, v = (panel[name][i, cols] for name in kline_bars.DEFAULT_COLUMNS)
+        # 事件与图表一样在完整存储上识别 (状态机的起点不随窗口移动)，只保留窗口内的事件
+        k = min(m, window)
+        events, _ = wyckoff_events.detect_file(paths[i])
+        events = wyckoff_events.window_events(events, panel["Open_time"][i, cols][-k:])
+        if len(events):
+            out["last_event"][i] = str(events["event"][-1])
+            out["event_bars_ago"][i] = k - 1 - int(events["bar"][-1])
+        recent = events[events["bar"] >= k - RECENT_BARS]
+        out["demand_events"][i] = int(np.isin(recent["event"], DEMAND_EVENTS).sum())
+        out["supply_events"][i] = int(np.isin(recent["event"], SUPPLY_EVENTS).sum())
+
+        everex = redk_everex.compute(o, h, l, c, v)
+        out["rrof"][i] = everex["rrof_s"][-1]
+        up = np.flatnonzero(everex["alert_up"][-RECENT_BARS:])
+        dn = np.flatnonzero(everex["alert_dn"][-RECENT_BARS:])
+        if len(up) or len(dn):
+            out["everex_alert"][i] = "up" if (up.max() if len(up) else -1) > (dn.max() if len(dn) else -1) else "down"
+    return out
+
+
+def screen(stores, window=wyckoff_plot.WINDOW, near=DEFAULT_NEAR, recent_volume=DEFAULT_RECENT_VOLUME):
+    """
+    stores: [(symbol, interval, 路径), ...]，返回按得分排序的 DataFrame (COLUMNS)
+    """
+    lookback = redk_everex.warmup_bars()
+    with pipeline_metrics.stage("load"):
+        panel, rows = load_panel([s[2] for s in stores], window, lookback)
+        pipeline_metrics.count("pairs", len(stores))
+        pipeline_metrics.count("rows_loaded", int(rows.sum()))
+
+    keep = rows >= MIN_BARS
+    for (symbol, interval, _), m in zip(stores, rows):
+        if m < MIN_BARS:
+            print(f"⚠️ 跳过 {symbol} {interval}: 只有 {m} 根 K 线")
+    stores = [s for s, k in zip(stores, keep) if k]
+    panel = {name: arr[keep] for name, arr in panel.items()}
+    rows = rows[keep]
+    if not stores:
+        return pd.DataFrame(columns=COLUMNS)
+
+    with pipeline_metrics.stage("screen"):
+        # 图表窗口: 最后 window 根 (与 analyze_structure 的 df.tail(WINDOW) 相同)
+        high, low = panel["High"][:, -window:], panel["Low"][:, -window:]
+        close = panel["Close"][:, -1]
+        tr = tr_levels(high, low)
+        vol_z, rel_volume = volume_anomaly(panel["Volume"][:, -window:], recent_volume)
+        position, phase = classify(close, tr["tr_top"], tr["tr_bottom"], near)
+        in_range = (close >= tr["tr_bottom"]) & (close <= tr["tr_top"])
+        signals = row_signals(panel, rows, window, [s[2] for s in stores])
+        total = score(position, in_range, vol_z, signals["demand_events"], signals["supply_events"], signals["rrof"])
+
+    df = pd.DataFrame({
+        "pair": [f"{s}_{i}" for s, i, _ in stores],
+        "symbol": [s for s, _, _ in stores],
+        "interval": [i for _, i, _ in stores],
+        "score": np.round(total, 2),
+        "phase": phase,
+        "close": close,
+        "tr_top": tr["tr_top"],
+        "tr_bottom": tr["tr_bottom"],
+        "position": np.round(position, 4),
+        "dist_support": np.round((close - tr["tr_bottom"]) / close, 6),
+        "dist_resistance": np.round((tr["tr_top"] - close) / close, 6),
+        "range_pct": np.round((tr["tr_top"] - tr["tr_bottom"]) / close, 6),
+        "bars_since_sc": window - 1 - tr["sc_idx"],
+        "vol_z": np.round(vol_z, 3),
+        "rel_volume": np.round(rel_volume, 3),
+        "rrof": np.round(signals["rrof"], 2),
+        "bars": rows,
+    })
+    for key in ("last_event", "event_bars_ago", "demand_events", "supply_events", "everex_alert"):
+        df[key] = signals[key]
+    df = df.sort_values(["score", "dist_support"], ascending=[False, True], kind="stable").reset_index(drop=True)
+    df.insert(0, "rank", np.arange(1, len(df) + 1))
+    return df[COLUMNS]
+
+
+# ----------------- 输出 -----------------
+def to_markdown(df, top=None):
+    shown = df.head(top) if top else df
+    header = ["#", "交易对", "得分", "阶段", "收盘", "TR 下沿", "TR 上沿", "区间位置", "距支撑", "量 z", "最近事件", "RROF"]
+    lines = ["| " + " | ".join(header) + " |", "| " + " | ".join([":---"] * len(header)) + " |"]
+    for r in shown.itertuples():
+        event = f"{r.last_event} ({r.event_bars_ago} 根前)" if r.last_event else "-"
+        lines.append(f"| {r.rank} | {r.pair} | {r.score:.1f} | {r.phase} | {r.close:g} | {r.tr_bottom:g} | {r.tr_top:g} | "
+                     f"{r.position:.2f} | {r.dist_support:.2%} | {r.vol_z:.2f} | {event} | {r.rrof:.1f} |")
+    return "\n".join(lines)
+
+
+def write_outputs(df, out_dir, prefix=DEFAULT_OUT_PREFIX, formats=("csv", "json", "md")):
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    if "csv" in formats:
+        path = os.path.join(out_dir, prefix + ".csv")
+        df.to_csv(path, index=False)
+        written.append(path)
+    if "json" in formats:
+        path = os.path.join(out_dir, prefix + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(json.loads(df.to_json(orient="records")), f, ensure_ascii=False, indent=2)
+        written.append(path)
+    if "md" in formats:
+        path = os.path.join(out_dir, prefix + ".md")
+        stamp = pd.Timestamp.now().strftime("%Y-%m-%d %H:%M")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# 威科夫筛选排名\n\n**生成时间**: {stamp}  \n**交易对数量**: {len(df)}\n\n{to_markdown(df)}\n")
+        written.append(path)
+    return written
+
+
+def write_shortlist(df, path, size=DEFAULT_SHORTLIST_SIZE):
+    """
+    前 size 名写成 wyckoff_batch 可直接读取的 watchlist (SYMBOL:周期)
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# wyckoff_screener.py 生成的候选清单 (按得分排序)\n")
+        for r in df.head(size).itertuples():
+            f.write(f"{r.symbol}:{r.interval}  # {r.score:.1f} {r.phase}\n")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='威科夫横截面筛选: 按阶段 / 距支撑距离 / 量能 / 事件为全部交易对排名')
+    parser.add_argument('csv_paths', nargs='*', help='*_Cleaned.csv 路径 (默认数据目录下全部)')
+    parser.add_argument('--data-dir', default=HERE, help='K 线存储目录 (默认本目录)')
+    parser.add_argument('--intervals', nargs='*', default=None, help='只筛选这些周期，如 4h 1d')
+    parser.add_argument('--watchlist', default=None, help='只筛选 watchlist 中的交易对')
+    parser.add_argument('--window', type=int, default=wyckoff_plot.WINDOW, help=f'TR 窗口根数 (默认 {wyckoff_plot.WINDOW}，与图表一致)')
+    parser.add_argument('--near', type=float, default=DEFAULT_NEAR, help=f'区间位置低于该值视为靠近支撑 (默认 {DEFAULT_NEAR})')
+    parser.add_argument('--top', type=int, default=20, help='终端显示前 N 名 (默认 20)')
+    parser.add_argument('--out-dir', default=HERE, help='排名表输出目录 (默认本目录)')
+    parser.add_argument('--formats', nargs='*', choices=("csv", "json", "md"), default=["csv", "json", "md"], help='输出格式')
+    parser.add_argument('--shortlist', type=int, default=DEFAULT_SHORTLIST_SIZE, help=f'候选清单大小 (默认 {DEFAULT_SHORTLIST_SIZE}，0 为不写)')
+    parser.add_argument('--shortlist-file', default=None, help=f'候选清单路径 (默认 <输出目录>/{DEFAULT_SHORTLIST})')
+    pipeline_metrics.add_arguments(parser)
+    args = parser.parse_args()
+    pipeline_metrics.configure_from_args("wyckoff_screener", args)
+
+    if args.csv_paths:
+        stores = []
+        for path in args.csv_paths:
+            parsed = kline_quality.parse_store_name(path)
+            if parsed is None or not os.path.exists(path):
+                print(f"❌ 无法识别的存储文件: {path}")
+                sys.exit(1)
+            stores.append((parsed[1], parsed[2], path))
+    else:
+        stores = discover(args.data_dir, args.intervals)
+    if args.watchlist:
+        wanted = set(watchlist.parse_watchlist(args.watchlist))
+        stores = [s for s in stores if (s[0], s[1]) in wanted]
+    if not stores:
+        print("❌ 没有可筛选的数据")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    print(f"🔎 筛选 {len(stores)} 个交易对 (窗口 {args.window} 根)...")
+    df = screen(stores, window=args.window, near=args.near)
+    elapsed = time.perf_counter() - t0
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(df.head(args.top)[["rank", "pair", "score", "phase", "close", "tr_bottom", "tr_top", "position",
+                                 "vol_z", "last_event", "rrof"]].to_string(index=False))
+    print(f"\n✅ 筛选完成: {len(df)} 个交易对，耗时 {elapsed:.2f} 秒")
+
+    with pipeline_metrics.stage("write"):
+        for path in write_outputs(df, args.out_dir, formats=args.formats):
+            print(f"💾 排名表已写入: {path}")
+        if args.shortlist > 0 and len(df):
+            path = write_shortlist(df, args.shortlist_file or os.path.join(args.out_dir, DEFAULT_SHORTLIST), args.shortlist)
+            print(f"📋 候选清单已写入: {path}")
+            print(f"   只分析候选: python wyckoff_batch.py {path} --skip-fetch")
+
+
+if __name__ == "__main__":
+    main()
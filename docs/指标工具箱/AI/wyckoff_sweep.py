@@ -0,0 +1,174 @@
+import os
+import sys
+import time
+import itertools
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import kline_bars
+import kline_store
+import watchlist
+import wyckoff_backtest
+
+# ================= 威科夫启发式参数扫描 =================
+# wyckoff_plot 的结构识别写死了 400 根窗口、无 AR 时上沿 × 0.98、"SC 之后最高点即 AR" 等参数，
+# 调参只能改代码重跑。这里对多个交易对 / 周期批量评估参数网格:
+#   窗口长度 × 上沿回退系数 × AR 最小间隔 × 突破确认幅度 × 最长持仓
+# 中间结果按依赖关系分层缓存，每个网格点只做增量计算:
+#   数据集   -> 最高价/最低价稀疏表 (所有窗口共用，每个进程每个数据集只构建一次)
+#   窗口     -> SC / AR / 窗口最高点位置 (与阈值无关)
+#   回退系数 + AR 间隔 -> TR 上下沿
+#   突破幅度 -> 信号
+#   持仓     -> 成交模拟与统计
+# 任务按 (数据集, 窗口) 切分后交给进程池，结果汇总为一张 CSV 表。
+
+DEFAULT_WINDOWS = [200, 300, 400, 600]
+DEFAULT_FALLBACKS = [0.97, 0.98, 0.99]
+DEFAULT_AR_GAPS = [1, 5, 10]
+DEFAULT_BREAK_PCTS = [0.001, 0.002, 0.005]
+DEFAULT_HOLDS = [50, 100, 200]
+DEFAULT_OUT = "wyckoff_sweep.csv"
+DEFAULT_TOP = 10
+
+PARAM_COLUMNS = ["dataset", "window", "fallback", "ar_gap", "break_pct", "hold", "signal"]
+STAT_COLUMNS = ["trades", "hit_rate", "avg_win", "avg_loss", "expectancy", "profit_factor", "total_return", "max_drawdown"]
+
+# 进程内缓存: {(csv 路径, 稀疏表覆盖的最长窗口): (开, 高, 低, 收, (最高价表, 最低价表), EVEREX Alert_up)}
+_DATASETS = {}
+
+
+def _dataset(csv_path, max_window):
+    cached = _DATASETS.get((csv_path, max_window))
+    if cached is None:
+        bars = kline_bars.load_bars(csv_path, columns=("Open", "High", "Low", "Close", "Volume"))
+        open_, high, low, close = (bars.values(c) for c in ("Open", "High", "Low", "Close"))
+        tables = (wyckoff_backtest.sparse_table(high, "max", max_window), wyckoff_backtest.sparse_table(low, "min", max_window))
+        everex_up = wyckoff_backtest.everex_signal(open_, high, low, close, bars.values("Volume"))
+        cached = _DATASETS[(csv_path, max_window)] = (open_, high, low, close, tables, everex_up)
+    return cached
+
+
+def dataset_name(csv_path):
+    return os.path.splitext(os.path.basename(csv_path))[0].replace("_Cleaned", "")
+
+
+def sweep_window(csv_path, window, fallbacks, ar_gaps, break_pcts, holds, signals=wyckoff_backtest.SIGNALS,
+                 fee_bps=wyckoff_backtest.DEFAULT_FEE_BPS, max_window=None):
+    """
+    评估单个数据集、单个窗口下的全部阈值组合 (供进程池调用)，返回 (结果行列表, 耗时)
+    max_window: 本次扫描最长的窗口，同一进程内各窗口共用按它构建的稀疏表
+    """
+    t0 = time.perf_counter()
+    open_, high, low, close, tables, everex_up = _dataset(csv_path, max(window, max_window or window))
+    name = dataset_name(csv_path)
+    indices = wyckoff_backtest.tr_indices(high, low, window, tables)
+    rows = []
+    for fallback, ar_gap in itertools.product(fallbacks, ar_gaps):
+        tr = wyckoff_backtest.tr_levels(high, low, indices, window, fallback, ar_gap)
+        # 只有突破信号与 break_pct 有关，其余信号的统计在各 break_pct 之间复用
+        fixed = {}
+        for break_pct in break_pcts:
+            todo = [sig for sig in signals if sig == "breakout" or sig not in fixed]
+            for sig, idx, stop, target in wyckoff_backtest.find_signals(open_, high, low, close, tr, todo, break_pct, everex_up):
+                entries = [(sig, int(i), float(s), float(g)) for i, s, g in zip(idx, stop, target)]
+                per_hold = {hold: wyckoff_backtest.summarize(
+                    wyckoff_backtest.simulate(open_, high, low, close, entries, hold, fee_bps)) for hold in holds}
+                if sig != "breakout":
+                    fixed[sig] = per_hold
+                for hold, stats in per_hold.items():
+                    rows.append(dict(zip(PARAM_COLUMNS, (name, window, fallback, ar_gap, break_pct, hold, sig)), **stats))
+            for sig in signals:
+                if sig in fixed and sig not in todo:
+                    for hold, stats in fixed[sig].items():
+                        rows.append(dict(zip(PARAM_COLUMNS, (name, window, fallback, ar_gap, break_pct, hold, sig)), **stats))
+    return rows, time.perf_counter() - t0
+
+
+def run_sweep(paths, windows, fallbacks, ar_gaps, break_pcts, holds, signals=wyckoff_backtest.SIGNALS,
+              fee_bps=wyckoff_backtest.DEFAULT_FEE_BPS, procs=None):
+    """
+    并行评估全部 (数据集, 窗口) 任务，返回结果 DataFrame
+    """
+    jobs = list(itertools.product(paths, windows))
+    rows = []
+    done = 0
+    with ProcessPoolExecutor(max_workers=procs) as pool:
+        futures = {pool.submit(sweep_window, path, window, fallbacks, ar_gaps, break_pcts, holds, signals, fee_bps, max(windows)):
+                   (path, window) for path, window in jobs}
+        for future in as_completed(futures):
+            path, window = futures[future]
+            part, seconds = future.result()
+            rows.extend(part)
+            done += 1
+            print(f"  [{done}/{len(jobs)}] {dataset_name(path)} window={window}: {len(part)} 组结果, {seconds:.2f} 秒")
+    df = pd.DataFrame(rows, columns=PARAM_COLUMNS + STAT_COLUMNS)
+    return df.sort_values(PARAM_COLUMNS, ignore_index=True)
+
+
+def print_top(df, top=DEFAULT_TOP, min_trades=1, key="expectancy"):
+    """
+    每个数据集 + 信号按 key 打印排名前 top 的参数组合
+    """
+    ranked = df[df["trades"] >= min_trades]
+    for (name, sig), group in ranked.groupby(["dataset", "signal"], sort=True):
+        print(f"\n🏆 {name} {sig} (按 {key} 排序，至少 {min_trades} 笔交易)")
+        header = (f"{'WINDOW':>7}{'FALLBK':>8}{'GAP':>5}{'BREAK':>7}{'HOLD':>6}{'TRADES':>8}{'HIT':>7}"
+                  f"{'EXPECT':>9}{'PF':>7}{'TOTAL':>9}{'MAXDD':>8}")
+        print(header)
+        print("-" * len(header))
+        for _, r in group.sort_values(key, ascending=False).head(top).iterrows():
+            pf = f"{r['profit_factor']:.2f}" if np.isfinite(r["profit_factor"]) else "inf"
+            print(f"{r['window']:>7}{r['fallback']:>8.3f}{r['ar_gap']:>5}{r['break_pct']:>7.3f}{r['hold']:>6}"
+                  f"{r['trades']:>8}{r['hit_rate']:>7.1%}{r['expectancy']:>9.3%}{pf:>7}"
+                  f"{r['total_return']:>9.1%}{r['max_drawdown']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='威科夫 TR 启发式参数网格扫描')
+    parser.add_argument('csv_paths', nargs='*', help='*_Cleaned.csv 路径 (可多个)')
+    parser.add_argument('--pairs', nargs='*', default=[], help='交易对:周期，如 ADAUSDC:1m,4h (读取本目录存储)')
+    parser.add_argument('--windows', type=int, nargs='+', default=DEFAULT_WINDOWS, help='TR 识别窗口长度')
+    parser.add_argument('--fallbacks', type=float, nargs='+', default=DEFAULT_FALLBACKS, help='无 AR 时上沿回退系数')
+    parser.add_argument('--ar-gaps', type=int, nargs='+', default=DEFAULT_AR_GAPS, help='AR 至少在 SC 之后第几根 K 线')
+    parser.add_argument('--break-pcts', type=float, nargs='+', default=DEFAULT_BREAK_PCTS, help='突破确认幅度')
+    parser.add_argument('--holds', type=int, nargs='+', default=DEFAULT_HOLDS, help='最长持仓 K 线数')
+    parser.add_argument('--signals', nargs='+', choices=wyckoff_backtest.SIGNALS, default=list(wyckoff_backtest.SIGNALS), help='信号类型')
+    parser.add_argument('--fee-bps', type=float, default=wyckoff_backtest.DEFAULT_FEE_BPS, help='每边手续费 (基点)')
+    parser.add_argument('--procs', type=int, default=None, help='进程数 (默认 CPU 核数)')
+    parser.add_argument('--out', default=DEFAULT_OUT, help=f'结果表路径 (默认 {DEFAULT_OUT})')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help=f'每个数据集 / 信号打印前 N 组参数 (默认 {DEFAULT_TOP})')
+    parser.add_argument('--min-trades', type=int, default=10, help='参与排名的最少交易笔数 (默认 10)')
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    paths = list(args.csv_paths)
+    paths += [kline_store.csv_path(here, s, i) for s, i in watchlist.parse_watchlist(pairs=args.pairs)]
+    if not paths:
+        paths = [kline_store.csv_path(here, s, i) for s, i in watchlist.parse_watchlist(watchlist.DEFAULT_WATCHLIST)]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        print(f"⚠️ 跳过不存在的文件: {', '.join(missing)}")
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        print("❌ 没有可扫描的数据")
+        sys.exit(1)
+
+    grid = (len(args.windows) * len(args.fallbacks) * len(args.ar_gaps) * len(args.break_pcts)
+            * len(args.holds) * len(args.signals))
+    print(f"🔬 参数扫描: {len(paths)} 个数据集 × {grid} 组参数 = {len(paths) * grid} 次回测")
+    t0 = time.perf_counter()
+    df = run_sweep(paths, args.windows, args.fallbacks, args.ar_gaps, args.break_pcts, args.holds,
+                   tuple(args.signals), args.fee_bps, args.procs)
+    elapsed = time.perf_counter() - t0
+
+    df.to_csv(args.out, index=False)
+    print_top(df, args.top, args.min_trades)
+    print(f"\n✅ 扫描完成: {len(df)} 行结果，总耗时 {elapsed:.2f} 秒 ({len(df) / max(elapsed, 1e-9):.0f} 组/秒)")
+    print(f"💾 结果表已写入: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@
 
 # run_wyckoff.sh
 # 自动化执行威科夫分析流程: 获取数据 -> 清洗 -> 绘图 -> 生成报告
+# (单个交易对；批量分析多个交易对/周期请使用 docs/指标工具箱/AI/wyckoff_batch.py)
+# 设置 WYCKOFF_METRICS=metrics.jsonl 可记录各脚本每个阶段的耗时 / 请求数 / 峰值内存 (见 pipeline_metrics.py)
 
 # 默认参数
 SYMBOL="ADAUSDC"
@@ -18,14 +20,20 @@ if [ "$4" ]; then HISTORY=$4; fi
 echo "🚀 开始执行自动化分析流程..."
 echo "📊 交易对: $SYMBOL | 周期: $INTERVAL | 范围: ${DAYS}天 (0=全部) | AI 历史: ${HISTORY}条"
 
+# 定义文件名
+CSV_FILE="${SYMBOL}_${INTERVAL}_Cleaned.csv"
+TARGET_DIR="docs/指标工具箱/AI"
+OUTPUT_DIR="docs/指标工具箱/AI/output"
+
 # 1. 获取数据 (使用 binance_data_pro.py)
+# 直接写入归档目录: 本地已有数据时只增量拉取缺失的尾部
 echo "----------------------------------------"
 echo "📥 步骤 1: 获取并清洗数据..."
 # 根据是否有 days 参数构建命令
 if [ "$DAYS" -gt 0 ]; then
-    python3 docs/指标工具箱/AI/binance_data_pro.py $SYMBOL $INTERVAL --days $DAYS
+    python3 docs/指标工具箱/AI/binance_data_pro.py $SYMBOL $INTERVAL --days $DAYS --out-dir "$TARGET_DIR"
 else
-    python3 docs/指标工具箱/AI/binance_data_pro.py $SYMBOL $INTERVAL
+    python3 docs/指标工具箱/AI/binance_data_pro.py $SYMBOL $INTERVAL --out-dir "$TARGET_DIR"
 fi
 
 if [ $? -ne 0 ]; then
@@ -33,19 +41,13 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
-# 定义文件名
-CSV_FILE="${SYMBOL}_${INTERVAL}_Cleaned.csv"
-TARGET_DIR="docs/指标工具箱/AI"
-OUTPUT_DIR="docs/指标工具箱/AI/output"
-
-# 2. 移动数据文件
+# 2. 检查数据文件
 echo "----------------------------------------"
-echo "🚚 步骤 2: 归档数据文件..."
-if [ -f "$CSV_FILE" ]; then
-    mv "$CSV_FILE" "$TARGET_DIR/"
-    echo "✅ 已移动 $CSV_FILE -> $TARGET_DIR/"
+echo "🚚 步骤 2: 检查数据文件..."
+if [ -f "$TARGET_DIR/$CSV_FILE" ]; then
+    echo "✅ 数据已就绪: $TARGET_DIR/$CSV_FILE"
 else
-    echo "❌ 找不到生成的 CSV 文件: $CSV_FILE"
+    echo "❌ 找不到生成的 CSV 文件: $TARGET_DIR/$CSV_FILE"
     exit 1
 fi
 
@@ -1,99 +1,226 @@
 import os
 import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
-def check_mermaid_syntax(start_dir):
-    mermaid_block_pattern = re.compile(r'```mermaid(.*?)```', re.DOTALL)
-    
-    # Regex for Edge Labels: -->|Label| or -- Label -->
-    # Capture the content inside pipes or between -- and -->
-    edge_pipe_pattern = re.compile(r'(-->|-.->|==>)\s*\|(.*?)\|')
-    edge_text_pattern = re.compile(r'--\s+(.*?)\s+-->')
-    
-    # Regex for Node Labels: id[Label] or id(Label) or id{Label}
-    # We want to find cases where quotes are MISSING but special chars are present.
-    # Group 1: ID, Group 2: Open, Group 3: Content, Group 4: Close
-    node_pattern = re.compile(r'(\w+)\s*([\[\(\{])(.*?)([\]\}\)])')
-    
-    special_chars = ['(', ')', '[', ']', '<br>', '=', '，', '（', '）', '/']
-    # Check for Chinese characters
-    chinese_pattern = re.compile(r'[\u4e00-\u9fa5]')
-
-    errors_found = False
+# Bump when the checks below change so cached results are not reused
+CACHE_VERSION = 1
+DEFAULT_CACHE = ".mermaid_cache.json"
+SKIP_DIRS = ('node_modules', '.git', '.vuepress')
+# Below this many changed files the process pool costs more than it saves
+PARALLEL_MIN_FILES = 8
 
+mermaid_block_pattern = re.compile(r'```mermaid(.*?)```', re.DOTALL)
+
+# Regex for Edge Labels: -->|Label| or -- Label -->
+# Capture the content inside pipes or between -- and -->
+edge_pipe_pattern = re.compile(r'(-->|-.->|==>)\s*\|(.*?)\|')
+edge_text_pattern = re.compile(r'--\s+(.*?)\s+-->')
+
+# Regex for Node Labels: id[Label] or id(Label) or id{Label}
+# We want to find cases where quotes are MISSING but special chars are present.
+# Group 1: ID, Group 2: Open, Group 3: Content, Group 4: Close
+node_pattern = re.compile(r'(\w+)\s*([\[\(\{])(.*?)([\]\}\)])')
+
+special_chars = ['(', ')', '[', ']', '<br>', '=', '，', '（', '）', '/']
+# Check for Chinese characters
+chinese_pattern = re.compile(r'[\u4e00-\u9fa5]')
+
+
+def check_content(content):
+    """
+    Check every mermaid block in one markdown document.
+    Returns a list of findings: {"line", "level" (error/warning), "kind", "text", "label", "suggestion"}
+    """
+    findings = []
+    # Line numbers are tracked incrementally: only the text between consecutive blocks is counted
+    pos, line_no = 0, 1
+    for block_match in mermaid_block_pattern.finditer(content):
+        line_no += content.count('\n', pos, block_match.start())
+        pos = block_match.start()
+        start_line = line_no
+
+        for i, line in enumerate(block_match.group(1).split('\n')):
+            line = line.strip()
+            if not line or line.startswith(('graph', 'sequenceDiagram', '%%', 'classDef', 'style')):
+                continue
+
+            # CHECK 1: Edge Labels inside Pipes |...|
+            if '|' in line:
+                for match in edge_pipe_pattern.finditer(line):
+                    label = match.group(2)
+                    if not (label.startswith('"') and label.endswith('"')):
+                        # Check logic: If it has Chinese or special chars, it SHOULD be quoted
+                        if chinese_pattern.search(label) or any(char in label for char in special_chars):
+                            findings.append({"line": start_line + i, "level": "error", "kind": "Edge Label Unquoted",
+                                             "text": line, "label": label,
+                                             "suggestion": "Add quotes -> |\"" + label + "\"|"})
+
+            # CHECK 2: Node Labels id[...] or id(...)
+            # This is harder to parse perfectly with regex, but let's try strict check for parens
+            if not any(opener in line for opener in '[({'):
+                continue
+            for match in node_pattern.finditer(line):
+                opener, label = match.group(2), match.group(3)
+
+                # Skip if already quoted
+                if label.startswith('"') and label.endswith('"'):
+                    continue
+
+                # Logic: If opener is ( and label contains ), it BREAKS.
+                # Logic: If opener is [ and label contains ], it BREAKS.
+                if opener == '(' and ')' in label:
+                    findings.append({"line": start_line + i, "level": "error", "kind": "Node Syntax Vulnerable",
+                                     "text": line, "label": label, "issue": "Unquoted ')' inside round brackets.",
+                                     "suggestion": "Add quotes -> (\"" + label + "\")"})
+                elif opener == '[' and ']' in label:
+                    findings.append({"line": start_line + i, "level": "error", "kind": "Node Syntax Vulnerable",
+                                     "text": line, "label": label, "issue": "Unquoted ']' inside square brackets.",
+                                     "suggestion": "Add quotes -> [\"" + label + "\"]"})
+
+                # Soft Check: Chinese or Special Chars should ideally be quoted for safety
+                elif chinese_pattern.search(label) or any(char in label for char in special_chars):
+                    if '<br>' in label:  # HTML breaks MUST be quoted usually or they cause issues in some renderers
+                        # This is Warning only, unless it's strictly broken
+                        findings.append({"line": start_line + i, "level": "warning", "kind": "Node Label Unquoted HTML",
+                                         "text": line, "label": label,
+                                         "suggestion": "Add quotes -> [\"" + label + "\"]"})
+    return findings
+
+
+def _check_file(file_path):
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha1(data).hexdigest(), check_content(data.decode('utf-8'))
+
+
+def find_markdown(start_dir):
+    paths = []
     for root, dirs, files in os.walk(start_dir):
-        if 'node_modules' in root or '.git' in root or '.vuepress' in root:
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        paths.extend(os.path.join(root, file) for file in sorted(files) if file.endswith('.md'))
+    return paths
+
+
+def load_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("files", {}) if cache.get("version") == CACHE_VERSION else {}
+
+
+def save_cache(cache_path, files):
+    tmp = cache_path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"version": CACHE_VERSION, "files": files}, f, ensure_ascii=False)
+    os.replace(tmp, cache_path)
+
+
+def print_finding(file_path, finding):
+    icon = "❌" if finding["level"] == "error" else "⚠️"
+    print(f"{icon} [{finding['kind']}] {file_path}:{finding['line']}")
+    print(f"   Line: {finding['text']}")
+    if finding["kind"] == "Edge Label Unquoted":
+        print(f"   Label: {finding['label']}")
+    if finding.get("issue"):
+        print(f"   Issue: {finding['issue']}")
+    print(f"   Suggestion: {finding['suggestion']}")
+
+
+def check_mermaid_syntax(start_dir, cache_path=None, jobs=None, verbose=True):
+    """
+    Scan all markdown files under start_dir and return a report dict.
+    With cache_path, files whose size/mtime or content hash are unchanged reuse the cached findings;
+    changed files are checked in parallel (jobs processes, default CPU count).
+    """
+    t0 = time.perf_counter()
+    cached = load_cache(cache_path)
+    files, todo = {}, []
+    for file_path in find_markdown(start_dir):
+        st = os.stat(file_path)
+        entry = cached.get(file_path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            files[file_path] = entry
             continue
-            
-        for file in files:
-            if file.endswith('.md'):
-                file_path = os.path.join(root, file)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Find all mermaid blocks
-                for block_match in mermaid_block_pattern.finditer(content):
-                    block_content = block_match.group(1)
-                    start_line = content[:block_match.start()].count('\n') + 1
-                    
-                    lines = block_content.split('\n')
-                    for i, line in enumerate(lines):
-                        line_num = start_line + i
-                        line = line.strip()
-                        if not line or line.startswith('graph') or line.startswith('sequenceDiagram'):
-                            continue
-                        if line.startswith('%%') or line.startswith('classDef') or line.startswith('style'):
-                            continue
-
-                        # CHECK 1: Edge Labels inside Pipes |...|
-                        for match in edge_pipe_pattern.finditer(line):
-                            label = match.group(2)
-                            if not (label.startswith('"') and label.endswith('"')):
-                                # Check logic: If it has Chinese or special chars, it SHOULD be quoted
-                                if chinese_pattern.search(label) or any(char in label for char in special_chars):
-                                    print(f"❌ [Edge Label Unquoted] {file_path}:{line_num}")
-                                    print(f"   Line: {line}")
-                                    print(f"   Label: {label}")
-                                    print("   Suggestion: Add quotes -> |\"" + label + "\"|")
-                                    errors_found = True
-                        
-                        # CHECK 2: Node Labels id[...] or id(...)
-                        # This is harder to parse perfectly with regex, but let's try strict check for parens
-                        for match in node_pattern.finditer(line):
-                            node_id = match.group(1)
-                            opener = match.group(2)
-                            label = match.group(3)
-                            closer = match.group(4)
-                            
-                            # Skip if already quoted
-                            if label.startswith('"') and label.endswith('"'):
-                                continue
-                            
-                            # Logic: If opener is ( and label contains ), it BREAKS.
-                            # Logic: If opener is [ and label contains ], it BREAKS.
-                            if opener == '(' and ')' in label:
-                                print(f"❌ [Node Syntax Vulnerable] {file_path}:{line_num}")
-                                print(f"   Line: {line}")
-                                print(f"   Issue: Unquoted ')' inside round brackets.")
-                                print("   Suggestion: Add quotes -> (\"" + label + "\")")
-                                errors_found = True
-                            elif opener == '[' and ']' in label:
-                                print(f"❌ [Node Syntax Vulnerable] {file_path}:{line_num}")
-                                print(f"   Line: {line}")
-                                print(f"   Issue: Unquoted ']' inside square brackets.")
-                                print("   Suggestion: Add quotes -> [\"" + label + "\"]")
-                                errors_found = True
-                            
-                            # Soft Check: Chinese or Special Chars should ideally be quoted for safety
-                            elif chinese_pattern.search(label) or any(char in label for char in special_chars):
-                                if '<br>' in label: # HTML breaks MUST be quoted usually or they cause issues in some renderers
-                                    print(f"⚠️ [Node Label Unquoted HTML] {file_path}:{line_num}")
-                                    print(f"   Line: {line}")
-                                    print("   Suggestion: Add quotes -> [\"" + label + "\"]")
-                                # This is Warning only, unless it's strictly broken
-                                
-    if not errors_found:
-        print("✅ No obvious syntax errors found.")
+        todo.append((file_path, st, entry))
+
+    # Files touched without a content change (checkout, copy) only need re-hashing, not re-checking
+    changed = []
+    for file_path, st, entry in todo:
+        if entry:
+            with open(file_path, 'rb') as f:
+                if hashlib.sha1(f.read()).hexdigest() == entry["hash"]:
+                    files[file_path] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+                    continue
+        changed.append((file_path, st))
+
+    paths = [file_path for file_path, _ in changed]
+    if len(paths) >= PARALLEL_MIN_FILES and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_check_file, paths, chunksize=4))
+    else:
+        results = [_check_file(file_path) for file_path in paths]
+    for (file_path, st), (digest, findings) in zip(changed, results):
+        files[file_path] = {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "findings": findings}
+
+    # Deleted files drop out because the cache is rebuilt from this walk
+    if cache_path:
+        save_cache(cache_path, files)
+
+    findings = [dict(finding, file=file_path) for file_path in sorted(files) for finding in files[file_path]["findings"]]
+    errors = sum(1 for finding in findings if finding["level"] == "error")
+    if verbose:
+        for finding in findings:
+            print_finding(finding["file"], finding)
+        if not errors:
+            print("✅ No obvious syntax errors found.")
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "root": start_dir,
+        "files": len(files),
+        "checked": len(changed),
+        "cached": len(files) - len(changed),
+        "errors": errors,
+        "warnings": len(findings) - errors,
+        "elapsed_s": round(time.perf_counter() - t0, 4),
+        "findings": findings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check Mermaid blocks in markdown files for syntax that breaks rendering')
+    parser.add_argument('start_dir', nargs='?', default='docs', help='Directory to scan (default: docs)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help=f'Result cache for incremental runs (default: {DEFAULT_CACHE})')
+    parser.add_argument('--no-cache', action='store_true', help='Check every file and do not touch the cache')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes for changed files (default: CPU count, 1 = serial)')
+    parser.add_argument('--report', default=None, help='Write a JSON report to this path ("-" for stdout)')
+    parser.add_argument('--quiet', action='store_true', help='Only print the summary line')
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     print("🔍 Scanning for Mermaid Syntax Errors...")
-    check_mermaid_syntax("docs")
+    report = check_mermaid_syntax(args.start_dir, cache_path=None if args.no_cache else args.cache,
+                                  jobs=args.jobs, verbose=not args.quiet)
+    print(f"📄 {report['files']} files ({report['checked']} checked, {report['cached']} cached): "
+          f"{report['errors']} errors, {report['warnings']} warnings in {report['elapsed_s']:.2f}s")
+
+    if args.report == "-":
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    elif args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Report written to {args.report}")
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import check_mermaid  # noqa: E402
+
+BROKEN = "# Doc\n\n```mermaid\ngraph TD\n    A[Start] -->|买入| B[End]\n```\n"
+FIXED = "# Doc\n\n```mermaid\ngraph TD\n    A[Start] -->|\"买入\"| B[End]\n```\n"
+
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _check(root, cache):
+    return check_mermaid.check_mermaid_syntax(str(root), cache_path=str(cache), jobs=1, verbose=False)
+
+
+def test_findings_and_line_numbers():
+    findings = check_mermaid.check_content("intro\n\n" + BROKEN)
+    assert [(f["kind"], f["line"]) for f in findings] == [("Edge Label Unquoted", 7)]
+    assert check_mermaid.check_content(FIXED) == []
+
+
+def test_cache_reuses_unchanged_files(tmp_path):
+    docs, cache = tmp_path / "docs", tmp_path / "cache.json"
+    docs.mkdir()
+    _write(docs / "a.md", BROKEN)
+    _write(docs / "b.md", FIXED)
+
+    report = _check(docs, cache)
+    assert (report["checked"], report["cached"], report["errors"]) == (2, 0, 1)
+    report = _check(docs, cache)
+    assert (report["checked"], report["cached"], report["errors"]) == (0, 2, 1)
+
+    # Touching a file without changing it only re-hashes it
+    os.utime(docs / "b.md", ns=(0, 0))
+    assert _check(docs, cache)["checked"] == 0
+
+
+def test_cache_invalidated_by_edits_deletes_and_version(tmp_path, monkeypatch):
+    docs, cache = tmp_path / "docs", tmp_path / "cache.json"
+    docs.mkdir()
+    _write(docs / "a.md", BROKEN)
+    _write(docs / "b.md", FIXED)
+    _check(docs, cache)
+
+    _write(docs / "a.md", FIXED)
+    report = _check(docs, cache)
+    assert (report["checked"], report["errors"]) == (1, 0)
+
+    os.remove(docs / "b.md")
+    report = _check(docs, cache)
+    assert (report["files"], report["checked"]) == (1, 0)
+
+    monkeypatch.setattr(check_mermaid, "CACHE_VERSION", check_mermaid.CACHE_VERSION + 1)
+    assert _check(docs, cache)["checked"] == 1